@@ -19,14 +19,26 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from bson.objectid import ObjectId
+from broadcast import BroadcastEngine
+from async_db import AsyncDatabase
+from migrations import as_datetime
 
 logger = logging.getLogger(__name__)
 
 class AdminHandlers:
-    def __init__(self, config, db, bot=None):
+    def __init__(self, config, db, bot=None, adb=None):
         self.config = config
         self.db = db
+        self.adb = adb or AsyncDatabase(db)   # sab DB calls bot loop ke bahar
         self.bot = bot
+        self.broadcaster = BroadcastEngine(
+            db,
+            self.adb,
+            rate=config.BROADCAST_RATE,
+            concurrency=config.BROADCAST_CONCURRENCY,
+            page_size=config.BROADCAST_PAGE_SIZE,
+            status_seconds=config.BROADCAST_STATUS_SECONDS
+        )
         logger.info("✅ Admin handlers initialized")
 
     # ========== MAIN ADMIN PANEL ==========
@@ -37,9 +49,9 @@ class AdminHandlers:
             await update.message.reply_text("❌ Unauthorized.")
             return
 
-        total_users = self.db.users.count_documents({})
-        pending_wd = self.db.withdrawals.count_documents({'status': 'pending'})
-        pending_sup = self.db.issues.count_documents({'status': 'pending'}) if hasattr(self.db, 'issues') else 0
+        total_users = await self.adb.run(self.db.users.count_documents, {})
+        pending_wd = await self.adb.run(self.db.withdrawals.count_documents, {'status': 'pending'})
+        pending_sup = await self.adb.run(self.db.issues.count_documents, {'status': 'pending'}) if hasattr(self.db, 'issues') else 0
 
         keyboard = [
             [InlineKeyboardButton("🔍 SEARCH USER", callback_data="admin_search_user")],
@@ -150,6 +162,10 @@ class AdminHandlers:
                     await query.edit_message_text("🗑️ Message deleted")
                 except:
                     pass
+        elif data.startswith("bc_stop_"):
+            stopped = await self.broadcaster.cancel(data.replace("bc_stop_", ""))
+            await query.edit_message_text("⏹️ Broadcast rok rahe hain — current page ke baad band hoga..." if stopped
+                                          else "ℹ️ Broadcast pehle hi khatam ho chuka")
         elif data.startswith("verify_passes_"):
             await self.verify_pass_request(query, context, data.replace("verify_passes_", ""), 'verify')
         elif data.startswith("reject_passes_"):
@@ -174,7 +190,7 @@ class AdminHandlers:
         """Step 2: Receive user ID, show management options"""
         try:
             target_id = int(update.message.text.strip())
-            user = self.db.get_user(target_id)
+            user = await self.adb.get_user(target_id)
 
             if not user:
                 await update.message.reply_text(
@@ -214,7 +230,7 @@ class AdminHandlers:
 
     async def user_management_menu(self, query, context, target_id, message=None):
         """Show user management options from callback"""
-        user = self.db.get_user(target_id)
+        user = await self.adb.get_user(target_id)
         if not user:
             txt = f"❌ User {target_id} nahi mila"
             if query:
@@ -249,7 +265,7 @@ class AdminHandlers:
     async def process_user_management(self, update: Update, context: ContextTypes.DEFAULT_TYPE, target_id):
         """Process earning/all/+/- commands"""
         command = update.message.text.strip().lower()
-        user = self.db.get_user(target_id)
+        user = await self.adb.get_user(target_id)
 
         if not user:
             await update.message.reply_text(f"❌ User {target_id} nahi mila")
@@ -262,7 +278,7 @@ class AdminHandlers:
                 old_bal = user.get('balance', 0)
                 old_total = user.get('total_earned', 0)
 
-                self.db.users.update_one(
+                await self.adb.run(self.db.users.update_one,
                     {'user_id': target_id},
                     {'$set': {
                         'balance': 0.0,
@@ -270,8 +286,8 @@ class AdminHandlers:
                         'today_earned': 0.0
                     }}
                 )
-                self.db.transactions.delete_many({'user_id': target_id})
-                self.db.user_cache.pop(f"user_{target_id}", None)
+                await self.adb.run(self.db.transactions.delete_many, {'user_id': target_id})
+                self.db.user_cache.invalidate(target_id)
 
                 await update.message.reply_text(
                     f"✅ **Earnings Cleared!**\n\n"
@@ -285,6 +301,9 @@ class AdminHandlers:
 
             # ── DELETE ALL DATA ───────────────────────────────
             elif command == 'all':
+                # Referral record delete se pehle — referrer ke kaunse counters / month bucket ghatane hain
+                referral = await self.adb.run(self.db.referrals.find_one, {'referred_id': target_id},
+                                              {'_id': 0, 'referrer_id': 1, 'is_active': 1, 'activation_date': 1})
                 collections_to_clear = [
                     (self.db.transactions, {'user_id': target_id}),
                     (self.db.withdrawals, {'user_id': target_id}),
@@ -292,6 +311,7 @@ class AdminHandlers:
                     (self.db.daily_searches, {'user_id': target_id}),
                     (self.db.daily_bonus, {'user_id': target_id}),
                     (self.db.missions, {'user_id': target_id}),
+                    (self.db.mission_days, {'user_id': target_id}),
                     (self.db.live_activity, {'user_id': target_id}),
                 ]
                 # Also try optional collections
@@ -300,36 +320,43 @@ class AdminHandlers:
                     if hasattr(self.db, col_name):
                         col = getattr(self.db, col_name)
                         try:
-                            col.delete_many({'user_id': target_id})
+                            await self.adb.run(col.delete_many, {'user_id': target_id})
                         except:
                             pass
 
                 deleted_all = 0
                 for col, query_filter in collections_to_clear:
                     try:
-                        r = col.delete_many(query_filter)
+                        r = await self.adb.run(col.delete_many, query_filter)
                         deleted_all += r.deleted_count
                     except Exception as e:
                         logger.error(f"Delete error for {col.name}: {e}")
 
                 # Finally delete the user document
-                self.db.users.delete_one({'user_id': target_id})
-                self.db.user_cache.pop(f"user_{target_id}", None)
+                await self.adb.run(self.db.users.delete_one, {'user_id': target_id})
+                self.db.user_cache.invalidate(target_id)
 
                 # Decrement referrer's counts
                 referrer_id = user.get('referrer_id')
                 if referrer_id:
                     try:
-                        was_active = user.get('active_refs', 0) > 0
-                        self.db.users.update_one(
-                            {'user_id': referrer_id},
-                            {'$inc': {
-                                'total_refs': -1,
-                                'active_refs': -1 if was_active else 0,
-                                'pending_refs': 0 if was_active else -1
-                            }}
-                        )
-                        self.db.user_cache.pop(f"user_{referrer_id}", None)
+                        if referral:
+                            was_active = bool(referral.get('is_active'))
+                        else:
+                            was_active = user.get('active_refs', 0) > 0
+                        inc = {
+                            'total_refs': -1,
+                            'active_refs': -1 if was_active else 0,
+                            'pending_refs': 0 if was_active else -1
+                        }
+                        # Activation wale mahine ka bucket bhi — warna withdrawal slots wahi ref ginte rehte
+                        activated = as_datetime((referral or {}).get('activation_date'))
+                        if was_active and activated:
+                            inc[f'month_stats.{self.db._month_key(activated)}.active_refs'] = -1
+                        await self.adb.run(self.db.users.update_one, {'user_id': referrer_id}, {'$inc': inc})
+                        self.db.user_cache.invalidate(referrer_id)
+                        if referral:
+                            await self.adb.run(self.db._drop_from_leaderboard, [referral])
                     except:
                         pass
 
@@ -348,7 +375,7 @@ class AdminHandlers:
                     await update.message.reply_text("❌ Invalid amount (1-100000)")
                     return
                 old_bal = user.get('balance', 0)
-                self.db.add_balance(target_id, amount, f"Admin added ₹{amount}")
+                await self.adb.add_balance(target_id, amount, f"Admin added ₹{amount}")
                 await update.message.reply_text(
                     f"✅ **₹{amount:.2f} Add Ho Gaya!**\n\n"
                     f"User: `{target_id}`\n"
@@ -376,9 +403,9 @@ class AdminHandlers:
                         f"Itna nahi hata sakte: ₹{amount:.2f}"
                     )
                     return
-                self.db.users.update_one({'user_id': target_id}, {'$inc': {'balance': -amount}})
-                self.db.add_transaction(target_id, 'admin_remove', -amount, f"Admin removed ₹{amount}")
-                self.db.user_cache.pop(f"user_{target_id}", None)
+                await self.adb.run(self.db.users.update_one, {'user_id': target_id}, {'$inc': {'balance': -amount}})
+                await self.adb.add_transaction(target_id, 'admin_remove', -amount, f"Admin removed ₹{amount}")
+                self.db.user_cache.invalidate(target_id)
                 await update.message.reply_text(
                     f"✅ **₹{amount:.2f} Remove Ho Gaya!**\n\n"
                     f"User: `{target_id}`\n"
@@ -428,7 +455,7 @@ class AdminHandlers:
     async def process_search_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             target_id = int(update.message.text.strip())
-            user = self.db.get_user(target_id)
+            user = await self.adb.get_user(target_id)
             if user:
                 keyboard = [
                     [InlineKeyboardButton("👤 VIEW", callback_data=f"user_details_{target_id}"),
@@ -451,7 +478,7 @@ class AdminHandlers:
     # ========== SHOW USER DETAILS ==========
 
     async def show_user_details(self, query, context, target_id):
-        user = self.db.get_user(target_id)
+        user = await self.adb.get_user(target_id)
         if not user:
             await query.edit_message_text(
                 f"❌ User {target_id} nahi mila",
@@ -459,9 +486,8 @@ class AdminHandlers:
             )
             return
 
-        join_d = user.get('join_date', 'Unknown')
-        if join_d and len(join_d) > 10:
-            join_d = join_d[:10]
+        join_d = as_datetime(user.get('join_date'))
+        join_d = join_d.date().isoformat() if join_d else 'Unknown'
 
         text = (
             f"👤 **User Details**\n\n"
@@ -491,7 +517,7 @@ class AdminHandlers:
     async def support_messages_menu(self, query, context):
         try:
             col = self.db.issues if hasattr(self.db, 'issues') else self.db.support_messages
-            messages = list(col.find({'status': 'pending'}).sort('timestamp', -1).limit(10))
+            messages = await self.adb.run(lambda: list(col.find({'status': 'pending'}).sort('timestamp', -1).limit(10)))
             if not messages:
                 await query.edit_message_text(
                     "✅ Koi pending support message nahi.",
@@ -521,7 +547,7 @@ class AdminHandlers:
     async def view_support_message(self, query, context, msg_id):
         try:
             col = self.db.issues if hasattr(self.db, 'issues') else self.db.support_messages
-            msg = col.find_one({'_id': ObjectId(msg_id)})
+            msg = await self.adb.run(col.find_one, {'_id': ObjectId(msg_id)})
         except:
             msg = None
 
@@ -532,7 +558,7 @@ class AdminHandlers:
             )
             return
 
-        user = self.db.get_user(msg['user_id'])
+        user = await self.adb.get_user(msg['user_id'])
         uname = user.get('first_name', 'Unknown') if user else 'Unknown'
 
         text = (
@@ -556,18 +582,18 @@ class AdminHandlers:
         try:
             reply_text = update.message.text.strip()
             col = self.db.issues if hasattr(self.db, 'issues') else self.db.support_messages
-            msg = col.find_one({'_id': ObjectId(msg_id)})
+            msg = await self.adb.run(col.find_one, {'_id': ObjectId(msg_id)})
 
             if not msg:
                 await update.message.reply_text("❌ Message nahi mila")
                 return
 
-            col.update_one(
+            await self.adb.run(col.update_one,
                 {'_id': ObjectId(msg_id)},
                 {'$set': {
                     'admin_reply': reply_text,
                     'status': 'replied',
-                    'reply_date': datetime.now().isoformat(),
+                    'reply_date': datetime.now(),
                     'replied_by': update.effective_user.id
                 }}
             )
@@ -597,7 +623,7 @@ class AdminHandlers:
 
     async def broadcast_menu(self, query, context):
         context.user_data['admin_action'] = 'broadcast'
-        total = self.db.users.count_documents({})
+        total = await self.adb.run(self.db.users.count_documents, {})
         await query.edit_message_text(
             f"📢 **Broadcast**\n\nTotal users: {total}\n\n📩 Aage jo bhi message bhejoge (text/photo/video/audio/sticker) — woh sab users ko broadcast ho jayega!",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ BACK", callback_data="back_to_admin")]]),
@@ -605,91 +631,25 @@ class AdminHandlers:
         )
 
     async def process_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Full media broadcast: text, photo, video, audio, voice, document, sticker, animation"""
+        """Full media broadcast: text, photo, video, audio, voice, document, sticker, animation.
+        Job background mein chalta hai (broadcast.py) — restart ke baad khud resume hota hai."""
         if context.user_data.get('admin_action') != 'broadcast':
             return
         context.user_data.pop('admin_action', None)
 
-        message = update.message
-        users = list(self.db.users.find({}, {'user_id': 1}))
-        sent = 0; failed = 0; blocked = []
-
-        status_msg = await message.reply_text(
-            f"📢 Broadcasting to {len(users)} users...\n⏳ Please wait..."
-        )
-
-        for i, u in enumerate(users):
-            uid = u.get('user_id')
-            if not uid:
-                continue
-            try:
-                # Build keyboard — preserve original inline buttons, add OK/Delete at bottom
-                existing_kb = []
-                if message.reply_markup and hasattr(message.reply_markup, 'inline_keyboard'):
-                    existing_kb = message.reply_markup.inline_keyboard  # list of rows
-
-                bc_row = [
-                    InlineKeyboardButton("✅ OK", callback_data="bc_ok"),
-                    InlineKeyboardButton("🗑️ Delete", callback_data="bc_delete")
-                ]
-                final_kb = list(existing_kb) + [bc_row]
-                bc_kb = InlineKeyboardMarkup(final_kb)
-
-                await context.bot.copy_message(
-                    chat_id=uid,
-                    from_chat_id=message.chat_id,
-                    message_id=message.message_id,
-                    reply_markup=bc_kb
-                )
-                sent += 1
-                # Rate limit: Telegram allows ~30 msgs/sec
-                if (i + 1) % 30 == 0:
-                    await status_msg.edit_text(
-                        f"📢 Progress: {i+1}/{len(users)} users\n✅ Sent: {sent} | ❌ Failed: {failed}"
-                    )
-                    await asyncio.sleep(1)  # 1 sec pause every 30 msgs
-                else:
-                    await asyncio.sleep(0.035)
-
-            except Exception as ex:
-                failed += 1
-                err = str(ex).lower()
-                if any(w in err for w in ['blocked', 'deactivated', 'not found', 'chat not found', 'user is deactivated']):
-                    blocked.append(uid)
-
-        # Final report
-        await status_msg.edit_text(
-            f"✅ **Broadcast Complete!**\n\n"
-            f"📨 Sent: {sent}\n"
-            f"❌ Failed: {failed}\n"
-            f"🚫 Blocked/Deleted: {len(blocked)}\n"
-            f"👥 Total: {len(users)}",
-            parse_mode='Markdown'
-        )
-
-        # AUTO-REMOVE blocked/deleted users from DB immediately
-        if blocked:
-            context.user_data['last_broadcast_blocked'] = blocked
-            logger.info(f"Broadcast blocked by {len(blocked)} users — auto removing...")
-            try:
-                deleted_count, _ = self.db.remove_blocked_users(blocked)
-                logger.info(f"✅ Auto-removed {deleted_count} blocked users from DB")
-                # Final message update karo with cleanup info
-                await status_msg.edit_text(
-                    "✅ **Broadcast Complete!**\n\n"
-                    f"📨 Sent: {sent}\n"
-                    f"❌ Failed: {failed}\n"
-                    f"🚫 Blocked/Deleted: {len(blocked)}\n"
-                    f"🧹 Auto-cleaned: {deleted_count} users DB se remove\n"
-                    f"👥 Total: {len(users)}",
-                    parse_mode="Markdown"
-                )
-            except Exception as ce:
-                logger.error(f"Auto-cleanup error: {ce}")
-
+        status_msg = await update.message.reply_text("📢 Broadcast shuru ho raha hai...\n⏳ Progress yahin update hoga")
+        try:
+            job_id = await self.broadcaster.start(context.bot, update.message, status_msg)
+            logger.info(f"📢 Broadcast job {job_id} started by {update.effective_user.id}")
+        except Exception as e:
+            logger.error(f"Broadcast start error: {e}")
+            await status_msg.edit_text(f"❌ Broadcast start nahi hua: {e}")
 
     async def clear_junk_users(self, query, context):
-        blocked = context.user_data.get('last_broadcast_blocked', [])
+        """ Broadcast ke blocked users jinka auto-clean fail hua (job doc ka `junk_ids`) — dobara purge. """
+        job = await self.adb.run(self.db.broadcast_jobs.find_one, {'junk_ids.0': {'$exists': True}},
+                                 {'junk_ids': 1}, sort=[('_id', -1)])
+        blocked = (job or {}).get('junk_ids', [])
         if not blocked:
             await query.edit_message_text(
                 "❌ Koi blocked user nahi.",
@@ -697,17 +657,46 @@ class AdminHandlers:
             )
             return
         await query.edit_message_text(f"🧹 {len(blocked)} users clean kar rahe hain...")
-        deleted, failed = self.db.remove_blocked_users(blocked)
+        report = await self.adb.run(self.db.purge_users, blocked)
+        if not report['failed']:
+            await self.adb.run(self.db.broadcast_jobs.update_one, {'_id': job['_id']}, {'$unset': {'junk_ids': ''}})
+        rows = "\n".join(f"• {k}: {v}" for k, v in report['deleted'].items() if v)
         await query.edit_message_text(
-            f"🧹 **Cleanup Done!**\n\n✅ Removed: {deleted}\n❌ Failed: {failed}",
+            f"🧹 **Cleanup Done!**\n\n✅ Removed: {report['deleted'].get('users', 0)}\n❌ Failed: {report['failed']}\n"
+            f"⚡ {report['seconds']}s ({report['per_sec']} users/s)\n\n{rows}",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ BACK", callback_data="back_to_admin")]])
         )
-        context.user_data['last_broadcast_blocked'] = []
+
+    # ========== LEADERBOARD REBUILD ==========
+
+    async def rebuild_leaderboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """ /rebuild_leaderboard — weekly/monthly counters referrals se backfill """
+        if update.effective_user.id not in self.config.ADMIN_IDS:
+            await update.message.reply_text("❌ Unauthorized.")
+            return
+        msg = await update.message.reply_text("⏳ Leaderboard rebuild ho raha hai...")
+        report = await self.adb.run(self.db.rebuild_leaderboard_periods)
+        lines = "\n".join(f"• {k}: {v} users" for k, v in report.items()) or "❌ Rebuild failed — logs dekho"
+        await msg.edit_text(f"🏆 **Leaderboard Rebuilt!**\n\n{lines}", parse_mode=ParseMode.MARKDOWN)
+
+    async def backfill_month_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """ /backfill_month_stats [YYYY-MM] — month refs / withdrawn counters referrals + withdrawals se """
+        if update.effective_user.id not in self.config.ADMIN_IDS:
+            await update.message.reply_text("❌ Unauthorized.")
+            return
+        month = context.args[0] if context.args else None
+        msg = await update.message.reply_text("⏳ Month stats backfill ho raha hai...")
+        report = await self.adb.backfill_month_stats(month)
+        await msg.edit_text(
+            f"📅 **Month Stats — {report['month']}**\n\n"
+            f"• active_refs: {report['active_refs']} users\n• withdrawn: {report['withdrawn']} users",
+            parse_mode=ParseMode.MARKDOWN
+        )
 
     # ========== WITHDRAWALS ==========
 
     async def withdrawals_menu(self, query, context):
-        wds = self.db.get_pending_withdrawals(10)
+        wds = await self.adb.get_pending_withdrawals(10)
         if not wds:
             await query.edit_message_text(
                 "✅ Koi pending withdrawal nahi.",
@@ -718,7 +707,7 @@ class AdminHandlers:
         text = f"💰 **Pending Withdrawals** ({len(wds)})\n\n"
         keyboard = []
         for w in wds[:5]:
-            user = self.db.get_user(w['user_id'])
+            user = await self.adb.get_user(w['user_id'])
             uname = user.get('first_name', 'User')[:8] if user else 'User'
             wid = str(w['_id'])
             text += f"• {uname}: ₹{w['amount']} ({w['method']})\n"
@@ -733,14 +722,14 @@ class AdminHandlers:
 
     async def view_withdrawal_details(self, query, context, wid):
         try:
-            w = self.db.withdrawals.find_one({'_id': ObjectId(wid)})
+            w = await self.adb.run(self.db.withdrawals.find_one, {'_id': ObjectId(wid)})
         except:
             w = None
         if not w:
             await query.edit_message_text("❌ Withdrawal nahi mila")
             return
 
-        user = self.db.get_user(w['user_id'])
+        user = await self.adb.get_user(w['user_id'])
         uname = user.get('first_name', 'Unknown') if user else 'Unknown'
 
         text = (
@@ -762,19 +751,19 @@ class AdminHandlers:
 
     async def approve_withdrawal(self, query, context, wid):
         try:
-            w = self.db.withdrawals.find_one({'_id': ObjectId(wid)})
+            w = await self.adb.run(self.db.withdrawals.find_one, {'_id': ObjectId(wid)})
         except:
             w = None
         if not w:
             await query.edit_message_text("❌ Withdrawal nahi mila")
             return
 
-        success = self.db.approve_withdrawal(wid, query.from_user.id)
+        success = await self.adb.approve_withdrawal(wid, query.from_user.id)
         if not success:
             await query.edit_message_text("❌ Approve nahi ho saka")
             return
 
-        user = self.db.get_user(w['user_id'])
+        user = await self.adb.get_user(w['user_id'])
         uname = user.get('first_name', 'Unknown') if user else 'Unknown'
 
         try:
@@ -802,19 +791,19 @@ class AdminHandlers:
 
     async def reject_withdrawal(self, query, context, wid):
         try:
-            w = self.db.withdrawals.find_one({'_id': ObjectId(wid)})
+            w = await self.adb.run(self.db.withdrawals.find_one, {'_id': ObjectId(wid)})
         except:
             w = None
         if not w:
             await query.edit_message_text("❌ Withdrawal nahi mila")
             return
 
-        success = self.db.reject_withdrawal(wid, query.from_user.id)
+        success = await self.adb.reject_withdrawal(wid, query.from_user.id)
         if not success:
             await query.edit_message_text("❌ Reject nahi ho saka")
             return
 
-        user = self.db.get_user(w['user_id'])
+        user = await self.adb.get_user(w['user_id'])
         uname = user.get('first_name', 'Unknown') if user else 'Unknown'
 
         try:
@@ -844,7 +833,7 @@ class AdminHandlers:
 
     async def verify_pass_request(self, query, context, request_id, action):
         try:
-            result = self.db.process_pass_request(request_id, action, query.from_user.id)
+            result = await self.adb.process_pass_request(request_id, action, query.from_user.id)
             if not result.get('success'):
                 await query.edit_message_text(f"❌ {result.get('message','Error')}")
                 return
@@ -877,8 +866,8 @@ class AdminHandlers:
         context.user_data['replying_to'] = None
         context.user_data['managing_user'] = None
 
-        total = self.db.users.count_documents({})
-        pending = self.db.withdrawals.count_documents({'status': 'pending'})
+        total = await self.adb.run(self.db.users.count_documents, {})
+        pending = await self.adb.run(self.db.withdrawals.count_documents, {'status': 'pending'})
 
         keyboard = [
             [InlineKeyboardButton("🔍 SEARCH USER", callback_data="admin_search_user")],
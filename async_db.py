@@ -0,0 +1,113 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== async_db.py (bot loop ke liye DB executor + loop lag monitor) =====
+#
+# PTB handlers async hain par pymongo sync hai — handler ke andar seedha self.db.x() chalao toh
+# query ke poore time bot loop ruka rehta hai (webhook updates bhi). Isliye:
+#   await self.adb.get_user(uid)                       → Database method, thread pool pe
+#   await self.adb.run(self.db.referrals.find_one, q)  → koi bhi sync callable
+# LoopLagMonitor batata hai loop kitna der block hua (sleep kitna late jaagta hai).
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabase:
+    """ Database ka async facade — har method call bounded thread pool pe jaata hai. """
+
+    def __init__(self, db, max_workers=8):
+        self.db = db
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+        self.stats = {'calls': 0, 'errors': 0, 'slowest_ms': 0.0, 'slowest': None}
+
+    def run(self, fn, *args, **kwargs):
+        """ Sync callable ko pool pe chalao → awaitable """
+        # run_in_executor contextvars copy nahi karta — metrics scope (kaunsa handler) DB thread tak le jao
+        ctx = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(ctx.run, self._timed, fn, args, kwargs)
+        )
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not inspect.ismethod(attr):
+            raise AttributeError(f"AsyncDatabase: '{name}' method nahi hai — collections ke liye adb.run() use karo")
+
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def _timed(self, fn, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            self.stats['calls'] += 1
+            if ms > self.stats['slowest_ms']:
+                self.stats['slowest_ms'] = round(ms, 1)
+                self.stats['slowest'] = getattr(fn, '__name__', str(fn))
+
+class LoopLagMonitor:
+    """
+    Har `interval` sec sleep karke dekho kitna late jaage — wahi loop ka block time hai.
+    Last `window` samples se p50/p99/max; `warn_ms` se zyada lag pe warning log.
+    """
+
+    def __init__(self, interval=0.5, window=600, warn_ms=250):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self._samples = deque(maxlen=window)
+        self.total_blocked_ms = 0.0
+        self.max_ms = 0.0
+        self.over_warn = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, (loop.time() - expected) * 1000)
+            self._samples.append(lag)
+            self.total_blocked_ms += lag
+            self.max_ms = max(self.max_ms, lag)
+            if lag > self.warn_ms:
+                self.over_warn += 1
+                logger.warning(f"⚠️ Bot loop blocked {lag:.0f}ms")
+
+    def snapshot(self):
+        samples = sorted(self._samples)
+        if not samples:
+            return {'samples': 0}
+        pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))], 1)
+        return {
+            'samples': len(samples),
+            'p50_ms': pick(0.50),
+            'p99_ms': pick(0.99),
+            'window_max_ms': round(samples[-1], 1),
+            'max_ms': round(self.max_ms, 1),
+            'total_blocked_ms': round(self.total_blocked_ms, 1),
+            'over_warn': self.over_warn
+        }
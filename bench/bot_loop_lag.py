@@ -0,0 +1,76 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== bench/bot_loop_lag.py (bot loop lag: direct pymongo vs AsyncDatabase) =====
+#
+# Usage:
+#   python bench/bot_loop_lag.py [query_ms] [updates]
+#
+# Ek burst of updates chalata hai jisme har handler 3 DB calls karta hai (har call `query_ms` ka
+# blocking kaam — slow Mongo query jaisa). Do modes:
+#   direct → handler ke andar seedha sync call (purana tareeka)
+#   adb    → await AsyncDatabase (thread pool)
+# LoopLagMonitor dono mein batata hai bot loop kitna block hua.
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_db import AsyncDatabase, LoopLagMonitor
+
+class SlowDatabase:
+    """ Sirf latency — har method `query_ms` tak thread ko block karta hai. """
+    def __init__(self, query_ms):
+        self.query_ms = query_ms
+
+    def get_user(self, user_id):
+        time.sleep(self.query_ms / 1000)
+        return {'user_id': user_id}
+
+async def burst(mode, db, adb, updates):
+    async def handler(uid):
+        for _ in range(3):
+            if mode == 'direct':
+                db.get_user(uid)
+            else:
+                await adb.get_user(uid)
+    await asyncio.gather(*(handler(i) for i in range(updates)))
+
+async def run_mode(mode, query_ms, updates):
+    db = SlowDatabase(query_ms)
+    adb = AsyncDatabase(db, max_workers=8)
+    monitor = LoopLagMonitor(interval=0.01, window=100000, warn_ms=10**9)
+    task = asyncio.get_running_loop().create_task(monitor.run())
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await burst(mode, db, adb, updates)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.05)
+    task.cancel()
+    adb.shutdown()
+    return elapsed, monitor.snapshot()
+
+def main():
+    query_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 40
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    lines = [f"Bot loop lag — {updates} updates x 3 DB calls x {query_ms:.0f}ms"]
+    for mode in ('direct', 'adb'):
+        elapsed, snap = asyncio.run(run_mode(mode, query_ms, updates))
+        lines.append(
+            f"  {mode:<6} burst {elapsed * 1000:7.0f}ms | loop lag p50 {snap['p50_ms']:6.1f}ms "
+            f"p99 {snap['p99_ms']:7.1f}ms max {snap['max_ms']:7.1f}ms | blocked total {snap['total_blocked_ms']:7.0f}ms"
+        )
+    out = "\n".join(lines)
+    print(out)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== bench/cold_start.py (boot cost: Database init + time to bound port) =====
+#
+# Usage:
+#   MONGODB_URI=... MONGODB_DB=filmyfund_bench python bench/cold_start.py [runs] [--process]
+#   python bench/cold_start.py [runs] [--process] --mongomock [--rtt=MS]
+#
+# In-process (har run naya MongoClient, jaise naya dyno):
+#   boot          → Database(config) — ab sirf schema version ka ek read
+#   boot + schema → Database(config) + apply_schema() — pehle har boot yehi karta tha (ping +
+#                   ~30 create_index + ads count) aur upar se run_flask ke 2s + bot thread ke 1s sleep
+# --process → `python main.py` spawn karke PORT pe pehla /health response aane tak ka wall time.
+# Bench DB pe chalao — apply_schema indexes banata hai.
+# --mongomock → mongod nahi hai toh: mongomock pe chalao, har Mongo call pe `--rtt` ms (default 5) ka
+# simulated round trip aur commands khud gino (pymongo listener mongomock pe nahi chalta). Numbers
+# real cluster jaise nahi, par boot ka round-trip count aur fixed sleeps wahi hain — before/after compare
+# ke liye kaafi. Purane tree (apply_schema se pehle) pe bhi chalta hai: wahan sirf `boot` row aati hai.
+
+import functools
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '123456:bench')
+os.environ.setdefault('MONGODB_DB', 'filmyfund_bench')
+
+OLD_BOOT_SLEEPS = 3.0   # run_flask time.sleep(2) + main() time.sleep(1) — ab dono hat gaye
+
+MOCK_METHODS = ('find_one', 'find', 'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+                'find_one_and_update', 'delete_one', 'delete_many', 'bulk_write', 'aggregate', 'distinct',
+                'count_documents', 'estimated_document_count', 'create_index', 'create_indexes',
+                'drop_index', 'index_information', 'list_indexes')
+mock_commands = None   # --mongomock mein commands ka counter (list of 1)
+
+def use_mongomock(rtt_ms):
+    """ database.MongoClient → mongomock; har bahar wali Collection / Database call = ek simulated round trip. """
+    global mock_commands
+    import mongomock
+    import database
+    mock_commands = [0]
+    rtt = max(rtt_ms, 0) / 1000
+    nested = threading.local()
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            depth = getattr(nested, 'depth', 0)
+            if not depth:             # mongomock andar se apne hi methods bulata hai — woh alag command nahi
+                mock_commands[0] += 1
+                time.sleep(rtt)
+            nested.depth = depth + 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                nested.depth = depth
+        return call
+
+    for name in MOCK_METHODS:
+        if hasattr(mongomock.Collection, name):
+            setattr(mongomock.Collection, name, wrap(getattr(mongomock.Collection, name)))
+    mongomock.Database.command = wrap(mongomock.Database.command)
+    database.MongoClient = mongomock.MongoClient
+
+def _commands():
+    if mock_commands is not None:
+        return mock_commands[0]
+    from metrics import metrics
+    return sum(row[0] for row in metrics.commands.values())
+
+def in_process(runs):
+    from config import Config
+    from database import Database
+    config = Config()
+    Database(config).cleanup()   # imports + DNS / SRV warm — pehla run baaki se alag na dikhe
+
+    rows = {'boot': []}
+    if hasattr(Database, 'apply_schema'):
+        rows['boot + schema'] = []
+    for _ in range(runs):
+        for label in rows:
+            before = _commands()
+            t0 = time.perf_counter()
+            db = Database(config)
+            if label == 'boot + schema':
+                db.apply_schema()
+            rows[label].append(((time.perf_counter() - t0) * 1000, _commands() - before))
+            db.cleanup()
+
+    lines = [f"{'mode':<16}{'ms (median)':>13}{'ms (max)':>11}{'mongo cmds':>12}"]
+    for label, samples in rows.items():
+        ms = sorted(s[0] for s in samples)
+        lines.append(f"{label:<16}{ms[len(ms) // 2]:>13.1f}{ms[-1]:>11.1f}{samples[-1][1]:>12}")
+    if 'boot + schema' in rows:
+        lines.append(f"(pehle ke boot mein iske upar {OLD_BOOT_SLEEPS:.0f}s fixed sleeps bhi the)")
+    return lines
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+MOCK_BOOT = ("import runpy, sys; sys.path[:0] = [sys.argv[1], sys.argv[2]]; import cold_start; "
+             "cold_start.use_mongomock(float(sys.argv[3])); sys.argv = ['main.py']; "
+             "runpy.run_path('main.py', run_name='__main__')")
+
+def process_boot(runs, rtt_ms=None):
+    """ python main.py spawn → /health pe pehla HTTP response (200 / 503 dono — port bound hai). """
+    env = dict(os.environ)
+    env.setdefault('ADMIN_IDS', '1')
+    cmd = [sys.executable, 'main.py']
+    if rtt_ms is not None:
+        cmd = [sys.executable, '-c', MOCK_BOOT, ROOT, os.path.dirname(os.path.abspath(__file__)), str(rtt_ms)]
+    lines = []
+    for i in range(runs):
+        port = _free_port()
+        env['PORT'] = str(port)
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=ROOT, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        bound = None
+        try:
+            while proc.poll() is None and time.perf_counter() - t0 < 60:
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1)
+                except urllib.error.HTTPError:
+                    pass                  # 503 degraded — phir bhi serve kar raha hai
+                except OSError:
+                    time.sleep(0.05)
+                    continue
+                bound = time.perf_counter() - t0
+                break
+        finally:
+            proc.terminate()
+            proc.wait(10)
+        lines.append(f"process run {i + 1}: " + (f"/health answered after {bound:.2f}s" if bound else "did not bind"))
+    return lines
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    runs = int(args[0]) if args else 5
+    rtt_ms = None
+    if '--mongomock' in sys.argv:
+        os.environ.setdefault('MONGODB_URI', 'mongodb://127.0.0.1:27017')
+        rtt_ms = next((float(a.split('=', 1)[1]) for a in sys.argv if a.startswith('--rtt=')), 5.0)
+        use_mongomock(rtt_ms)
+    lines = in_process(runs)
+    if rtt_ms is not None:
+        lines.append(f"(mongomock, simulated RTT {rtt_ms:g} ms per command)")
+    if '--process' in sys.argv:
+        lines += process_boot(max(1, runs // 2), rtt_ms)
+    out = "\n".join(lines)
+    print(out)
+    with open(os.path.join(ROOT, 'bench_output.txt'), 'w') as f:
+        f.write(out + "\n")
+
+if __name__ == '__main__':
+    main()
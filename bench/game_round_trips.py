@@ -0,0 +1,106 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== bench/game_round_trips.py (Mongo round trips per game call) =====
+#
+# Usage:
+#   MONGODB_URI=... MONGODB_DB=filmyfund_bench python bench/game_round_trips.py [rounds]
+#
+# Har game method ke liye gintaa hai kitne Mongo commands request thread pe chale
+# (user ko wait karna padta hai) aur kitne write buffer thread pe (background).
+# Bench user `MONGODB_DB` mein banta hai — production DB pe mat chalao.
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', 'bench')
+os.environ.setdefault('MONGODB_DB', 'filmyfund_bench')
+
+from pymongo import monitoring
+
+BENCH_USER = 990000001
+
+class RoundTripCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_thread = Counter()
+        self.commands = Counter()
+
+    def reset(self):
+        with self.lock:
+            self.by_thread.clear()
+            self.commands.clear()
+
+    def started(self, event):
+        if event.command_name in ('ping', 'hello', 'isMaster', 'endSessions'):
+            return
+        with self.lock:
+            self.by_thread[threading.get_ident()] += 1
+            self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    counter = RoundTripCounter()
+    monitoring.register(counter)
+
+    from config import Config
+    from database import Database
+    db = Database(Config())
+    db.users.delete_many({'user_id': BENCH_USER})
+    db.add_user({'user_id': BENCH_USER, 'first_name': 'Bench'})
+
+    cases = {
+        'spin':          lambda: db.process_game_spin(BENCH_USER),
+        'coin':          lambda: db.process_game_coin(BENCH_USER, 'heads', 1),
+        'dice':          lambda: db.process_game_dice(BENCH_USER, 3),
+        'scratch':       lambda: db.process_game_scratch(BENCH_USER),
+        'color':         lambda: db.process_game_color(BENCH_USER, 'red', 1),
+        'guess':         lambda: db.process_game_guess(BENCH_USER, 5, 1),
+        'crash_start':   lambda: db.process_crash_start(BENCH_USER, 0),
+        'crash_cashout': lambda: db.process_crash_cashout(BENCH_USER, 1, 1.5, 1.5),
+        'runner_start':  lambda: db.runner_start(BENCH_USER, '10s', 0),
+        'runner_finish': lambda: db.runner_finish(BENCH_USER, '10s', 0, 8),
+    }
+
+    me = threading.get_ident()
+    lines = [f"{'game':<15}{'request-thread RT/call':>24}{'background RT/call':>22}{'ms/call':>10}"]
+    for name, fn in cases.items():
+        # Har round ke liye passes/balance/cap fresh — capped path bhi normal path jaisa hi gine
+        db.users.update_one({'user_id': BENCH_USER}, {'$set': {'passes': rounds * 2, 'balance': 1000.0, 'game_day': None}})
+        db.user_cache.clear()
+        db.writer.flush()
+        counter.reset()
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        elapsed = (time.perf_counter() - t0) * 1000 / rounds
+        fg = counter.by_thread[me]
+        db.writer.flush()  # baaki buffered side effects bhi gin lo (ye background ka kaam hai)
+        bg = sum(counter.by_thread.values()) - fg
+        lines.append(f"{name:<15}{fg / rounds:>24.2f}{bg / rounds:>22.2f}{elapsed:>10.1f}")
+
+    db.users.delete_many({'user_id': BENCH_USER})
+    db.cleanup()
+    out = "\n".join(lines)
+    print(out)
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench_output.txt'), 'w') as f:
+        f.write(out + "\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,477 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== bench/load_suite.py (offline mixed-traffic load test) =====
+#
+# Usage:
+#   mongod --dbpath /tmp/bench-db &          # ya koi bhi local mongod
+#   python bench/load_suite.py [--users 2000] [--requests 5000] [--concurrency 16] [--client test|http]
+#                              [--mongomock] [--baseline bench/load_baseline.json] [--save-baseline]
+#                              [--tolerance 0.25]
+#
+# Flask `app` ko local Database ke saath boot karta hai (default mongodb://127.0.0.1:27017,
+# DB `filmyfund_bench` — har run pe drop hota hai, isliye naam mein 'bench' zaroori hai),
+# N synthetic users + referrals + withdrawals seed karta hai, phir weighted mix chalata hai:
+#   bootstrap, spin, claim-ad, daily bonus, leaderboard, webhook (log channel posts replay)
+# --client test → Flask test client (sirf app code), http → waitress + http.client (WSGI server bhi).
+# --mongomock   → mongomock (agar installed) — network nahi, par kuch aggregation stages ($type, $lookup
+#                 pipeline ...) support nahi karta; un routes ke errors report mein dikhte hain (neeche
+#                 "failures" lines), baseline ke liye local mongod use karo.
+#
+# Webhook posts bot loop pe UpdateIngest → PTB process_update → handle_log_channel_message tak jaate hain.
+# Bot API ek band local port pe point hota hai — referrer notify calls turant fail (offline run).
+#
+# Error = HTTP 5xx / connection fail, ya JSON body mein `success: false` / `error` — routes apne exceptions
+# pakad ke 200 lautate hain, sirf status dekhna functional regression kabhi nahi pakadta. Har route ka
+# pehla failure message report mein.
+# Report: per route p50/p95/p99 (ms), req/s, errors. Exit code 1 agar: webhook ingest mein koi update
+# error / drain timeout; ya baseline file ho aur kisi route ka p95 `tolerance` se zyada badha, req/s utna
+# gira, error rate badha, ya run ke params (users / requests / concurrency / client / mongomock) alag hain.
+
+import argparse
+import asyncio
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('BOT_TOKEN', '123456:bench')
+os.environ.setdefault('MONGODB_URI', 'mongodb://127.0.0.1:27017')
+os.environ.setdefault('MONGODB_DB', 'filmyfund_bench')
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'bench', 'load_baseline.json')
+USER_BASE = 880000001
+DEAD_BOT_API = 'http://127.0.0.1:9/bot'   # discard port — connection refused, koi asli Telegram call nahi
+
+MIX = (
+    ('bootstrap',   30),
+    ('spin',        20),
+    ('leaderboard', 15),
+    ('webhook',     15),
+    ('claim_ad',    10),
+    ('daily_bonus', 10),
+)
+
+# ========== SEED ==========
+
+def seed(db, users, rng):
+    """ users / referrals / withdrawals — har 4th user ka referrer, aadhe referrals pending (webhook activate kare). """
+    now = datetime.now()
+    docs, refs, withdrawals = [], [], []
+    for i in range(users):
+        uid = USER_BASE + i
+        referrer = USER_BASE + rng.randrange(0, max(users // 10, 1)) if i % 4 == 0 and i >= users // 10 else None
+        docs.append({
+            'user_id': uid, 'first_name': f'Bench{i}', 'username': '', 'referrer_id': referrer,
+            'balance': float(rng.randint(0, 500)), 'total_earned': 0.0, 'today_earned': 0.0,
+            'today_date': now.date().isoformat(), 'tier': 1, 'total_refs': 0, 'active_refs': 0,
+            'pending_refs': 0, 'daily_streak': 0, 'last_daily': None, 'channel_joined': False,
+            'total_searches': 0, 'join_date': now - timedelta(days=rng.randint(0, 60)), 'last_active': now,
+            'is_admin': False, 'suspicious_activity': False, 'withdrawal_blocked': False,
+            'games_won': 0, 'total_game_earned': 0.0, 'passes': 1_000_000,   # spin kabhi pass pe na ruke
+        })
+        if referrer:
+            active = rng.random() < 0.5
+            refs.append({
+                'referrer_id': referrer, 'referred_id': uid, 'referred_name': f'Bench{i}',
+                'is_active': active, 'join_date': now - timedelta(days=rng.randint(0, 30)),
+                'activation_date': now if active else None, 'earnings': 0.0,
+            })
+        if i % 20 == 0:
+            withdrawals.append({
+                'user_id': uid, 'amount': float(rng.choice((50, 100, 200))), 'method': 'upi',
+                'details': {'upi_id': f'bench{i}@upi'}, 'status': rng.choice(('pending', 'completed', 'rejected')),
+                'request_date': now - timedelta(days=rng.randint(0, 30)),
+            })
+    for i in range(0, len(docs), 1000):
+        db.users.insert_many(docs[i:i + 1000], ordered=False)
+    if refs:
+        db.referrals.insert_many(refs, ordered=False)
+    if withdrawals:
+        db.withdrawals.insert_many(withdrawals, ordered=False)
+    pending = [r['referred_id'] for r in refs if not r['is_active']]
+    return {'users': users, 'referrals': len(refs), 'withdrawals': len(withdrawals), 'pending': pending}
+
+# ========== TRAFFIC ==========
+
+class Traffic:
+    """ Route name → (method, path, body). Har worker apna rng rakhta hai. """
+
+    def __init__(self, users, ad_ids, pending, rng, log_channel_id):
+        self.users = users
+        self.log_channel_id = log_channel_id
+        self.ad_ids = ad_ids or [1]
+        self.pending = list(pending)
+        self.rng = rng
+        self._update_id = 0
+        self._lock = threading.Lock()
+
+    def _uid(self):
+        return USER_BASE + self.rng.randrange(self.users)
+
+    def next(self, route):
+        uid = self._uid()
+        if route == 'bootstrap':
+            return 'GET', f'/api/bootstrap/{uid}', None
+        if route == 'spin':
+            return 'POST', '/api/game/spin', {'user_id': uid}
+        if route == 'leaderboard':
+            return 'GET', f'/api/leaderboard?mode={self.rng.choice(("weekly", "monthly", "all"))}&user_id={uid}', None
+        if route == 'claim_ad':
+            ad = self.rng.choice(self.ad_ids)
+            return 'POST', '/api/claim-ad', {'user_id': uid, 'ad_id': ad, 'reward': 1.0}
+        if route == 'daily_bonus':
+            today = (datetime.now(timezone.utc) + timedelta(hours=5, minutes=30)).date().isoformat()
+            return 'POST', '/api/claim-day-bonus', {'user_id': uid, 'date': today}
+        if route == 'webhook':
+            return 'POST', '/webhook', self._log_post()
+        raise ValueError(route)
+
+    def _log_post(self):
+        with self._lock:
+            self._update_id += 1
+            update_id = self._update_id
+        # Pending referrals activate karo (asli path), baaki #FileSent → daily search path
+        uid = self.rng.choice(self.pending) if self.pending and self.rng.random() < 0.5 else self._uid()
+        if self.rng.random() < 0.5:
+            text = f"✅ #VerifyComplete\nɪᴅ - {uid}\nNᴀᴍᴇ - Bench\nsʜᴏʀᴛʟɪɴᴋ - bench.in"
+        else:
+            text = f"#FileSent — File pahunch gayi! ✈️\nAs Bench ({uid})\nBench Movie 2024 480p\n358.7 MB"
+        return {
+            'update_id': update_id,
+            'channel_post': {
+                'message_id': update_id, 'date': int(time.time()), 'text': text,
+                'chat': {'id': self.log_channel_id, 'type': 'channel', 'title': 'Bench Log'},
+            },
+        }
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, body):
+            resp = client.open(path, method=method, json=body)
+            return resp.status_code, resp.get_data()
+        return send
+
+    def close(self):
+        pass
+
+class HttpDriver:
+    """ waitress ek thread mein (random port), har worker ka apna keep-alive connection. """
+
+    def __init__(self, app, threads):
+        from waitress.server import create_server
+        self.server = create_server(app, host='127.0.0.1', port=0, threads=threads)
+        self.port = self.server.effective_port
+        threading.Thread(target=self.server.run, daemon=True, name='bench-waitress').start()
+
+    def session(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+
+        def send(method, path, body):
+            payload = json.dumps(body) if body is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            conn.request(method, path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        return send
+
+    def close(self):
+        self.server.close()
+
+# ========== BOT LOOP (webhook replay) ==========
+
+def start_bot(main_mod, handlers):
+    """
+    Asli handler + UpdateIngest, bina Telegram ke. Bot.initialize() get_me (network) karta hai —
+    isliye bot user pehle se set karke bot ko initialized mark karte hain, phir app.initialize()
+    baaki (update processor / updater) offline hi kar leta hai. process_update ko initialized app chahiye.
+    """
+    from telegram import User
+    from telegram.ext import Application, MessageHandler, filters
+    from metrics import metrics
+
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        app = Application.builder().token(os.environ['BOT_TOKEN']).base_url(DEAD_BOT_API).build()
+        app.add_handler(MessageHandler(
+            filters.Chat(main_mod.LOG_CHANNEL_ID) & filters.UpdateType.CHANNEL_POSTS & filters.TEXT,
+            metrics.instrument(handlers.handle_log_channel_message)
+        ))
+
+        async def boot():
+            bot_id = int(os.environ['BOT_TOKEN'].split(':')[0])
+            app.bot._bot_user = User(id=bot_id, is_bot=True, first_name='Bench', username='bench_bot')
+            app.bot._initialized = True
+            await app.initialize()
+            main_mod.ingest.start(app)
+            main_mod.bot_app, main_mod.bot_loop = app, loop
+            ready.set()
+        loop.run_until_complete(boot())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True, name='bench-bot').start()
+    ready.wait(10)
+    return loop
+
+def failure(status, body):
+    """ Response fail hua? → reason string ya None. 2xx JSON mein bhi success false / error dekho. """
+    if status >= 500:
+        return f"HTTP {status}"
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return None   # JSON nahi (HTML / 304) — status hi kaafi
+    if isinstance(data, dict):
+        if data.get('success') is False:
+            return str(data.get('message') or data.get('error') or 'success: false')[:120]
+        if data.get('error'):
+            return str(data['error'])[:120]
+    return None
+
+def drain(ingest, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        s = ingest.stats()
+        if s['depth'] == 0 and s['in_flight'] == 0:
+            return True
+        time.sleep(0.05)
+    return False
+
+# ========== RUN ==========
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))   # nearest rank
+    return sorted_values[k]
+
+def drive(driver, traffic_seed, args, users, ad_ids, pending, log_channel_id):
+    routes = [r for r, _ in MIX]
+    weights = [w for _, w in MIX]
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    reasons = {}   # route → pehla failure message
+    lock = threading.Lock()
+    counter = {'left': args.requests}
+
+    def worker(n):
+        rng = random.Random(traffic_seed + n)
+        traffic = Traffic(users, ad_ids, pending, rng, log_channel_id)
+        traffic._update_id = n * 10_000_000   # har worker ka alag update_id range (dedup na ho)
+        send = driver.session()
+        local, local_err, local_why = defaultdict(list), defaultdict(int), {}
+        while True:
+            with lock:
+                if counter['left'] <= 0:
+                    break
+                counter['left'] -= 1
+            route = rng.choices(routes, weights)[0]
+            method, path, body = traffic.next(route)
+            t0 = time.perf_counter()
+            try:
+                status, payload = send(method, path, body)
+            except Exception as e:
+                status, payload = 599, str(e).encode()
+            local[route].append((time.perf_counter() - t0) * 1000)
+            why = failure(status, payload)
+            if why:
+                local_err[route] += 1
+                local_why.setdefault(route, why)
+        with lock:
+            for route, values in local.items():
+                samples[route].extend(values)
+            for route, n_err in local_err.items():
+                errors[route] += n_err
+            for route, why in local_why.items():
+                reasons.setdefault(route, why)
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f'bench-{i}') for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    report = {}
+    for route, _ in MIX:
+        values = sorted(samples.get(route, []))
+        if not values:
+            continue
+        report[route] = {
+            'count': len(values),
+            'errors': errors.get(route, 0),
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'p99': round(percentile(values, 99), 2),
+            'rps': round(len(values) / wall, 1),
+        }
+        if route in reasons:
+            report[route]['first_error'] = reasons[route]
+    return report, wall
+
+def compare(report, baseline, tolerance, params):
+    """ p95 / req/s `tolerance` se bahar, error rate badha, ya run ke params baseline se alag → failures. """
+    failures = []
+    base_params = baseline.get('params') or {}
+    for key, value in params.items():
+        if base_params.get(key) != value:
+            failures.append(f"params: {key}={value} but baseline was run with {key}={base_params.get(key)} "
+                            f"— same params se chalao ya --save-baseline")
+    if failures:
+        return failures
+    for route, base in baseline.get('routes', {}).items():
+        cur = report.get(route)
+        if not cur:
+            failures.append(f"{route}: missing from this run (baseline had {base.get('count', 0)} requests)")
+            continue
+        base_rate = base.get('errors', 0) / max(base.get('count', 0), 1)
+        cur_rate = cur['errors'] / max(cur['count'], 1)
+        if cur_rate > base_rate + 0.001:
+            failures.append(f"{route}: error rate {cur_rate:.1%} > baseline {base_rate:.1%}")
+        if base.get('p95') and cur['p95'] > base['p95'] * (1 + tolerance):
+            failures.append(f"{route}: p95 {cur['p95']}ms > baseline {base['p95']}ms (+{tolerance:.0%})")
+        if base.get('rps') and cur['rps'] < base['rps'] * (1 - tolerance):
+            failures.append(f"{route}: {cur['rps']} req/s < baseline {base['rps']} req/s (-{tolerance:.0%})")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='EarnZone offline load test')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--client', choices=('test', 'http'), default='test')
+    parser.add_argument('--mongomock', action='store_true', help='in-memory mongomock (mongod ki jagah)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    db_name = os.environ['MONGODB_DB']
+    if 'bench' not in db_name:
+        sys.exit(f"MONGODB_DB={db_name} — bench DB har run pe drop hota hai, naam mein 'bench' rakho")
+
+    import database
+    if args.mongomock:
+        import mongomock
+        database.MongoClient = mongomock.MongoClient
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    import main as main_mod
+    from config import Config
+    from async_db import AsyncDatabase
+    from handlers import Handlers
+    from webhook_queue import UpdateIngest
+
+    config = Config()
+    db = database.Database(config)
+    if not db.connected:
+        sys.exit(f"Mongo connect nahi hua ({config.MONGODB_URI}) — local mongod chalao ya --mongomock")
+    db.client.drop_database(db_name)
+    db.cleanup()
+    db = database.Database(config)
+    db.apply_schema()   # indexes + default ads fresh DB pe (python main.py migrate jaisa)
+
+    rng = random.Random(args.seed)
+    t0 = time.perf_counter()
+    seeded = seed(db, args.users, rng)
+    print(f"Seeded {seeded['users']} users, {seeded['referrals']} referrals "
+          f"({len(seeded['pending'])} pending), {seeded['withdrawals']} withdrawals "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+    adb = AsyncDatabase(db, max_workers=config.DB_EXECUTOR_WORKERS)
+    handlers = Handlers(config, db, adb=adb)
+    main_mod.config, main_mod.db, main_mod.adb, main_mod.handlers = config, db, adb, handlers
+    main_mod.ingest = UpdateIngest(workers=config.WEBHOOK_WORKERS, max_pending=max(config.WEBHOOK_MAX_PENDING, args.requests),
+                                   dedup_window=config.WEBHOOK_DEDUP_WINDOW)
+    bot_loop = start_bot(main_mod, handlers)
+
+    ad_ids = [a['id'] for a in db.ads.find({}, {'id': 1})]
+    driver = HttpDriver(main_mod.app, args.concurrency) if args.client == 'http' else TestClientDriver(main_mod.app)
+    try:
+        report, wall = drive(driver, args.seed, args, args.users, ad_ids, seeded['pending'],
+                             main_mod.LOG_CHANNEL_ID)
+        drained = drain(main_mod.ingest)
+        db.writer.flush()
+    finally:
+        driver.close()
+
+    ingest_stats = main_mod.ingest.stats()
+    lines = [f"{'route':<13}{'count':>7}{'err':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}"]
+    for route, r in report.items():
+        lines.append(f"{route:<13}{r['count']:>7}{r['errors']:>6}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}{r['rps']:>9.1f}")
+    lines.append(f"total {sum(r['count'] for r in report.values())} requests in {wall:.1f}s "
+                 f"({args.client} client, concurrency {args.concurrency})")
+    for route, r in report.items():
+        if r.get('first_error'):
+            lines.append(f"failures {route}: {r['errors']}/{r['count']} — e.g. {r['first_error']}")
+    lines.append(f"webhook ingest: processed {ingest_stats['processed']}, errors {ingest_stats['errors']}, "
+                 f"slowest {ingest_stats['slowest_ms']}ms{'' if drained else ' — queue drain TIMEOUT'}")
+    out = "\n".join(lines)
+    print(out)
+    with open(os.path.join(ROOT, 'bench_output.txt'), 'w') as f:
+        f.write(out + "\n")
+
+    status = 0
+    params = {'users': args.users, 'requests': args.requests, 'concurrency': args.concurrency,
+              'client': args.client, 'mongomock': args.mongomock}
+    if ingest_stats['errors'] or not drained:
+        # Webhook errors route ke 200 mein nahi dikhte (ingest async hai) — alag se fail
+        print(f"FAIL webhook ingest: {ingest_stats['errors']} update errors"
+              f"{'' if drained else ', queue did not drain'} — handle_log_channel_message tak nahi pahunche")
+        status = 1
+    elif args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'created': datetime.now().isoformat(timespec='seconds'),
+                       'params': params, 'routes': report}, f, indent=2)
+        print(f"Baseline saved → {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(report, baseline, args.tolerance, params)
+        for line in failures:
+            print(f"REGRESSION {line}")
+        if failures:
+            status = 1
+        else:
+            print(f"No regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    else:
+        print(f"No baseline at {args.baseline} — --save-baseline se banao")
+
+    # Ingest workers loop band hone se pehle cancel — warna har run ke end pe pending-task tracebacks
+    try:
+        asyncio.run_coroutine_threadsafe(main_mod.ingest.stop(), bot_loop).result(10)
+    except Exception as e:
+        print(f"ingest stop: {e}")
+    bot_loop.call_soon_threadsafe(bot_loop.stop)
+    adb.shutdown()
+    db.cleanup()
+    sys.exit(status)
+
+if __name__ == '__main__':
+    main()
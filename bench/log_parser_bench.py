@@ -0,0 +1,139 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== bench/log_parser_bench.py (log channel parser — correctness + speed) =====
+#
+# Usage:
+#   python bench/log_parser_bench.py [iterations]
+#
+# Pehle CORPUS ka har message log_parser se check hota hai (tag, user_id, name) — ek bhi galat
+# ho toh exit 1. Phir purane handler parser (LEGACY, neeche copy) vs log_parser ka timing.
+# Naya format aaye toh CORPUS mein daalo.
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log_parser
+
+# (text, expected_tag, expected_user_id, expected_name) — name None = check mat karo
+CORPUS = [
+    ("✅ #VerifyComplete\nɪᴅ - 7142838312\nNᴀᴍᴇ - ʀɪᴛɪᴋᴀ\nsʜᴏʀᴛʟɪɴᴋ - softurl.in\nᴛɪᴍᴇ - 05 Apr 16:03 IST",
+     log_parser.VERIFY_COMPLETE, 7142838312, "ʀɪᴛɪᴋᴀ"),
+    ("#FileSent — File pahunch gayi! ✈️\nAs Bʜᴀɪ Bsʀ (7315805581)\nKill 2023 Hindi ORG 480p WEB-DL x264\n358.7 MB\nPremium: ✅ VIP\n05 Apr 15:55 IST",
+     log_parser.FILE_SENT, 7315805581, "Bʜᴀɪ Bsʀ"),
+    ("#NewUser ID - 7346280916 Nᴀᴍᴇ - Abhinav",
+     log_parser.NEW_USER, 7346280916, "User"),
+    ("#ShortlinkShown\n👤 677930179 | Smile :)\n🔗 softurl.in",
+     log_parser.SHORTLINK_SHOWN, 677930179, "Smile :)"),
+    ("#VerifyComplete\nID: 1234567890\nName - Rahul Kumar",
+     log_parser.VERIFY_COMPLETE, 1234567890, "Rahul Kumar"),
+    ("✅ #VerifyComplete\nɪᴅ – 5566778899\nNᴀᴍᴇ – Pooja",
+     log_parser.VERIFY_COMPLETE, 5566778899, "Pooja"),
+    ("#VerifyShortlink\n👤 Aman (5566778800)\nshortlink: gplinks",
+     log_parser.VERIFY_SHORTLINK, 5566778800, "Aman"),
+    ("Shortlink Verified ✅\nuser 8877665544 ne link complete kiya",
+     log_parser.SHORTLINK_VERIFIED, 8877665544, "User"),
+    ("#filesent\n📤 As Neha (6655443322)\nPushpa 2 (2024) Hindi 720p",
+     log_parser.FILE_SENT, 6655443322, "Neha"),
+    ("#VerifyComplete\nNᴀᴍᴇ - 12345\nɪᴅ - 9988776655",
+     log_parser.VERIFY_COMPLETE, 9988776655, "User"),
+    ("#NewUser\nID - 7000000001\n#ShortlinkShown",
+     log_parser.NEW_USER, 7000000001, "User"),
+    ("Bot restarted at 05 Apr 2025 16:03 IST",
+     None, None, None),
+    ("Server stats: 1523 users, uptime 99.9%",
+     None, None, None),
+]
+
+# Purana Handlers._parse_user_id_and_name + tag detection (logging hata ke) — sirf timing baseline
+def legacy_parse(text):
+    text_upper = text.upper()
+    has_verify = '#VERIFYCOMPLETE' in text_upper or 'VERIFYCOMPLETE' in text_upper
+    has_filesent = '#FILESENT' in text_upper or 'FILESENT' in text_upper
+    has_newuser = '#NEWUSER' in text_upper
+    has_vshort = '#VERIFYSHORTLINK' in text_upper or 'VERIFYSHORTLINK' in text_upper
+    has_slv = 'SHORTLINK VERIFIED' in text_upper
+    has_shortlink_shown = '#SHORTLINKSHOWN' in text_upper
+    if not (has_newuser or has_shortlink_shown or has_verify or has_filesent or has_vshort or has_slv):
+        return None
+    user_id = None
+    name = "User"
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if '👤' in line and '|' in line:
+            m0 = re.search(r'👤\s*(\d{5,15})\s*\|\s*(.+)', line)
+            if m0:
+                user_id = int(m0.group(1))
+                if m0.group(2).strip():
+                    name = m0.group(2).strip()[:50]
+        m = re.match(r'^ID\s*[-:]\s*(\d{5,15})', line, re.IGNORECASE)
+        if m:
+            user_id = int(m.group(1))
+        if not user_id:
+            normalized = line.replace('ɪ', 'I').replace('ᴅ', 'D').replace('ɴ', 'N')
+            m2 = re.match(r'^ID\s*[-:–—]\s*(\d{5,15})', normalized, re.IGNORECASE)
+            if m2:
+                user_id = int(m2.group(1))
+        if not user_id:
+            m3 = re.search(r'\((\d{5,15})\)', line)
+            if m3 and int(m3.group(1)) > 10000:
+                user_id = int(m3.group(1))
+                name_part = re.sub(r'\(.*\)', '', line)
+                name_part = re.sub(r'^As\s+', '', name_part.strip())
+                name_part = re.sub(r'^[👤📤✅#\s]+', '', name_part).strip()
+                if name_part:
+                    name = name_part[:50]
+        norm_line = line.replace('ᴀ', 'A').replace('ᴍ', 'M').replace('ᴇ', 'E').replace('ɴ', 'N')
+        nm = re.match(r'^NAME\s*[-:–—]\s*(.+)', norm_line, re.IGNORECASE)
+        if nm:
+            candidate_name = nm.group(1).strip()
+            if candidate_name and not re.search(r'^\d+$', candidate_name):
+                name = candidate_name[:50]
+    if not user_id:
+        for c in re.findall(r'(?<!\d)(\d{7,15})(?!\d)', text):
+            if int(c) > 1_000_000:
+                user_id = int(c)
+                break
+    return user_id, name
+
+def check():
+    failures = 0
+    for text, tag, uid, name in CORPUS:
+        got = log_parser.parse(text)
+        want = (tag, uid, name)
+        ok = got[0] == want[0] and got[1] == want[1] and (name is None or got[2] == want[2])
+        if not ok:
+            failures += 1
+            print(f"❌ {text[:40]!r}\n   want {want}\n   got  {got}")
+    print(f"Correctness: {len(CORPUS) - failures}/{len(CORPUS)} corpus messages OK")
+    return failures == 0
+
+def bench(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text, *_ in CORPUS:
+            fn(text)
+    return (time.perf_counter() - started) / (iterations * len(CORPUS)) * 1e6
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    if not check():
+        sys.exit(1)
+    legacy = bench(legacy_parse, iterations)
+    new = bench(log_parser.parse, iterations)
+    print(f"Per message ({iterations} x {len(CORPUS)} msgs): legacy {legacy:6.2f}µs | log_parser {new:6.2f}µs | {legacy / new:4.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== bot_channel.py (web ↔ bot process queue on Mongo) =====
+#
+# PROCESS_ROLE=web / bot mein Flask workers aur bot alag processes hain — beech mein `bot_queue` collection:
+#   web → bot   kind 'update'  /webhook ka Telegram update (update_id unique index = sab workers ka dedup)
+#   web → bot   kind 'send'    outbox job (messages list, `job_id`); bot bhejta hai, counts wapas isi doc mein
+# Dono ka `_id` ObjectId hai — claim `_id` order mein, yaani FIFO.
+# Bot process `BotChannel.consume()` chalata hai: queued docs batch mein claim (status 'claimed' + lease),
+# updates UpdateIngest ko, sends Outbox.deliver ko. Update doc process_update ke baad hi done hota hai,
+# haath ke docs ki lease renew hoti rehti hai — bot beech mein mar jaye toh lease khatam hone pe doc
+# dobara claim hota hai (at-least-once). Done docs TTL index se `done_at` + 1 din baad hat jaate hain.
+#
+# Web side interface Outbox (enqueue / send / status / ready) aur UpdateIngest (submit / stats) jaisa hai,
+# isliye main.py ke routes role se bekhabar hain.
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from webhook_queue import UpdateIngest
+
+logger = logging.getLogger(__name__)
+
+def _plain(message):
+    """ reply_markup / ParseMode jaise PTB objects → BSON-safe (bot side wapas de_json karta hai). """
+    out = {}
+    for key, value in message.items():
+        if hasattr(value, 'to_dict'):
+            value = value.to_dict()
+        elif isinstance(value, str):
+            value = str(value)   # ParseMode (str enum) → plain str
+        out[key] = value
+    return out
+
+class BotChannel:
+    def __init__(self, collection, poll_ms=200, lease_seconds=60, batch_size=100, send_slots=4):
+        self.collection = collection
+        self.poll_seconds = max(poll_ms, 10) / 1000
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.send_slots = send_slots
+        self.owner = uuid.uuid4().hex[:8]
+        self.counters = {'updates': 0, 'duplicate': 0, 'invalid': 0, 'jobs': 0, 'claimed': 0, 'errors': 0}
+
+    # ========== WEB SIDE (Flask workers) ==========
+
+    @property
+    def ready(self):
+        """ Outbox interface — queue hamesha khuli hai, bot process baad mein utha lega. """
+        return True
+
+    def submit(self, data):
+        """ /webhook update → queue. UpdateIngest ke constants lautata hai. """
+        update_id = data.get('update_id') if isinstance(data, dict) else None
+        if not isinstance(update_id, int):
+            self.counters['invalid'] += 1
+            return UpdateIngest.INVALID
+        try:
+            self.collection.insert_one({'kind': 'update', 'update_id': update_id, 'payload': data,
+                                        'status': 'queued', 'created_at': datetime.now()})
+        except DuplicateKeyError:
+            self.counters['duplicate'] += 1
+            return UpdateIngest.DUPLICATE
+        self.counters['updates'] += 1
+        return UpdateIngest.ACCEPTED
+
+    def enqueue(self, messages, kind='message'):
+        messages = [_plain(m) for m in messages if m.get('chat_id')]
+        job_id = uuid.uuid4().hex[:16]
+        try:
+            self.collection.insert_one({
+                'job_id': job_id, 'kind': 'send', 'label': kind, 'messages': messages, 'status': 'queued',
+                'total': len(messages), 'sent': 0, 'failed': 0, 'blocked': 0, 'error': None,
+                'created_at': datetime.now()
+            })
+        except Exception as e:
+            logger.error(f"Bot queue enqueue error ({kind}): {e}")
+            return None
+        self.counters['jobs'] += 1
+        return job_id
+
+    def send(self, chat_id, text, kind='message', **kwargs):
+        return self.enqueue([dict(kwargs, chat_id=chat_id, text=text)], kind=kind)
+
+    def status(self, job_id):
+        job = self.collection.find_one({'job_id': job_id}, {'_id': 0, 'messages': 0, 'created_at': 0, 'lease_until': 0,
+                                                            'owner': 0, 'claim': 0, 'done_at': 0})
+        if not job:
+            return None
+        job['kind'] = job.pop('label', 'message')
+        if job['status'] == 'claimed':
+            job['status'] = 'sending'
+        return job
+
+    def stats(self):
+        return dict(self.counters, mode='bot_queue',
+                    depth=self.collection.count_documents({'status': 'queued'}, limit=10000))
+
+    # ========== BOT SIDE ==========
+
+    def _claimable(self, kind):
+        return {'kind': kind, '$or': [{'status': 'queued'},
+                                      {'status': 'claimed', 'lease_until': {'$lt': datetime.now()}}]}
+
+    def claim(self, kind, limit):
+        """
+        Sabse purane `limit` queued (ya lease-expired) docs → claimed, 3 round trips mein chahe kitne bhi.
+        update_many ka filter dobara eligibility check karta hai aur har batch ka apna `claim` token hai —
+        doosra consumer beech mein wahi doc le gaya ho toh woh hamare result mein nahi aata.
+        """
+        if limit <= 0:
+            return []
+        ids = [d['_id'] for d in self.collection.find(self._claimable(kind), {'_id': 1}).sort('_id', 1).limit(limit)]
+        if not ids:
+            return []
+        token = uuid.uuid4().hex[:12]
+        self.collection.update_many(
+            {**self._claimable(kind), '_id': {'$in': ids}},
+            {'$set': {'status': 'claimed', 'owner': self.owner, 'claim': token,
+                      'lease_until': datetime.now() + timedelta(seconds=self.lease_seconds)}}
+        )
+        return list(self.collection.find({'_id': {'$in': ids}, 'claim': token}).sort('_id', 1))
+
+    def renew(self, doc_ids):
+        """ Haath mein pade docs ki lease aage — lamba send job / slow update dobara claim na ho. """
+        if doc_ids:
+            self.collection.update_many(
+                {'_id': {'$in': list(doc_ids)}, 'owner': self.owner, 'status': 'claimed'},
+                {'$set': {'lease_until': datetime.now() + timedelta(seconds=self.lease_seconds)}}
+            )
+
+    def release(self, doc_ids):
+        if doc_ids:
+            self.collection.update_many({'_id': {'$in': list(doc_ids)}, 'owner': self.owner},
+                                        {'$set': {'status': 'queued'}, '$unset': {'lease_until': ''}})
+
+    def complete(self, doc_ids, **fields):
+        self.collection.update_many(
+            {'_id': {'$in': list(doc_ids)}},
+            {'$set': dict(fields, status='done', done_at=datetime.now()), '$unset': {'payload': '', 'lease_until': ''}}
+        )
+
+    async def consume(self, adb, ingest, outbox, bot):
+        """
+        Bot loop task. Updates: jitni UpdateIngest mein jagah hai utne ek batch mein; doc tabhi done jab
+        process_update khatam ho (on_done) — process beech mein mare toh lease ke baad dobara aata hai.
+        Sends: max `send_slots` jobs saath mein. Haath ke saare docs ki lease har lease/3 sec renew.
+        """
+        logger.info(f"✅ Bot queue consumer started (owner {self.owner})")
+        held = set()          # claimed, abhi khatam nahi (updates + sends)
+        finished = []         # process_update ho gaya — agle round mein ek update_many se done
+        pending_sends = set()
+        renewed_at = time.monotonic()
+
+        def done_cb(doc_id):
+            def cb():
+                finished.append(doc_id)
+            return cb
+
+        while True:
+            try:
+                busy = False
+                if finished:
+                    batch, finished[:] = list(finished), []
+                    held.difference_update(batch)
+                    await adb.run(self.complete, batch)
+
+                docs = await adb.run(self.claim, 'update', min(self.batch_size, ingest.free_slots))
+                if docs:
+                    busy = True
+                    self.counters['claimed'] += len(docs)
+                    refused = []
+                    for doc in docs:
+                        held.add(doc['_id'])
+                        result = ingest.submit(doc['payload'], on_done=done_cb(doc['_id']))
+                        if result == UpdateIngest.DUPLICATE:
+                            finished.append(doc['_id'])     # isi process ne pehle hi process kiya
+                        elif result != UpdateIngest.ACCEPTED:
+                            refused.append(doc['_id'])      # FULL — wapas queue, agle round
+                    if refused:
+                        held.difference_update(refused)
+                        await adb.run(self.release, refused)
+
+                jobs = await adb.run(self.claim, 'send', self.send_slots - len(pending_sends))
+                for job in jobs:
+                    busy = True
+                    self.counters['claimed'] += 1
+                    held.add(job['_id'])
+                    task = asyncio.get_running_loop().create_task(self._deliver(adb, outbox, bot, job))
+                    pending_sends.add(task)
+                    task.add_done_callback(pending_sends.discard)
+                    task.add_done_callback(lambda _t, doc_id=job['_id']: held.discard(doc_id))
+
+                if held and time.monotonic() - renewed_at > self.lease_seconds / 3:
+                    await adb.run(self.renew, held)
+                    renewed_at = time.monotonic()
+                if not busy:
+                    await asyncio.sleep(self.poll_seconds)
+            except Exception as e:
+                self.counters['errors'] += 1
+                logger.error(f"Bot queue consumer error: {e}")
+                await asyncio.sleep(max(self.poll_seconds, 1))
+
+    async def _deliver(self, adb, outbox, bot, job):
+        from telegram import InlineKeyboardMarkup
+        messages = []
+        for m in job.get('messages', []):
+            m = dict(m)
+            if isinstance(m.get('reply_markup'), dict):
+                m['reply_markup'] = InlineKeyboardMarkup.de_json(m['reply_markup'], bot)
+            messages.append(m)
+        try:
+            result = await outbox.deliver(messages, kind=job.get('label', 'message'))
+            await adb.run(self.complete, [job['_id']], sent=result['sent'], failed=result['failed'],
+                          blocked=result['blocked'], error=result['error'])
+        except Exception as e:
+            self.counters['errors'] += 1
+            logger.error(f"Bot queue job {job['_id']} error: {e}")
+            # Dobara claim nahi — aadhe bheje ja chuke ho sakte hain, duplicate messages se behtar fail dikhana
+            await adb.run(self.complete, [job['_id']], error=str(e)[:100])
@@ -0,0 +1,268 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== broadcast.py (resumable broadcast jobs) =====
+#
+# Har broadcast ek `broadcast_jobs` doc hai. Users `user_id` order mein pages mein padhte hain
+# (keyset: user_id > last_user_id), har page bounded concurrency + global token bucket se jaata hai,
+# aur page khatam hote hi progress save. Crash/restart ke baad `resume_pending()` wahi se shuru karta hai —
+# zyada se zyada ek page ke users ko message dobara mil sakta hai.
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter, Forbidden, BadRequest
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_WORDS = ('blocked', 'deactivated', 'not found', 'chat not found', 'user is deactivated')
+MAX_RETRIES = 3
+
+class TokenBucket:
+    """ Global rate limiter — `rate` tokens/sec, `capacity` tak burst. RetryAfter pe poora bucket ruk jata hai. """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """ Telegram ne flood wait bola — sab senders ruk jayein, tokens bhi khali. """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+class BroadcastEngine:
+    def __init__(self, db, adb, rate=28, concurrency=10, page_size=200, status_seconds=5):
+        self.db = db
+        self.adb = adb   # AsyncDatabase — Mongo calls bot loop ke bahar
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.status_seconds = status_seconds
+        self._tasks = {}   # job_id(str) → asyncio.Task
+
+    # ========== PUBLIC ==========
+
+    async def start(self, bot, message, status_msg):
+        """ Naya job banao (admin ka message copy hoga) aur background mein chalao. """
+        job = {
+            'status': 'running',
+            'from_chat_id': message.chat_id,
+            'message_id': message.message_id,
+            'reply_markup': message.reply_markup.to_dict() if message.reply_markup else None,
+            'status_chat_id': status_msg.chat_id,
+            'status_message_id': status_msg.message_id,
+            'last_user_id': None,
+            'total': await self._db(self.db.users.estimated_document_count),
+            'sent': 0, 'failed': 0, 'blocked': 0, 'cleaned': 0, 'purged_docs': 0, 'purge_seconds': 0.0,
+            'created_at': datetime.now(),
+            'updated_at': datetime.now()
+        }
+        result = await self._db(self.db.broadcast_jobs.insert_one, job)
+        job['_id'] = result.inserted_id
+        self._spawn(bot, job)
+        return str(job['_id'])
+
+    async def resume_pending(self, bot):
+        """ Startup pe — jo jobs 'running' reh gaye the (crash/redeploy) unhe aage badhao. """
+        try:
+            jobs = await self._db(lambda: list(self.db.broadcast_jobs.find({'status': 'running'})))
+            for job in jobs:
+                if str(job['_id']) not in self._tasks:
+                    logger.info(f"📢 Resuming broadcast {job['_id']} after user_id {job.get('last_user_id')}")
+                    self._spawn(bot, job)
+            return len(jobs)
+        except Exception as e:
+            logger.error(f"Broadcast resume error: {e}")
+            return 0
+
+    async def cancel(self, job_id):
+        from bson.objectid import ObjectId
+        result = await self._db(self.db.broadcast_jobs.update_one,
+                                {'_id': ObjectId(job_id), 'status': 'running'},
+                                {'$set': {'status': 'cancelled', 'updated_at': datetime.now()}})
+        return result.modified_count > 0
+
+    def is_running(self, job_id):
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    # ========== JOB LOOP ==========
+
+    def _spawn(self, bot, job):
+        job_id = str(job['_id'])
+        task = asyncio.get_running_loop().create_task(self._run(bot, job))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, bot, job):
+        job_id = job['_id']
+        markup = self._build_markup(bot, job.get('reply_markup'))
+        sem = asyncio.Semaphore(self.concurrency)
+        last_status = 0.0
+        job['junk'] = len(job.pop('junk_ids', None) or [])   # resume pe pichle pages ke leftovers
+        try:
+            while True:
+                current = await self._db(self.db.broadcast_jobs.find_one, {'_id': job_id}, {'status': 1})
+                if not current or current.get('status') != 'running':
+                    await self._report(bot, job, final=True, cancelled=True)
+                    return
+
+                query = {'user_id': {'$gt': job['last_user_id']}} if job.get('last_user_id') is not None else {}
+                page = await self._db(lambda: [u['user_id'] for u in self.db.users.find(query, {'user_id': 1, '_id': 0})
+                                               .sort('user_id', 1).limit(self.page_size) if u.get('user_id')])
+                if not page:
+                    break
+
+                async def send(uid):
+                    async with sem:
+                        return await self._send_one(bot, job, uid, markup)
+
+                results = await asyncio.gather(*(send(uid) for uid in page))
+                sent = results.count('sent')
+                blocked = [uid for uid, r in zip(page, results) if r == 'blocked']
+                cleaned, purged_docs, purge_seconds, leftover = 0, 0, 0.0, []
+                if blocked:
+                    try:
+                        purge = await self._db(self.db.remove_blocked_users, blocked)
+                        cleaned = purge['deleted'].get('users', 0)
+                        purged_docs = sum(purge['deleted'].values())
+                        purge_seconds = purge['seconds']
+                        leftover = blocked if purge['failed'] else []
+                    except Exception as e:
+                        logger.error(f"Broadcast {job_id} cleanup error: {e}")
+                        leftover = blocked
+
+                # Page checkpoint — yahin se resume hoga
+                inc = {'sent': sent, 'failed': len(page) - sent, 'blocked': len(blocked), 'cleaned': cleaned,
+                       'purged_docs': purged_docs, 'purge_seconds': purge_seconds}
+                job['last_user_id'] = page[-1]
+                for k, v in inc.items():
+                    job[k] = job.get(k, 0) + v
+                update = {'$set': {'last_user_id': page[-1], 'updated_at': datetime.now()}, '$inc': inc}
+                if leftover:
+                    # Auto-clean fail hua — admin panel ka "clean junk users" inhe dobara purge karta hai
+                    update['$addToSet'] = {'junk_ids': {'$each': leftover}}
+                    job['junk'] = job.get('junk', 0) + len(leftover)
+                await self._db(self.db.broadcast_jobs.update_one, {'_id': job_id}, update)
+
+                if time.monotonic() - last_status >= self.status_seconds:
+                    last_status = time.monotonic()
+                    await self._report(bot, job)
+
+            await self._db(self.db.broadcast_jobs.update_one, {'_id': job_id, 'status': 'running'},
+                           {'$set': {'status': 'done', 'finished_at': datetime.now()}})
+            logger.info(f"📢 Broadcast {job_id} done | sent {job['sent']} | failed {job['failed']} | cleaned {job['cleaned']} "
+                        f"({job.get('purged_docs', 0)} docs in {job.get('purge_seconds', 0):.1f}s)")
+            await self._report(bot, job, final=True)
+        except asyncio.CancelledError:
+            raise   # shutdown — job 'running' hi rahega, next start pe resume
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} error: {e}")
+            # 'running' chhoda toh agla start ise resume karega — failed mark karo, admin ko final report
+            try:
+                await self._db(self.db.broadcast_jobs.update_one, {'_id': job_id, 'status': 'running'},
+                               {'$set': {'status': 'failed', 'error': str(e)[:200], 'finished_at': datetime.now()}})
+            except Exception as mark_error:
+                logger.error(f"Broadcast {job_id} fail-mark error: {mark_error}")
+            await self._report(bot, job, final=True, error=str(e)[:200])
+
+    async def _send_one(self, bot, job, uid, markup):
+        """ → 'sent' | 'blocked' | 'failed' """
+        for _ in range(MAX_RETRIES):
+            await self.bucket.acquire()
+            try:
+                await bot.copy_message(
+                    chat_id=uid,
+                    from_chat_id=job['from_chat_id'],
+                    message_id=job['message_id'],
+                    reply_markup=markup
+                )
+                return 'sent'
+            except RetryAfter as e:
+                wait = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                logger.warning(f"Broadcast flood wait {wait}s")
+                self.bucket.pause(wait + 1)
+            except (Forbidden, BadRequest) as e:
+                err = str(e).lower()
+                return 'blocked' if any(w in err for w in BLOCKED_WORDS) else 'failed'
+            except Exception as e:
+                logger.debug(f"Broadcast send {uid} error: {e}")
+                return 'failed'
+        return 'failed'
+
+    # ========== HELPERS ==========
+
+    @staticmethod
+    def _build_markup(bot, original):
+        """ Admin ke message ke buttons + neeche OK/Delete row """
+        rows = []
+        if original:
+            existing = InlineKeyboardMarkup.de_json(original, bot)
+            if existing:
+                rows = [list(r) for r in existing.inline_keyboard]
+        rows.append([
+            InlineKeyboardButton("✅ OK", callback_data="bc_ok"),
+            InlineKeyboardButton("🗑️ Delete", callback_data="bc_delete")
+        ])
+        return InlineKeyboardMarkup(rows)
+
+    async def _report(self, bot, job, final=False, cancelled=False, error=None):
+        done = job['sent'] + job['failed']
+        if final:
+            title = ("❌ **Broadcast Failed**" if error else
+                     "⏹️ **Broadcast Stopped**" if cancelled else "✅ **Broadcast Complete!**")
+            text = (f"{title}\n\n"
+                    f"📨 Sent: {job['sent']}\n"
+                    f"❌ Failed: {job['failed']}\n"
+                    f"🚫 Blocked/Deleted: {job['blocked']}\n"
+                    f"🧹 Auto-cleaned: {job['cleaned']} users DB se remove\n")
+            if job.get('purged_docs'):
+                rate = job['cleaned'] / job['purge_seconds'] if job.get('purge_seconds') else job['cleaned']
+                text += f"   ↳ {job['purged_docs']} docs, {job.get('purge_seconds', 0):.1f}s ({rate:.0f} users/s)\n"
+            text += f"👥 Total: {done}"
+            if error:
+                text += f"\n\n⚠️ Error: `{error.replace('`', '')}`"
+            markup = None
+            if job.get('junk'):
+                markup = InlineKeyboardMarkup([[InlineKeyboardButton(
+                    f"🧹 CLEAN {job['junk']} JUNK USERS", callback_data="admin_clear_junk")]])
+        else:
+            text = (f"📢 Progress: {done}/{job.get('total', '?')} users\n"
+                    f"✅ Sent: {job['sent']} | ❌ Failed: {job['failed']} | 🚫 Blocked: {job['blocked']}")
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton("⏹️ STOP", callback_data=f"bc_stop_{job['_id']}")]])
+        try:
+            await bot.edit_message_text(
+                chat_id=job['status_chat_id'], message_id=job['status_message_id'],
+                text=text, reply_markup=markup, parse_mode='Markdown' if final else None
+            )
+        except Exception as e:
+            logger.debug(f"Broadcast status edit error: {e}")
+
+    async def _db(self, fn, *args, **kwargs):
+        return await self.adb.run(fn, *args, **kwargs)
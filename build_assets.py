@@ -0,0 +1,248 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== build_assets.py (Mini App bundle split) =====
+#
+# Usage:  python build_assets.py
+#
+# templates/index.html hi source hai (edit wahin karo). Ye script usse banata hai:
+#   static/dist/app.<hash>.css            — poora <style> block
+#   static/dist/core.<hash>.js            — home/UI ka JS (games ke bina)
+#   static/dist/game-<name>.<hash>.js     — har heavy game alag, game kholne pe load
+#   templates/index.built.html            — shell jo main.py serve karta hai
+# Har asset ka .gz (aur brotli ho toh .br) bhi — main.py bina dobara compress kiye bhejta hai.
+# Game functions ke liye core mein chhote stubs banate hain: pehli call pe bundle load,
+# phir asli function chalta hai. Build na chala ho toh main.py purana single-file serve karta hai.
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+SRC = os.path.join(BASE_DIR, 'templates', 'index.html')
+OUT_HTML = os.path.join(BASE_DIR, 'templates', 'index.built.html')
+DIST_DIR = os.path.join(BASE_DIR, 'static', 'dist')
+DIST_URL = '/static/dist'
+
+# Bundle → us bundle ke section banners (title ka shuru wala hissa, "// =====" ke baad wali line).
+# Runner game hat chuka hai (openGame sirf toast dikhata hai) — uska banner khali hai, koi bundle nahi.
+GAME_SECTIONS = {
+    'crash':      ['🚀 CRASH GAME'],
+    'quiz':       ['🧠 QUIZ GAME'],
+    'maze':       ['📦 SOKOBAN', 'SOKOBAN'],
+    'snake':      ['🐍 SNAKE'],
+    'chess':      ['♟️ CHESS'],
+    'blockblast': ['🧱 BLOCK BLAST'],
+    'gemmatch':   ['💎 GEM MATCH'],
+    'ludo':       ['🎲 LUDO GAME'],
+    'saapsidi':   ['🐍 SAAP SIDI'],
+    'colorflow':  ['🌈 COLOR FLOW'],
+}
+
+# <img onload> callbacks — bundle load hone se pehle no-op, load ke baad ek baar khud chalte hain
+ONLOAD_HOOKS = {
+    'ludo': ['ludoBoardLoaded'],
+    'saapsidi': ['snlBoardLoaded'],
+}
+
+BANNER = re.compile(r'^// =+$')
+FUNC_DECL = re.compile(r'^(?:async\s+)?function\s+([A-Za-z_$][\w$]*)', re.M)
+VAR_DECL = re.compile(r'^(?:let|const|var)\s+(.+)$', re.M)
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def _gz(data):
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _top_level_vars(js):
+    names = set()
+    for m in VAR_DECL.finditer(js):
+        for name in re.findall(r'(?:^|,)\s*([A-Za-z_$][\w$]*)\s*(?==|,|;|$)', m.group(1)):
+            names.add(name)
+    return names
+
+def _mentions(name, text):
+    return re.search(r'(?<![\w$.])' + re.escape(name) + r'(?![\w$])', text) is not None
+
+STRING_LIT = re.compile(r"'(?:[^'\\\n]|\\.)*'|\"(?:[^\"\\\n]|\\.)*\"")
+LINE_COMMENT = re.compile(r'//[^\n]*')
+INLINE_HANDLER = re.compile(r'\son\w+="([^"]*)"')
+
+def _code_only(js):
+    """ Quoted strings + // comments hata do — ids / text mein naam aana reference nahi hai. """
+    return LINE_COMMENT.sub('', STRING_LIT.sub('""', js))
+
+def _declares(name, text):
+    return re.search(r'\b(?:let|const|var)\s+[^;]*?(?<![\w$.])' + re.escape(name) + r'\s*[=,;]', text) is not None
+
+def _foreign_refs(name, js, chunks):
+    """
+    Bundle ke top-level `let/const/var` ko core / HTML onclick / doosra bundle chhoota hai? Bundle load
+    hone se pehle woh binding hai hi nahi — read ReferenceError, assignment sloppy-mode implicit global.
+    Apna local declare karne wale chunks (shadowing) skip.
+    """
+    hits = []
+    for var in sorted(_top_level_vars(js)):
+        for label, text in chunks:
+            if _mentions(var, text) and not _declares(var, text):
+                hits.append(f"{name}: '{var}' {label} mein use hota hai — state bundle ke andar rakho (modalHooks)")
+    return hits
+
+def split_script(js):
+    """ Main script ko banner sections mein todo → (core_js, {bundle: js}) """
+    lines = js.split('\n')
+    # Title line = "// =====" / "// TITLE" / "// =====" ke beech wali line
+    titles = [i for i in range(1, len(lines) - 1)
+              if BANNER.match(lines[i - 1]) and BANNER.match(lines[i + 1])
+              and lines[i].startswith('//') and not BANNER.match(lines[i])]
+    owner = {}
+    for idx, t in enumerate(titles):
+        title = lines[t][2:].strip()
+        begin = t - 1
+        end = titles[idx + 1] - 1 if idx + 1 < len(titles) else len(lines)
+        for name, prefixes in GAME_SECTIONS.items():
+            if any(title.startswith(p) for p in prefixes):
+                for i in range(begin, end):
+                    owner[i] = name
+    core, bundles = [], {name: [] for name in GAME_SECTIONS}
+    for i, line in enumerate(lines):
+        (bundles[owner[i]] if i in owner else core).append(line)
+    return '\n'.join(core), {k: '\n'.join(v) for k, v in bundles.items() if v}
+
+def loader_script(urls, exports):
+    stubs = {name: sorted(fns) for name, fns in exports.items()}
+    return (
+        "<script>\n"
+        "// Lazy game bundles — build_assets.py ne banaya, haath se edit mat karo\n"
+        "(function(){\n"
+        f"const URLS={json.dumps(urls)};\n"
+        f"const STUBS={json.dumps(stubs)};\n"
+        f"const HOOKS={json.dumps(ONLOAD_HOOKS)};\n"
+        "const loading={};\n"
+        "window.loadGameBundle=function(name){\n"
+        "  if(!loading[name])loading[name]=new Promise((res,rej)=>{\n"
+        "    const s=document.createElement('script');s.src=URLS[name];\n"
+        "    s.onload=()=>{(HOOKS[name]||[]).forEach(f=>{try{window[f]();}catch(e){}});res();};\n"
+        "    s.onerror=()=>{delete loading[name];rej(new Error('bundle '+name));};\n"
+        "    document.head.appendChild(s);\n"
+        "  });\n"
+        "  return loading[name];\n"
+        "};\n"
+        "Object.keys(STUBS).forEach(b=>STUBS[b].forEach(fn=>{\n"
+        "  const hook=(HOOKS[b]||[]).includes(fn);\n"
+        "  const stub=function(){\n"
+        "    if(hook)return;\n"
+        "    const a=arguments,t=this;\n"
+        "    return window.loadGameBundle(b).then(()=>{\n"
+        "      if(window[fn]===stub)throw new Error(fn+' missing in '+b);\n"
+        "      return window[fn].apply(t,a);\n"
+        "    }).catch(e=>{console.warn(e);if(typeof showToast==='function')showToast('⚠️ Game load nahi hua — net check karke dobara try karo');});\n"
+        "  };\n"
+        "  window[fn]=stub;\n"
+        "}));\n"
+        "})();\n"
+        "</script>"
+    )
+
+def build():
+    src = open(SRC, encoding='utf-8').read()
+    for tag in ('{{', '{%', '{#'):
+        if tag in src:
+            sys.exit(f"❌ Source mein Jinja syntax '{tag}' hai — static files mein render nahi hoga, build rok diya")
+
+    style = re.search(r'<style>\n?(.*?)</style>', src, re.S)
+    script = re.search(r'<script charset="utf-8">\n?(.*)</script>(?=\s*</body>)', src, re.S)
+    if not style or not script:
+        sys.exit("❌ <style> ya main <script> block nahi mila")
+
+    core_js, bundles = split_script(script.group(1))
+    html_body = src[:script.start()]
+
+    # ---- safety checks: lazy split se kuch toot na jaye ----
+    core_funcs = set(FUNC_DECL.findall(core_js))
+    core_vars = _top_level_vars(core_js)
+    handlers = _code_only('\n'.join(INLINE_HANDLER.findall(html_body)))
+    code = {name: _code_only(js) for name, js in bundles.items()}
+    exports, problems = {}, []
+    for name, js in bundles.items():
+        funcs = set(FUNC_DECL.findall(js))
+        for fn in sorted(funcs & core_funcs):
+            problems.append(f"{name}: function {fn} core mein bhi declared hai")
+        for v in sorted(_top_level_vars(js) & (core_vars | core_funcs)):
+            problems.append(f"{name}: '{v}' core mein bhi declared hai (SyntaxError)")
+        others = core_js + '\n' + html_body + '\n' + '\n'.join(b for n, b in bundles.items() if n != name)
+        exports[name] = {fn for fn in funcs if _mentions(fn, others)}
+        problems += _foreign_refs(name, js, [('core', _code_only(core_js)), ('HTML handlers', handlers)]
+                                  + [(f'bundle {n}', c) for n, c in code.items() if n != name])
+        if not exports[name]:
+            problems.append(f"{name}: koi entry point nahi mila — bundle kabhi load nahi hoga")
+    if problems:
+        sys.exit("❌ Split unsafe:\n  " + "\n  ".join(problems))
+
+    # ---- write assets ----
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    def emit(stem, ext, text):
+        data = text.encode('utf-8')
+        fname = f"{stem}.{_hash(data)}.{ext}"
+        path = os.path.join(DIST_DIR, fname)
+        with open(path, 'wb') as f:
+            f.write(data)
+        with open(path + '.gz', 'wb') as f:
+            f.write(_gz(data))
+        if brotli:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+        return f"{DIST_URL}/{fname}", data
+
+    css_url, css = emit('app', 'css', style.group(1))
+    core_url, core = emit('core', 'js', core_js)
+    urls, sizes = {}, {}
+    for name, js in bundles.items():
+        urls[name], data = emit(f'game-{name}', 'js', js)
+        sizes[name] = data
+
+    shell = (
+        src[:style.start()]
+        + f'<link rel="stylesheet" href="{css_url}">'
+        + src[style.end():script.start()]
+        + loader_script(urls, exports) + '\n'
+        + f'<script src="{core_url}" charset="utf-8"></script>'
+        + src[script.end():]
+    )
+    with open(OUT_HTML, 'w', encoding='utf-8') as f:
+        f.write(shell)
+
+    # ---- report ----
+    before = src.encode('utf-8')
+    shell_b = shell.encode('utf-8')
+    first = [shell_b, css, core]
+    kb = lambda n: f"{n / 1024:8.1f} KB"
+    print("First load (HTML + CSS + core JS):")
+    print(f"  before : raw {kb(len(before))} | gzip {kb(len(_gz(before)))}")
+    print(f"  after  : raw {kb(sum(map(len, first)))} | gzip {kb(sum(len(_gz(b)) for b in first))}"
+          f"   (shell {kb(len(shell_b)).strip()}, css {kb(len(css)).strip()}, core {kb(len(core)).strip()})")
+    print("On-demand game bundles:")
+    for name, data in sizes.items():
+        print(f"  {name:<11} raw {kb(len(data))} | gzip {kb(len(_gz(data)))} | entry points: {len(exports[name])}")
+    print(f"✅ Built → {os.path.relpath(OUT_HTML, BASE_DIR)} + {os.path.relpath(DIST_DIR, BASE_DIR)}/")
+
+if __name__ == '__main__':
+    build()
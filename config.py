@@ -91,6 +91,55 @@ class Config:
         self.HAPPY_HOUR_END   = int(os.getenv('HAPPY_HOUR_END', '22'))    # 10 PM
         self.HAPPY_HOUR_MULTIPLIER = float(os.getenv('HAPPY_HOUR_MULTIPLIER', '2.0'))
 
+        # CACHES — movie group chatter ke liye "not referred" users ka negative cache
+        self.NO_REFERRAL_CACHE_SIZE = int(os.getenv('NO_REFERRAL_CACHE_SIZE', '50000'))
+        self.NO_REFERRAL_CACHE_TTL  = int(os.getenv('NO_REFERRAL_CACHE_TTL', '3600'))
+
+        # WRITE-BEHIND BUFFER — live activity jaise non-critical inserts batch mein
+        self.WRITE_BUFFER_FLUSH_MS    = int(os.getenv('WRITE_BUFFER_FLUSH_MS', '500'))
+        self.WRITE_BUFFER_BATCH_SIZE  = int(os.getenv('WRITE_BUFFER_BATCH_SIZE', '200'))
+        self.WRITE_BUFFER_MAX_PENDING = int(os.getenv('WRITE_BUFFER_MAX_PENDING', '10000'))
+
+        # LIVE FEED — ring buffer size (/api/live-activity ETag poll isi se serve hota hai)
+        self.LIVE_FEED_SIZE           = int(os.getenv('LIVE_FEED_SIZE', '50'))
+
+        # BROADCAST — global msgs/sec (Telegram ~30), parallel sends, har page ke baad progress save
+        self.BROADCAST_RATE           = float(os.getenv('BROADCAST_RATE', '28'))
+        self.BROADCAST_CONCURRENCY    = int(os.getenv('BROADCAST_CONCURRENCY', '10'))
+        self.BROADCAST_PAGE_SIZE      = int(os.getenv('BROADCAST_PAGE_SIZE', '200'))
+        self.BROADCAST_STATUS_SECONDS = int(os.getenv('BROADCAST_STATUS_SECONDS', '5'))
+
+        # OUTBOX — Flask se bot messages (nudge/reminder/notify) bot loop pe, job status kuch der memory mein
+        self.OUTBOX_CONCURRENCY       = int(os.getenv('OUTBOX_CONCURRENCY', '8'))
+        self.OUTBOX_JOB_TTL           = int(os.getenv('OUTBOX_JOB_TTL', '600'))
+
+        # BOT LOOP DB EXECUTOR — handlers ke pymongo calls is pool pe (Mongo maxPoolSize 20 ke andar)
+        self.DB_EXECUTOR_WORKERS      = int(os.getenv('DB_EXECUTOR_WORKERS', '8'))
+
+        # WEBHOOK INGEST — worker coroutines (= Telegram max_connections), queue limit, update_id dedup window
+        self.WEBHOOK_WORKERS          = int(os.getenv('WEBHOOK_WORKERS', '40'))
+        self.WEBHOOK_MAX_PENDING      = int(os.getenv('WEBHOOK_MAX_PENDING', '1000'))
+        self.WEBHOOK_DEDUP_WINDOW     = int(os.getenv('WEBHOOK_DEDUP_WINDOW', '10000'))
+
+        # PROCESS ROLE — all: Flask + bot ek process (default) | web: sirf Flask (wsgi.py, N workers) | bot: sirf PTB
+        # web ↔ bot `bot_queue` collection se (bot_channel.py); poll interval, claim lease aur claim batch size
+        self.PROCESS_ROLE             = os.getenv('PROCESS_ROLE', 'all').strip().lower()
+        if self.PROCESS_ROLE not in ('all', 'web', 'bot'):
+            raise ValueError(f"PROCESS_ROLE must be all / web / bot, got {self.PROCESS_ROLE!r}")
+        self.BOT_QUEUE_POLL_MS        = int(os.getenv('BOT_QUEUE_POLL_MS', '200'))
+        self.BOT_QUEUE_LEASE_SECONDS  = int(os.getenv('BOT_QUEUE_LEASE_SECONDS', '60'))
+        self.BOT_QUEUE_BATCH          = int(os.getenv('BOT_QUEUE_BATCH', '100'))
+        self.LIVE_FEED_SYNC_SECONDS   = int(os.getenv('LIVE_FEED_SYNC_SECONDS', '3'))
+
+        # USER CACHE — user docs per process (writes cache ko update karte hain, TTL staleness ki upper bound).
+        # Split roles mein doosre process ke writes is cache tak nahi aate — isliye default TTL chhota.
+        self.USER_CACHE_SIZE          = int(os.getenv('USER_CACHE_SIZE', '1000'))
+        self.USER_CACHE_TTL           = int(os.getenv('USER_CACHE_TTL', '300' if self.PROCESS_ROLE == 'all' else '15'))
+
+        # LAST SEEN — last_active memory mein coalesce, har N seconds ek bulk_write
+        self.LAST_SEEN_FLUSH_SECONDS  = int(os.getenv('LAST_SEEN_FLUSH_SECONDS', '60'))
+        self.LAST_SEEN_BATCH_SIZE     = int(os.getenv('LAST_SEEN_BATCH_SIZE', '500'))
+
         # SERVER
         self.PORT             = int(os.getenv('PORT', '10000'))
         self.ENVIRONMENT      = os.getenv('ENVIRONMENT', 'production')
@@ -9,30 +9,73 @@
 
 # ===== database.py (FULLY UPDATED) =====
 
+import base64
+import json
 import logging
 import random
+import threading
+import time
 from datetime import datetime, timedelta
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from bson.errors import InvalidId
 from cachetools import TTLCache
 import certifi
+from write_buffer import WriteBuffer
+from live_feed import LiveFeed
+from user_cache import UserCache
+from last_seen import LastSeenTracker
+from metrics import metrics
+from migrations import SCHEMA_VERSION, as_datetime
+from bson import ObjectId
 
 logger = logging.getLogger(__name__)
 
+def _tls_options(uri):
+    """ Atlas → certifi CA bundle (tlsCAFile TLS on kar deta hai); local mongod (bench / dev) plain TCP. """
+    hosts = uri.split('://', 1)[-1].split('/', 1)[0].split('?', 1)[0].rsplit('@', 1)[-1]
+    names = [h if h.endswith(']') else h.rsplit(':', 1)[0] for h in hosts.split(',')]
+    if all(n in ('localhost', '127.0.0.1', '[::1]') for n in names):
+        return {}
+    return {'tlsCAFile': certifi.where()}
+
+def _encode_ref_cursor(ref):
+    join_date = ref.get('join_date')
+    is_date = isinstance(join_date, datetime)   # migration se pehle ke rows mein string ho sakta hai
+    raw = json.dumps([bool(ref.get('is_active')), join_date.isoformat() if is_date else join_date,
+                      str(ref['_id']), is_date], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_ref_cursor(cursor):
+    """ (is_active, join_date, ObjectId) ya None (tampered / purana cursor). """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        is_active, join_date, last_id, is_date = json.loads(raw)
+        if is_date:
+            join_date = datetime.fromisoformat(join_date)
+        return bool(is_active), join_date, ObjectId(last_id)
+    except (ValueError, TypeError, InvalidId):
+        return None
+
 class Database:
     def __init__(self, config):
         self.config = config
         self.connected = False
-        self.user_cache = TTLCache(maxsize=1000, ttl=300)
+        self.user_cache = UserCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+        # Negative cache: jin users ka koi referral nahi hai — group chatter Mongo tak na jaye.
+        # add_user naya referral insert kare toh entry pop hoti hai; TTL baaki processes ke inserts cover karta hai.
+        self.no_referral_cache = TTLCache(maxsize=config.NO_REFERRAL_CACHE_SIZE, ttl=config.NO_REFERRAL_CACHE_TTL)
+        self._no_referral_lock = threading.Lock()
+        self.live_feed = LiveFeed(size=config.LIVE_FEED_SIZE)
 
         try:
             self.client = MongoClient(
                 config.MONGODB_URI,
                 serverSelectionTimeoutMS=5000,
                 maxPoolSize=20,
-                tlsCAFile=certifi.where()
+                **_tls_options(config.MONGODB_URI),
+                event_listeners=[metrics.listener]   # per-route / per-handler round trips
             )
-            self.client.admin.command('ping')
             self.db = self.client[config.MONGODB_DB]
 
             self.users = self.db['users']
@@ -43,7 +86,8 @@ class Database:
             self.search_logs = self.db['search_logs']
             self.channel_joins = self.db['channel_joins']
             self.daily_bonus = self.db['daily_bonus']
-            self.missions = self.db['missions']
+            self.missions = self.db['missions']            # purana (ek row per mission) — sirf migrate_missions padhta hai
+            self.mission_days = self.db['mission_days']
             self.daily_claims = self.db['daily_claims']
             self.ads = self.db['ads']
             self.system_stats = self.db['system_stats']
@@ -53,9 +97,30 @@ class Database:
             self.notifications = self.db['notifications']
             self.game_states = self.db['game_states']
             self.jackpot_bets = self.db['jackpot_bets']
-
-            self._create_indexes()
-            self._init_default_ads()
+            self.leaderboard_periods = self.db['leaderboard_periods']
+            self.broadcast_jobs = self.db['broadcast_jobs']
+            self.bot_queue = self.db['bot_queue']          # PROCESS_ROLE web ↔ bot (bot_channel.py)
+
+            # Boot pe sirf ek read — indexes + seed `python main.py migrate` ka kaam (apply_schema).
+            # Ye read hi connection check hai (ServerSelectionTimeoutError bhi ConnectionFailure hai).
+            state = self.db['migrations'].find_one({'_id': 'schema'}) or {}
+            self.schema_version = state.get('version', 0)
+            if self.schema_version < SCHEMA_VERSION:
+                logger.warning(f"DB schema v{self.schema_version} < v{SCHEMA_VERSION} — `python main.py migrate` chalao")
+
+            self.writer = WriteBuffer(
+                flush_ms=config.WRITE_BUFFER_FLUSH_MS,
+                batch_size=config.WRITE_BUFFER_BATCH_SIZE,
+                max_pending=config.WRITE_BUFFER_MAX_PENDING
+            )
+            if config.PROCESS_ROLE != 'all':
+                # Doosre processes ke live events bhi is process ke SSE / feed tak
+                self.live_feed.follow(self.live_activity, interval=config.LIVE_FEED_SYNC_SECONDS)
+            self.last_seen = LastSeenTracker(
+                self.users,
+                flush_seconds=config.LAST_SEEN_FLUSH_SECONDS,
+                batch_size=config.LAST_SEEN_BATCH_SIZE
+            )
 
             self.connected = True
             logger.info("MongoDB Connected Successfully!")
@@ -65,47 +130,72 @@ class Database:
             self.connected = False
             raise e
 
+    # ========== SCHEMA (python main.py migrate) ==========
+
+    def apply_schema(self):
+        """ Indexes + default ads, phir `migrations` mein schema version. Koi step fail ho toh version nahi likhta. """
+        started = time.time()
+        self._create_indexes()
+        self._init_default_ads()
+        self.db['migrations'].update_one(
+            {'_id': 'schema'},
+            {'$set': {'version': SCHEMA_VERSION, 'applied_at': datetime.now()}},
+            upsert=True
+        )
+        self.schema_version = SCHEMA_VERSION
+        logger.info(f"DB schema v{SCHEMA_VERSION} applied in {time.time() - started:.1f}s")
+        return SCHEMA_VERSION
+
     def _create_indexes(self):
-        try:
-            self.users.create_index('user_id', unique=True)
-            self.users.create_index('referrer_id')
-            self.users.create_index('last_active')
-            self.users.create_index('balance')
-            self.referrals.create_index([('referrer_id', ASCENDING), ('referred_id', ASCENDING)], unique=True)
-            self.referrals.create_index('is_active')
-            self.referrals.create_index('activation_date')  # NEW: for month_active_refs query
-            self.daily_searches.create_index([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)
-            self.search_logs.create_index([('user_id', ASCENDING), ('timestamp', DESCENDING)])
-            self.search_logs.create_index('timestamp', expireAfterSeconds=2592000)
-            self.withdrawals.create_index([('user_id', ASCENDING), ('request_date', DESCENDING)])
-            self.withdrawals.create_index('status')
-            self.channel_joins.create_index([('user_id', ASCENDING), ('channel_id', ASCENDING)], unique=True)
-            self.daily_bonus.create_index([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)
-            self.daily_bonus.create_index('date')
-            self.missions.create_index([('user_id', ASCENDING), ('date', ASCENDING), ('mission_id', ASCENDING)], unique=True)
-            self.daily_claims.create_index([('user_id', ASCENDING), ('ad_id', ASCENDING)], unique=True)
-            self.ads.create_index('id', unique=True)
-            self.live_activity.create_index('timestamp', expireAfterSeconds=604800)
-            self.live_activity.create_index('user_id')
-            self.issues.create_index([('user_id', ASCENDING), ('timestamp', DESCENDING)])
-            self.issues.create_index('status')
-            self.game_states.create_index([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)
-            self.jackpot_bets.create_index([('user_id', ASCENDING), ('round_id', ASCENDING)])
-            logger.info("Database indexes created")
-        except Exception as e:
-            logger.error(f"Index creation error: {e}")
+        self.users.create_index('user_id', unique=True)
+        self.users.create_index('referrer_id')
+        self.users.create_index('last_active')
+        self.users.create_index('balance')
+        self.users.create_index([('suspicious_activity', ASCENDING), ('active_refs', DESCENDING), ('user_id', ASCENDING)])  # rank
+        self.referrals.create_index([('referrer_id', ASCENDING), ('referred_id', ASCENDING)], unique=True)
+        self.referrals.create_index('referred_id')  # group message / activation lookups
+        self.referrals.create_index('is_active')
+        # get_ref_activity keyset page: referrer ke refs, active pehle, phir naye joins
+        self.referrals.create_index([('referrer_id', ASCENDING), ('is_active', DESCENDING),
+                                     ('join_date', DESCENDING), ('_id', DESCENDING)])
+        self.referrals.create_index('activation_date')  # NEW: for month_active_refs query
+        self.daily_searches.create_index([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)
+        self.search_logs.create_index([('user_id', ASCENDING), ('timestamp', DESCENDING)])
+        self.search_logs.create_index('timestamp', expireAfterSeconds=2592000)
+        self.transactions.create_index('user_id')  # purge / admin data manager deletes
+        self.withdrawals.create_index([('user_id', ASCENDING), ('request_date', DESCENDING)])
+        self.withdrawals.create_index('status')
+        self.channel_joins.create_index([('user_id', ASCENDING), ('channel_id', ASCENDING)], unique=True)
+        self.daily_bonus.create_index([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)
+        self.daily_bonus.create_index('date')
+        self.missions.create_index([('user_id', ASCENDING), ('date', ASCENDING), ('mission_id', ASCENDING)], unique=True)
+        self.mission_days.create_index([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)
+        self.daily_claims.create_index([('user_id', ASCENDING), ('ad_id', ASCENDING)], unique=True)
+        self.ads.create_index('id', unique=True)
+        self.live_activity.create_index('timestamp', expireAfterSeconds=604800)
+        self.live_activity.create_index('user_id')
+        self.issues.create_index([('user_id', ASCENDING), ('timestamp', DESCENDING)])
+        self.issues.create_index('status')
+        self.game_states.create_index([('user_id', ASCENDING), ('date', ASCENDING)], unique=True)
+        self.jackpot_bets.create_index([('user_id', ASCENDING), ('round_id', ASCENDING)])
+        self.leaderboard_periods.create_index([('period', ASCENDING), ('referrer_id', ASCENDING)], unique=True)
+        self.leaderboard_periods.create_index([('period', ASCENDING), ('refs', DESCENDING), ('referrer_id', ASCENDING)])
+        self.broadcast_jobs.create_index('status')
+        # bot_queue: update_id dedup (sirf updates pe), claim scan, job status lookup, done docs 1 din baad
+        self.bot_queue.create_index('update_id', unique=True, partialFilterExpression={'kind': 'update'})
+        self.bot_queue.create_index([('kind', ASCENDING), ('status', ASCENDING), ('_id', ASCENDING)])
+        self.bot_queue.create_index('job_id', sparse=True)
+        self.bot_queue.create_index('done_at', expireAfterSeconds=86400)
+        logger.info("Database indexes created")
 
     def _init_default_ads(self):
-        try:
-            if self.ads.count_documents({}) == 0:
-                self.ads.insert_many([
-                    {'id': 1, 'title': 'Install App & Earn', 'reward': 2.0, 'link': 'https://t.me/+8SdeM5gBihoxZjU1', 'meta': '⏱️ 2 min • 1.2k completed', 'icon': '📱', 'order': 1, 'edited_at': None, 'claim_code': None, 'timer_seconds': 0},
-                    {'id': 2, 'title': 'Watch Video', 'reward': 0.5, 'link': 'https://t.me/+8SdeM5gBihoxZjU1', 'meta': '⏱️ 30 sec • 3.4k completed', 'icon': '🎬', 'order': 2, 'edited_at': None, 'claim_code': None, 'timer_seconds': 0},
-                    {'id': 3, 'title': 'Join Channel', 'reward': 1.0, 'link': 'https://t.me/+8SdeM5gBihoxZjU1', 'meta': '⏱️ 1 min • 5.6k completed', 'icon': '📢', 'order': 3, 'edited_at': None, 'claim_code': None, 'timer_seconds': 0}
-                ])
-                logger.info("Default ads initialized")
-        except Exception as e:
-            logger.error(f"Error initializing ads: {e}")
+        if self.ads.count_documents({}) == 0:
+            self.ads.insert_many([
+                {'id': 1, 'title': 'Install App & Earn', 'reward': 2.0, 'link': 'https://t.me/+8SdeM5gBihoxZjU1', 'meta': '⏱️ 2 min • 1.2k completed', 'icon': '📱', 'order': 1, 'edited_at': None, 'claim_code': None, 'timer_seconds': 0},
+                {'id': 2, 'title': 'Watch Video', 'reward': 0.5, 'link': 'https://t.me/+8SdeM5gBihoxZjU1', 'meta': '⏱️ 30 sec • 3.4k completed', 'icon': '🎬', 'order': 2, 'edited_at': None, 'claim_code': None, 'timer_seconds': 0},
+                {'id': 3, 'title': 'Join Channel', 'reward': 1.0, 'link': 'https://t.me/+8SdeM5gBihoxZjU1', 'meta': '⏱️ 1 min • 5.6k completed', 'icon': '📢', 'order': 3, 'edited_at': None, 'claim_code': None, 'timer_seconds': 0}
+            ])
+            logger.info("Default ads initialized")
 
     def ensure_connection(self):
         if not self.connected:
@@ -118,82 +208,99 @@ class Database:
 
     # ========== LIVE ACTIVITY ==========
 
-    def add_live_activity(self, activity_type, user_id, amount=0, description="", extra=None):
+    def add_live_activity(self, activity_type, user_id, amount=0, description="", extra=None, user_name=None):
+        """
+        Live feed event — write buffer mein queue hota hai, request thread pe DB write nahi.
+        Caller ke paas naam ho toh `user_name` pass karo, warna get_user lookup lagta hai.
+        """
         try:
-            user = self.get_user(user_id)
-            if not user:
-                return
+            if user_name is None:
+                user = self.get_user(user_id)
+                if not user:
+                    return
+                user_name = user.get('first_name', 'User')
             activity = {
+                '_id': ObjectId(),  # pehle se id — feed buffer aur DB dono mein same
                 'type': activity_type,
                 'user_id': user_id,
-                'user_name': user.get('first_name', 'User'),
+                'user_name': user_name or 'User',
                 'amount': amount,
                 'description': description,
-                'timestamp': datetime.now().isoformat(),
-                'avatar': user.get('first_name', 'U')[0].upper()
+                'timestamp': datetime.now(),
+                'avatar': (user_name or 'U')[0].upper()
             }
             if extra:
                 activity.update(extra)
-            self.live_activity.insert_one(activity)
+            self.live_feed.publish(activity)
+            self.writer.insert(self.live_activity, activity)
         except Exception as e:
             logger.error(f"Error adding live activity: {e}")
 
     def get_live_activity(self, limit=20):
+        """
+        Live feed — in-memory ring buffer se (koi DB query nahi).
+        Process start ke baad pehli call ek baar DB se buffer seed karti hai.
+        """
         try:
-            activities = list(self.live_activity.find().sort('timestamp', -1).limit(limit))
-            result = []
-            for act in activities:
-                act['_id'] = str(act['_id'])
-                time_str = act.get('timestamp', '')
-                try:
-                    timestamp = datetime.fromisoformat(time_str)
-                    diff = datetime.now() - timestamp
-                    if diff.days > 0:
-                        time_ago = f"{diff.days}d ago"
-                    elif diff.seconds // 3600 > 0:
-                        time_ago = f"{diff.seconds // 3600}h ago"
-                    elif diff.seconds // 60 > 0:
-                        time_ago = f"{diff.seconds // 60}min ago"
-                    else:
-                        time_ago = "just now"
-                except:
-                    time_ago = "recently"
+            if not self.live_feed.seeded:
+                docs = list(self.live_activity.find().sort('timestamp', -1).limit(self.live_feed.size))
+                self.live_feed.seed(docs)
+            return self.live_feed.recent(limit)
+        except Exception as e:
+            logger.error(f"Error getting live activity: {e}")
+            return self.live_feed.recent(limit)
 
-                emoji_map = {
-                    'join': '🎉', 'withdraw': '💰', 'bonus': '🎁',
-                    'mission': '🏆', 'referral': '👥', 'game': '🎮',
-                    'support': '📩', 'daily_search': '🎬'
-                }
-                emoji = emoji_map.get(act['type'], '👤')
-
-                display_text = act.get('description', '')
-                if not display_text:
-                    desc_map = {
-                        'join': 'joined the bot',
-                        'withdraw': f"withdrew ₹{act.get('amount', 0)}",
-                        'bonus': f"claimed ₹{act.get('amount', 0)} bonus",
-                        'mission': 'completed a mission',
-                        'referral': 'got a new referral',
-                        'game': f"won ₹{act.get('amount', 0)} in game",
-                        'daily_search': 'searched movie today'
-                    }
-                    display_text = desc_map.get(act['type'], 'was active')
+    # ========== HOME SNAPSHOT (Mini App bootstrap) ==========
 
-                result.append({
-                    'type': act.get('type', 'activity'),
-                    'user_name': act.get('user_name', 'User'),
-                    'user_id': act.get('user_id', 0),
-                    'amount': act.get('amount', 0),
-                    'time': time_ago,
-                    'avatar': emoji,
-                    'description': display_text,
-                    'referred_name': act.get('referred_name', ''),
-                    'referrer_name': act.get('referrer_name', '')
-                })
-            return result
+    def get_home_snapshot(self, user_id):
+        """
+        Mini App home screen ka poora data ek call mein.
+        User doc cache se; bonus days, claimed ads, ads, settings aur aaj ka game state ek hi aggregate
+        ($lookup per collection) mein aate hain — pehle har ek alag round trip tha. Missions ko user aur
+        bonus days wahi pass hote hain, unka apna sirf mission_days read bachta hai.
+        Returns None agar user nahi mila.
+        """
+        try:
+            user_id = int(user_id)
+            user = self.get_user(user_id)
+            if not user:
+                return None
+            today = datetime.now().date().isoformat()
+            rows = list(self.users.aggregate([
+                {'$match': {'user_id': user_id}},
+                {'$limit': 1},
+                {'$project': {'_id': 1}},
+                {'$lookup': {'from': 'daily_bonus', 'as': 'bonus', 'pipeline': [
+                    {'$match': {'user_id': user_id}}, {'$sort': {'date': 1}}, {'$project': {'_id': 0, 'date': 1}}]}},
+                {'$lookup': {'from': 'daily_claims', 'as': 'claims', 'pipeline': [
+                    {'$match': {'user_id': user_id}}, {'$project': {'_id': 0, 'ad_id': 1}}]}},
+                {'$lookup': {'from': 'ads', 'as': 'ads', 'pipeline': [{'$sort': {'order': 1}}]}},
+                {'$lookup': {'from': 'settings', 'as': 'settings', 'pipeline': [
+                    {'$match': {'_id': 'app_settings'}}, {'$project': {'_id': 0}}]}},
+                {'$lookup': {'from': 'game_states', 'as': 'game_state', 'pipeline': [
+                    {'$match': {'user_id': user_id, 'date': today}}]}},
+            ]))
+            if not rows:
+                return None
+            row = rows[0]
+            bonus_days = [b['date'] for b in row['bonus']]
+            game_state = self._game_state_view(row['game_state'][0] if row['game_state'] else
+                                               self._default_game_state(user_id, today))
+            game_state['passes'] = user.get('passes', 0)
+            return {
+                'user': user,
+                'month_active_refs': self.get_month_active_refs(user_id, user=user),
+                'used_withdrawal_slots': self.get_used_refer_withdrawals(user_id, user=user),
+                'bonus_days': bonus_days,
+                'missions': self.get_user_missions(user_id, user=user, bonus_days=bonus_days),
+                'claimed_ads': [c['ad_id'] for c in row['claims']],
+                'ads': [self._ad_view(ad) for ad in row['ads']],
+                'settings': row['settings'][0] if row['settings'] else {},
+                'game_state': game_state
+            }
         except Exception as e:
-            logger.error(f"Error getting live activity: {e}")
-            return []
+            logger.error(f"Error building home snapshot for {user_id}: {e}")
+            return None
 
     # ========== SUPPORT MESSAGES ==========
 
@@ -205,7 +312,7 @@ class Database:
                 'user_name': user.get('first_name', 'User') if user else 'User',
                 'username': user.get('username', '') if user else '',
                 'message': message,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': datetime.now(),
                 'status': 'pending',
                 'read': False,
                 'admin_reply': None,
@@ -240,7 +347,7 @@ class Database:
                     'status': 'replied',
                     'admin_id': int(admin_id),
                     'admin_reply': reply_text,
-                    'reply_date': datetime.now().isoformat(),
+                    'reply_date': datetime.now(),
                     'read': True
                 }}
             )
@@ -265,21 +372,23 @@ class Database:
     def get_user(self, user_id):
         if not self.ensure_connection():
             return None
-        cache_key = f"user_{user_id}"
-        if cache_key in self.user_cache:
-            return self.user_cache[cache_key]
+        cached = self.user_cache.get(user_id)
+        if cached is not None:
+            return cached
         try:
             user = self.users.find_one({'user_id': int(user_id)})
             if user:
-                if '_id' in user:
-                    user['_id'] = str(user['_id'])
-                self.user_cache[cache_key] = user
-                self.users.update_one({'user_id': int(user_id)}, {'$set': {'last_active': datetime.now().isoformat()}})
+                self.user_cache.put(user)
             return user
         except Exception as e:
             logger.error(f"Error getting user {user_id}: {e}")
             return None
 
+    def touch_user(self, user_id):
+        """ User ne khud kuch kiya (Mini App / bot) — last_active batch mein flush hota hai. """
+        if hasattr(self, 'last_seen'):
+            self.last_seen.touch(user_id)
+
     def add_user(self, user_data):
         if not self.ensure_connection():
             return False
@@ -296,7 +405,7 @@ class Database:
                     {'$set': {
                         'first_name': user_data.get('first_name', ''),
                         'username': user_data.get('username', ''),
-                        'last_active': datetime.now().isoformat()
+                        'last_active': datetime.now()
                     }}
                 )
                 # Check if someone is trying to refer an existing user
@@ -310,14 +419,14 @@ class Database:
                         'user_id': user_id,
                         'first_name': existing.get('first_name', 'User'),
                         'username': existing.get('username', ''),
-                        'join_date': existing.get('join_date', '')[:10] if existing.get('join_date') else 'Unknown',
+                        'join_date': as_datetime(existing.get('join_date')).date().isoformat() if as_datetime(existing.get('join_date')) else 'Unknown',
                         'active_refs': existing.get('active_refs', 0),
                         'balance': existing.get('balance', 0),
                         'original_referrer_id': original_referrer_id
                     }
                 return False
 
-            now = datetime.now().isoformat()
+            now = datetime.now()
             new_user = {
                 'user_id': user_id,
                 'first_name': user_data.get('first_name', ''),
@@ -326,7 +435,7 @@ class Database:
                 'balance': 0.0,
                 'total_earned': 0.0,
                 'today_earned': 0.0,
-                'today_date': now[:10],
+                'today_date': now.date().isoformat(),
                 'tier': 1,
                 'total_refs': 0,
                 'active_refs': 0,
@@ -366,44 +475,133 @@ class Database:
                         'earnings': 0.0
                     })
                     self.users.update_one({'user_id': referrer_id}, {'$inc': {'total_refs': 1, 'pending_refs': 1}})
+                    self.user_cache.apply(referrer_id, inc={'total_refs': 1, 'pending_refs': 1})
+                    self._update_single_mission_progress(referrer_id, 'm_invite1', 1)
+                    with self._no_referral_lock:
+                        self.no_referral_cache.pop(user_id, None)
 
-            self.user_cache.pop(f"user_{user_id}", None)
-            if referrer_id:
-                self.user_cache.pop(f"user_{referrer_id}", None)
+            self.user_cache.invalidate(user_id)
             return True
         except Exception as e:
             logger.error(f"Error adding user: {e}")
             return False
 
-    # ========== NEW: MONTH ACTIVE REFS ==========
+    # ========== MONTH STATS (user doc pe month-bucketed counters) ==========
+    #
+    # users.month_stats.<YYYY-MM> = {'active_refs': n, 'withdrawn': rupees}
+    #   active_refs — activate_referral_by_log_channel $inc karta hai
+    #   withdrawn   — process_withdrawal $inc, reject_withdrawal wapas $inc(-)
+    # User fetch ke saath free aate hain — refresh pe referrals / withdrawals scan nahi.
+    # Naya mahina = naya bucket, reset job ki zarurat nahi. Purana data: backfill_month_stats().
+
+    @staticmethod
+    def _month_key(when=None):
+        return (when or datetime.now()).strftime('%Y-%m')
+
+    def get_month_stats(self, user_id, user=None, month=None):
+        user = user if user is not None else self.get_user(user_id)
+        return ((user or {}).get('month_stats') or {}).get(month or self._month_key()) or {}
 
-    def get_month_active_refs(self, referrer_id):
+    def get_month_active_refs(self, referrer_id, user=None):
         """
-        Count referrals that were ACTIVATED this calendar month.
-        Used for withdrawal condition (user needs 20 this month).
+        Referrals ACTIVATED this calendar month (withdrawal condition).
+        `user` doc pass karo toh extra fetch bhi nahi.
         """
         try:
-            referrer_id = int(referrer_id)
-            now = datetime.now()
-            # First day of current month
-            month_start = datetime(now.year, now.month, 1).isoformat()
-
-            count = self.referrals.count_documents({
-                'referrer_id': referrer_id,
-                'is_active': True,
-                'activation_date': {'$gte': month_start}
-            })
-            return count
+            return int(self.get_month_stats(referrer_id, user=user).get('active_refs', 0))
         except Exception as e:
             logger.error(f"Error getting month active refs: {e}")
             return 0
 
+    def _timestamps_migrated(self, collection):
+        """ `migrations.py timestamps` ne is collection ka checkpoint `done` likha? (read fail → False) """
+        try:
+            state = self.db['migrations'].find_one({'_id': f'timestamps:{collection}'}, {'done': 1}) or {}
+        except Exception as e:
+            logger.error(f"Migration checkpoint read error ({collection}): {e}")
+            state = {}
+        return bool(state.get('done'))
+
+    def _date_window(self, collection, field, start, end=None):
+        """
+        `field` ka range filter. Jab tak `migrations.py timestamps` ne is collection ka checkpoint `done`
+        nahi likha, purane ISO-string values ka branch bhi — warna pehli deploy ke backfill / rebuild
+        string-dated rows ko chhod dete.
+        """
+        window = {'$gte': start, **({'$lt': end} if end else {})}
+        if self._timestamps_migrated(collection):
+            return {field: window}
+        as_text = {op: v.isoformat() for op, v in window.items()}
+        return {'$or': [{field: window}, {field: as_text}]}
+
+    def backfill_month_stats(self, month=None):
+        """
+        Ek mahine ke counters referrals + withdrawals se dobara banao (deploy backfill / drift fix).
+        $set hai, isliye dobara chalana safe hai. Returns {'month', 'active_refs', 'withdrawn'} (users touched).
+        """
+        month = month or self._month_key()
+        report = {'month': month, 'active_refs': 0, 'withdrawn': 0}
+        try:
+            start = datetime.strptime(month, '%Y-%m')
+            end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+            refs = self.referrals.aggregate([
+                {'$match': {
+                    'is_active': True,
+                    **self._date_window('referrals', 'activation_date', start, end)
+                }},
+                {'$group': {'_id': '$referrer_id', 'n': {'$sum': 1}}}
+            ])
+            wds = self.withdrawals.aggregate([
+                {'$match': {
+                    'status': {'$in': self.COUNTED_WITHDRAWAL_STATUSES},
+                    **self._date_window('withdrawals', 'request_date', start, end)
+                }},
+                {'$group': {'_id': '$user_id', 'n': {'$sum': '$amount'}}}
+            ])
+            for field, rows in (('active_refs', refs), ('withdrawn', wds)):
+                ops = [UpdateOne({'user_id': r['_id']}, {'$set': {f'month_stats.{month}.{field}': r['n']}})
+                       for r in rows if r['_id']]
+                for i in range(0, len(ops), 500):
+                    self.users.bulk_write(ops[i:i + 500], ordered=False)
+                report[field] = len(ops)
+            self.user_cache.clear()
+            self.log_system_event('month_stats_backfill', f"{month}: {report}")
+            logger.info(f"✅ Month stats backfilled: {report}")
+        except Exception as e:
+            logger.error(f"Month stats backfill error: {e}")
+        return report
+
+    def has_system_event(self, event_type):
+        """ One-time jobs (backfill / migration) ka marker — log_system_event ne kabhi likha? """
+        try:
+            return self.system_stats.find_one({'event_type': event_type}, {'_id': 1}) is not None
+        except Exception as e:
+            logger.error(f"System event check error ({event_type}): {e}")
+            return True
+
+    # ========== REFERRAL LOOKUP (by referred user) ==========
+
+    def get_referral_by_referred(self, referred_id):
+        """
+        Referral doc jisme ye user referred hai, warna None.
+        Known non-referred users negative cache se seedhe None — Mongo hit nahi hota.
+        """
+        referred_id = int(referred_id)
+        with self._no_referral_lock:
+            if referred_id in self.no_referral_cache:
+                return None
+        referral = self.referrals.find_one({'referred_id': referred_id})
+        if not referral:
+            with self._no_referral_lock:
+                self.no_referral_cache[referred_id] = True
+        return referral
+
     # ========== LOG CHANNEL ACTIVATION ==========
 
     def activate_referral_by_log_channel(self, referred_id):
         try:
             referred_id = int(referred_id)
-            referral = self.referrals.find_one({'referred_id': referred_id})
+            referral = self.get_referral_by_referred(referred_id)
 
             if not referral:
                 logger.info(f"No referral found for user {referred_id}")
@@ -413,7 +611,7 @@ class Database:
                 logger.info(f"Referral for {referred_id} already active")
                 return {'activated': False, 'reason': 'already_active'}
 
-            now = datetime.now().isoformat()
+            now = datetime.now()
             referrer_id = referral['referrer_id']
 
             referrer = self.get_user(referrer_id)
@@ -421,30 +619,36 @@ class Database:
             referrer_name = referrer.get('first_name', 'Unknown') if referrer else 'Unknown'
             referred_name = referred.get('first_name', 'Unknown') if referred else 'Unknown'
 
-            self.referrals.update_one(
-                {'referred_id': referred_id},
+            res = self.referrals.update_one(
+                {'referred_id': referred_id, 'is_active': {'$ne': True}},
                 {'$set': {
                     'is_active': True,
                     'activation_date': now,
                     'referrer_name': referrer_name
                 }}
             )
+            if res.modified_count == 0:
+                # Parallel log message ne pehle hi activate kar diya
+                return {'activated': False, 'reason': 'already_active'}
 
-            self.users.update_one(
+            self.user_cache.put(self.users.find_one_and_update(
                 {'user_id': referrer_id},
-                {'$inc': {'pending_refs': -1, 'active_refs': 1}}
-            )
+                {'$inc': {'pending_refs': -1, 'active_refs': 1, f'month_stats.{self._month_key()}.active_refs': 1}},
+                return_document=ReturnDocument.AFTER
+            ))
+            self._bump_leaderboard(referrer_id, referrer_name)
 
+            # add_balance / add_passes fresh doc cache mein daalte hain, tier usi pe chalta hai
             self.add_balance(referrer_id, self.config.REFERRAL_BONUS, f"Referral bonus for user {referred_id}")
             self.add_passes(referrer_id, 3, f"Referral passes for user {referred_id}")
             self.update_user_tier(referrer_id)
-            self.user_cache.pop(f"user_{referrer_id}", None)
 
             self.add_live_activity(
                 'referral', referrer_id,
                 self.config.REFERRAL_BONUS,
                 f"referred {referred_name} → +₹{self.config.REFERRAL_BONUS} +3 Passes",
-                extra={'referred_name': referred_name, 'referred_id': referred_id}
+                extra={'referred_name': referred_name, 'referred_id': referred_id},
+                user_name=referrer_name if referrer else None
             )
 
             logger.info(f"✅ Referral activated: {referred_id} -> {referrer_id}")
@@ -461,8 +665,8 @@ class Database:
             referred_user_id = int(referred_user_id)
             today = datetime.now().date().isoformat()
 
-            referral = self.referrals.find_one({'referred_id': referred_user_id, 'is_active': True})
-            if not referral:
+            referral = self.get_referral_by_referred(referred_user_id)
+            if not referral or not referral.get('is_active'):
                 return {'success': False, 'reason': 'no_active_referral'}
 
             referrer_id = referral['referrer_id']
@@ -475,7 +679,7 @@ class Database:
                 'user_id': referred_user_id,
                 'referrer_id': referrer_id,
                 'date': today,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now()
             })
 
             self.referrals.update_one(
@@ -485,6 +689,7 @@ class Database:
 
             DAILY_SEARCH_EARNING = 0.30
             self.add_balance(referrer_id, DAILY_SEARCH_EARNING, f"Daily search earning from user {referred_user_id}")
+            self._update_single_mission_progress(referrer_id, 'm_search5', 1)   # referrer ke aaj ke searching refs
             self.users.update_one({'user_id': referred_user_id}, {'$inc': {'total_searches': 1}})
 
             referred = self.get_user(referred_user_id)
@@ -496,7 +701,8 @@ class Database:
                 'daily_search', referrer_id,
                 DAILY_SEARCH_EARNING,
                 f"{referred_name} searched movie → +{int(DAILY_SEARCH_EARNING*100)} pts",
-                extra={'referred_name': referred_name, 'referrer_name': referrer_name, 'referred_id': referred_user_id}
+                extra={'referred_name': referred_name, 'referrer_name': referrer_name, 'referred_id': referred_user_id},
+                user_name=referrer_name if referrer else None
             )
 
             logger.info(f"✅ Daily search credited: referred={referred_user_id} referrer={referrer_id} +₹{DAILY_SEARCH_EARNING}")
@@ -521,7 +727,6 @@ class Database:
         try:
             user_id = int(user_id)
             now = datetime.now()
-            now_iso = now.isoformat()
 
             user = self.get_user(user_id)
             if not user:
@@ -531,7 +736,7 @@ class Database:
             last_self = user.get('last_self_search')
             if last_self:
                 try:
-                    last_dt = datetime.fromisoformat(last_self)
+                    last_dt = as_datetime(last_self)
                     elapsed_hours = (now - last_dt).total_seconds() / 3600
                     if elapsed_hours < 48:
                         remaining_h = int(48 - elapsed_hours)
@@ -548,14 +753,14 @@ class Database:
             # Credit 30 pts (₹0.30) to user themselves
             SELF_SEARCH_EARNING = 0.30
             self.add_balance(user_id, SELF_SEARCH_EARNING, "Self movie search bonus (48hr)")
-            self.users.update_one(
+            self.user_cache.put(self.users.find_one_and_update(
                 {'user_id': user_id},
                 {
-                    '$set': {'last_self_search': now_iso},
+                    '$set': {'last_self_search': now},
                     '$inc': {'total_searches': 1, 'self_search_count': 1}
-                }
-            )
-            self.user_cache.pop(f"user_{user_id}", None)
+                },
+                return_document=ReturnDocument.AFTER
+            ))
 
             # Update mission progress
             self._update_single_mission_progress(user_id, 'm_self_search', 1)
@@ -590,7 +795,7 @@ class Database:
 
             now = datetime.now()
             try:
-                last_dt = datetime.fromisoformat(last_self)
+                last_dt = as_datetime(last_self)
                 elapsed = (now - last_dt).total_seconds() / 3600
                 if elapsed >= 48:
                     return {'can_search': True, 'hours_left': 0}
@@ -625,8 +830,8 @@ class Database:
                 self.daily_bonus.find({'date': today}, {'user_id': 1})
             )
 
-            # Get active users (active in last 7 days)
-            week_ago = (datetime.now() - timedelta(days=7)).isoformat()
+            # Get active users (active in last 7 days) — last_active LastSeenTracker flush karta hai
+            week_ago = datetime.now() - timedelta(days=7)
             active_users = list(self.users.find(
                 {'last_active': {'$gte': week_ago}},
                 {'user_id': 1, 'first_name': 1}
@@ -637,8 +842,8 @@ class Database:
                 uid = u['user_id']
                 if uid not in claimed_today:
                     # Check if already reminded today
-                    last_reminded = u.get('last_reminded', '')
-                    if last_reminded[:10] != today:
+                    last_reminded = as_datetime(u.get('last_reminded'))
+                    if not last_reminded or last_reminded.date().isoformat() != today:
                         pending.append({'user_id': uid, 'first_name': u.get('first_name', 'User')})
 
             return pending[:200]  # max 200 per run
@@ -652,7 +857,7 @@ class Database:
         try:
             self.users.update_one(
                 {'user_id': int(user_id)},
-                {'$set': {'last_reminded': datetime.now().isoformat()}}
+                {'$set': {'last_reminded': datetime.now()}}
             )
         except:
             pass
@@ -662,8 +867,9 @@ class Database:
     def add_passes(self, user_id, count, description=""):
         try:
             user_id = int(user_id)
-            self.users.update_one({'user_id': user_id}, {'$inc': {'passes': count}})
-            self.user_cache.pop(f"user_{user_id}", None)
+            self.user_cache.put(self.users.find_one_and_update(
+                {'user_id': user_id}, {'$inc': {'passes': count}}, return_document=ReturnDocument.AFTER
+            ))
             logger.info(f"Added {count} passes to user {user_id}: {description}")
             return True
         except Exception as e:
@@ -711,7 +917,8 @@ class Database:
                 return {'success': False, 'message': 'Already claimed or not eligible'}
 
             self.add_balance(user_id, reward, f"Milestone bonus: {refs_required} refs")
-            self.add_live_activity('milestone', user_id, reward, f"Milestone {refs_required} refs → +{int(float(reward)*100)} pts")
+            self.add_live_activity('milestone', user_id, reward, f"Milestone {refs_required} refs → +{int(float(reward)*100)} pts",
+                                   user_name=user.get('first_name', 'User'))
             logger.info(f"✅ Milestone claimed: user={user_id} refs={refs_required} reward=₹{reward}")
             return {'success': True, 'reward': reward}
 
@@ -722,11 +929,12 @@ class Database:
     def deduct_pass(self, user_id):
         try:
             user_id = int(user_id)
-            user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
+            user = self.users.find_one_and_update({'user_id': user_id, 'passes': {'$gt': 0}}, {'$inc': {'passes': -1}},
+                                                  return_document=ReturnDocument.AFTER)
+            if not user:
+                self.user_cache.invalidate(user_id)   # cache mein passes > 0 dikh raha ho sakta hai
                 return False
-            self.users.update_one({'user_id': user_id}, {'$inc': {'passes': -1}})
-            self.user_cache.pop(f"user_{user_id}", None)
+            self.user_cache.put(user)
             return True
         except Exception as e:
             logger.error(f"Error deducting pass: {e}")
@@ -788,7 +996,8 @@ class Database:
             badge_names = ['Starter','Rising','Pro','Elite','Champion','Legend','Master','GrandMaster','Mythic','God Tier']
             bname = badge_names[badge_idx] if badge_idx < len(badge_names) else f'Badge {badge_idx}'
             self.add_live_activity('badge', user_id, balance,
-                f"Badge claimed: {bname} → +{passes} passes" + (f" +₹{balance}" if balance > 0 else ""))
+                f"Badge claimed: {bname} → +{passes} passes" + (f" +₹{balance}" if balance > 0 else ""),
+                user_name=user.get('first_name', 'User'))
 
             logger.info(f"✅ Badge claimed: user={user_id} badge={badge_idx} passes={passes} balance={balance}")
             return {'success': True, 'passes': passes, 'balance': balance}
@@ -802,7 +1011,7 @@ class Database:
     def request_pass_purchase(self, user_id, pkg_id, passes, price, txn_id, screenshot=None):
         try:
             user_id = int(user_id)
-            now = datetime.now().isoformat()
+            now = datetime.now()
 
             # Check duplicate TXN ID
             existing = self.pass_requests.find_one({'txn_id': txn_id})
@@ -845,7 +1054,7 @@ class Database:
             if req.get('status') != 'pending':
                 return {'success': False, 'message': 'Already processed'}
 
-            now = datetime.now().isoformat()
+            now = datetime.now()
             user_id = req['user_id']
             passes = req['passes']
 
@@ -882,22 +1091,64 @@ class Database:
 
     # ========== REF ACTIVITY ==========
 
-    def get_ref_activity(self, referrer_id, limit=10, skip=0):
+    def get_ref_activity(self, referrer_id, limit=10, cursor=None):
+        """
+        Referred users ka page — active pehle, phir naye joins. Ek aggregation: referrals page
+        + $lookup users (naam / blocked) + $lookup daily_searches (aaj search kiya?).
+        Keyset pagination (is_active, join_date, _id) — page 50 bhi page 1 jitna sasta.
+        Jab tak referrals ka timestamps migration done nahi, join_date string + date mixed hai (BSON mein
+        string hamesha date se pehle sort hota hai) — tab sort / keyset `_jd` pe: string ka pehle 19 chars
+        (seconds tak) $convert se date. Migration ke baad seedha indexed join_date.
+        Returns {'items': [...], 'next_cursor': str | None}; cursor opaque hai, wapas bhejo.
+        """
+        empty = {'items': [], 'next_cursor': None}
         try:
             referrer_id = int(referrer_id)
             today = datetime.now().date().isoformat()
-            refs = list(
-                self.referrals.find({'referrer_id': referrer_id})
-                .sort('is_active', -1)  # active refs pehle
-                .skip(skip)
-                .limit(limit)
-            )
+            migrated = self._timestamps_migrated('referrals')
+            key = 'join_date' if migrated else '_jd'
+            stages = [{'$match': {'referrer_id': referrer_id}}]
+            if not migrated:
+                stages.append({'$set': {'_jd': {'$cond': [
+                    {'$eq': [{'$type': '$join_date'}, 'string']},
+                    {'$convert': {'input': {'$substrCP': ['$join_date', 0, 19]}, 'to': 'date',
+                                  'onError': None, 'onNull': None}},
+                    '$join_date'
+                ]}}})
+            if cursor:
+                after = _decode_ref_cursor(cursor)
+                if not after:
+                    return empty
+                is_active, join_date, last_id = after
+                if isinstance(join_date, str):
+                    try:
+                        join_date = datetime.fromisoformat(join_date[:19])   # purana string cursor
+                    except ValueError:
+                        return empty
+                stages.append({'$match': {'$or': [
+                    {'is_active': {'$lt': is_active}},
+                    {'is_active': is_active, key: {'$lt': join_date}},
+                    {'is_active': is_active, key: join_date, '_id': {'$lt': last_id}},
+                ]}})
+            rows = list(self.referrals.aggregate([
+                *stages,
+                {'$sort': {'is_active': -1, key: -1, '_id': -1}},
+                {'$limit': limit + 1},   # +1 = aage aur hai ya nahi
+                {'$project': {'referred_id': 1, 'is_active': 1, 'activation_date': 1, 'join_date': 1,
+                              'earnings': 1, 'last_search_date': 1, '_jd': 1}},
+                {'$lookup': {'from': self.users.name, 'localField': 'referred_id', 'foreignField': 'user_id',
+                             'pipeline': [{'$project': {'_id': 0, 'first_name': 1, 'username': 1, 'bot_blocked': 1}}],
+                             'as': 'user'}},
+                {'$lookup': {'from': self.daily_searches.name, 'localField': 'referred_id', 'foreignField': 'user_id',
+                             'pipeline': [{'$match': {'date': today}}, {'$limit': 1}, {'$project': {'_id': 1}}],
+                             'as': 'today_search'}},
+            ]))
+            page, more = rows[:limit], len(rows) > limit
             result = []
-            for ref in refs:
-                referred_user = self.get_user(ref['referred_id'])
-                if not referred_user:
-                    continue
-                today_search = self.daily_searches.find_one({'user_id': ref['referred_id'], 'date': today})
+            for ref in page:
+                if not ref['user']:
+                    continue   # user doc delete ho chuka (purge) — row mat dikhao, cursor phir bhi aage badhta hai
+                referred_user = ref['user'][0]
                 result.append({
                     'user_id': ref['referred_id'],
                     'first_name': referred_user.get('first_name', 'User'),
@@ -907,13 +1158,17 @@ class Database:
                     'activation_date': ref.get('activation_date', ''),
                     'join_date': ref.get('join_date', ''),
                     'earnings': ref.get('earnings', 0),
-                    'today_search': bool(today_search),
+                    'today_search': bool(ref['today_search']),
                     'last_search_date': ref.get('last_search_date', '')
                 })
-            return result
+            next_cursor = None
+            if more and page:
+                last = page[-1]
+                next_cursor = _encode_ref_cursor(dict(last, join_date=last.get(key)))
+            return {'items': result, 'next_cursor': next_cursor}
         except Exception as e:
             logger.error(f"Error getting ref activity: {e}")
-            return []
+            return empty
 
     def mark_user_blocked(self, user_id):
         """User ne bot block kiya — flag lagao aur optional auto-remove."""
@@ -921,7 +1176,7 @@ class Database:
             user_id = int(user_id)
             self.users.update_one(
                 {'user_id': user_id},
-                {'$set': {'bot_blocked': True, 'blocked_at': datetime.now().isoformat()}}
+                {'$set': {'bot_blocked': True, 'blocked_at': datetime.now()}}
             )
             logger.info(f"User {user_id} marked as bot_blocked")
         except Exception as e:
@@ -963,10 +1218,10 @@ class Database:
             existing = self.channel_joins.find_one({'user_id': user_id, 'channel_id': str(channel_id)})
             if existing:
                 return False
-            self.channel_joins.insert_one({'user_id': user_id, 'channel_id': str(channel_id), 'joined_at': datetime.now().isoformat()})
+            self.channel_joins.insert_one({'user_id': user_id, 'channel_id': str(channel_id), 'joined_at': datetime.now()})
             self.add_balance(user_id, self.config.CHANNEL_JOIN_BONUS, "Channel join bonus")
             self.users.update_one({'user_id': user_id}, {'$set': {'channel_joined': True}})
-            self.user_cache.pop(f"user_{user_id}", None)
+            self.user_cache.apply(user_id, set_={'channel_joined': True})
             self.add_live_activity('bonus', user_id, self.config.CHANNEL_JOIN_BONUS, f"joined channel +{int(float(self.config.CHANNEL_JOIN_BONUS)*100)} pts")
             return True
         except Exception as e:
@@ -1025,14 +1280,14 @@ class Database:
                 'date': date_str,
                 'bonus': total_bonus,
                 'streak': streak + 1,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now()
             })
             new_streak = streak + 1
             self.users.update_one({'user_id': user_id}, {'$set': {'daily_streak': new_streak, 'last_daily': date_str}})
+            self.user_cache.apply(user_id, set_={'daily_streak': new_streak, 'last_daily': date_str})
 
             self._update_single_mission_progress(user_id, 'm_daily', 1)
             self.add_live_activity('bonus', user_id, total_bonus, f"claimed daily bonus streak:{new_streak}🔥")
-            self.user_cache.pop(f"user_{user_id}", None)
             return {'bonus': total_bonus, 'streak': new_streak, 'success': True, 'passes_added': 0}
         except Exception as e:
             logger.error(f"Error claiming day bonus: {e}")
@@ -1048,6 +1303,14 @@ class Database:
             return []
 
     # ========== MISSIONS ==========
+    #
+    # mission_days — ek doc per user per IST din + ek long-term doc (date = 'lt'):
+    #   {'user_id', 'date', 'missions': {mission_id: {'progress', 'claimed', 'claimed_date', 'reward', 'base'}}}
+    # Progress ek $inc (upsert) se; jo missions user doc se nikalte hain (refs, streak, passes...) unka
+    # progress live user doc se aata hai. Claim ek conditional update_one — find + verify + update nahi.
+    # Long-term missions repeatable: claim pe `base` = us waqt ka live value, agla claim base + total pe.
+    # Live counter base se neeche aa jaye (admin ne referred user delete kiya) toh base = live (reset).
+    # Streak missions: streak last claim ke baad shuru hua (claimed_date < streak ka pehla din) → base 0.
 
     MISSIONS_DEF = [
         # Daily missions
@@ -1068,62 +1331,100 @@ class Database:
         {'id': 'm_streak7',     'total': 7,  'reward': 3.0,  'track': 'streak',        'long_term': True},
         {'id': 'm_game50',      'total': 50, 'reward': 5.0,  'track': 'total_plays',   'long_term': True},
     ]
+    MISSIONS_BY_ID = {m['id']: m for m in MISSIONS_DEF}
+    LONG_TERM_DATE = 'lt'
+
+    @staticmethod
+    def _ist_today():
+        # Always IST date (India +5:30) — UTC midnight mismatch se bachao
+        return (datetime.utcnow() + timedelta(hours=5, minutes=30)).date().isoformat()
+
+    def _mission_key(self, mdef, user_id, today=None):
+        date = self.LONG_TERM_DATE if mdef.get('long_term') else (today or self._ist_today())
+        return {'user_id': int(user_id), 'date': date}
+
+    @staticmethod
+    def _mission_live_progress(mission_id, user, days):
+        """ User doc se nikalne wale missions ka absolute value; baaki None (stored progress chalta hai). """
+        if not user:
+            return None
+        if mission_id in ('m_refer5', 'm_refer10', 'm_shortlink'):
+            return user.get('active_refs', 0)
+        if mission_id in ('m_streak3', 'm_streak7'):
+            return Database._streak_cycle(user)[0]
+        if mission_id == 'm_game50':
+            return user.get('total_game_plays', 0)
+        if mission_id == 'm_game5win':
+            return user.get('games_won', 0)
+        if mission_id == 'm_passes':
+            return 1 if user.get('passes', 0) > 0 else 0
+        if mission_id == 'm_self_search':
+            last_self = as_datetime(user.get('last_self_search'))
+            return 1 if last_self and last_self.date().isoformat() in days else 0
+        if mission_id == 'm_watchad':
+            return 1 if (user.get('watch_ad_today') or '')[:10] in days else 0
+        return None
+
+    @staticmethod
+    def _streak_cycle(user):
+        """ (streak, cycle) — cycle = streak ka pehla din. Kal se pehle ka last_daily = streak toot chuka (0, None). """
+        streak = user.get('daily_streak', 0)
+        try:
+            last = datetime.fromisoformat(str(user.get('last_daily'))[:10]).date()
+        except ValueError:
+            return 0, None
+        yesterday = (datetime.utcnow() + timedelta(hours=5, minutes=30)).date() - timedelta(days=1)
+        if streak <= 0 or last < yesterday:
+            return 0, None
+        return streak, (last - timedelta(days=streak - 1)).isoformat()
+
+    def _long_term_base(self, mdef, entry, live, user):
+        """
+        Long-term mission ka effective base → (base, reset). `reset` = base jo store karna hai jab
+        counter peeche gaya (refs ghate), warna None. Streak: naya streak → 0 (claimed_date se pata, koi write nahi).
+        """
+        base = entry.get('base', 0)
+        live = live or 0
+        if mdef['track'] == 'streak':
+            cycle = self._streak_cycle(user)[1]
+            new_streak = cycle and entry.get('claimed_date', '') < cycle
+            return (0 if new_streak or live < base else base), None
+        return (base, None) if live >= base else (live, live)
 
-    # Long-term missions use 'lt_' prefix key (no date) — daily use date key
-    def _mission_key(self, mdef, user_id):
-        if mdef.get('long_term'):
-            # Long-term: query by user_id + mission_id only (no date, no long_term field req)
-            return {'user_id': user_id, 'mission_id': mdef['id']}
-        else:
-            # Always use IST date (India +5:30) to avoid UTC midnight mismatch
-            from datetime import timezone, timedelta as _td_mk
-            ist_today = (datetime.now(timezone.utc) + _td_mk(hours=5, minutes=30)).date().isoformat()
-            return {'user_id': user_id, 'date': ist_today, 'mission_id': mdef['id']}
-
-    def get_user_missions(self, user_id):
+    def get_user_missions(self, user_id, user=None, bonus_days=None):
         try:
             user_id = int(user_id)
-            from datetime import timezone, timedelta as _td_gum
-            today = (datetime.now(timezone.utc) + _td_gum(hours=5, minutes=30)).date().isoformat()
-            result = {}
-            user = self.get_user(user_id)
+            today = self._ist_today()
+            days = (today, datetime.now().date().isoformat())
+            if user is None:
+                user = self.get_user(user_id)
+
+            # Aaj ka doc + long-term doc — ek query, kuch insert nahi hota
+            entries = {}
+            for doc in self.mission_days.find({'user_id': user_id, 'date': {'$in': [today, self.LONG_TERM_DATE]}}):
+                entries[doc['date']] = doc.get('missions') or {}
 
+            result = {}
             for mdef in self.MISSIONS_DEF:
                 mid = mdef['id']
                 is_lt = mdef.get('long_term', False)
-                query = self._mission_key(mdef, user_id)
-                doc = self.missions.find_one(query)
-
-                if not doc:
-                    progress = 0
-                    if mid == 'm_refer5' and user:
-                        progress = min(user.get('active_refs', 0), mdef['total'])
-                    elif mid == 'm_streak3' and user:
-                        progress = min(user.get('daily_streak', 0), mdef['total'])
-                    elif mid == 'm_daily':
-                        bonus_today = self.daily_bonus.find_one({'user_id': user_id, 'date': today})
-                        progress = 1 if bonus_today else 0
-
-                    doc = {**query, 'progress': progress, 'completed': progress >= mdef['total'], 'claimed': False}
-                    try:
-                        self.missions.insert_one(doc)
-                    except:
-                        pass
-
-                # For long-term: refresh progress from live data each time
-                if is_lt and not doc.get('claimed'):
-                    if mid == 'm_refer5' and user:
-                        doc['progress'] = min(user.get('active_refs', 0), mdef['total'])
-                        doc['completed'] = user.get('active_refs', 0) >= mdef['total']
-                    elif mid == 'm_streak3' and user:
-                        doc['progress'] = min(user.get('daily_streak', 0), mdef['total'])
-                        doc['completed'] = user.get('daily_streak', 0) >= mdef['total']
-
+                entry = entries.get(self.LONG_TERM_DATE if is_lt else today, {}).get(mid) or {}
+                live = self._mission_live_progress(mid, user, days)
+                if mid == 'm_daily' and bonus_days is not None:
+                    live = 1 if today in bonus_days else 0
+                if is_lt:
+                    base, reset = self._long_term_base(mdef, entry, live, user)
+                    if reset is not None:
+                        self.mission_days.update_one({**self._mission_key(mdef, user_id), f'missions.{mid}.base': {'$gt': reset}},
+                                                     {'$set': {f'missions.{mid}.base': reset}})
+                    progress = (live or 0) - base
+                else:
+                    progress = max(entry.get('progress', 0), live or 0)
                 result[mid] = {
-                    'progress': doc.get('progress', 0),
-                    'completed': doc.get('completed', False),
-                    'claimed': doc.get('claimed', False),
-                    'claimed_date': doc.get('claimed_date', ''),
+                    'progress': max(0, min(progress, mdef['total'])),
+                    'completed': progress >= mdef['total'],
+                    'claimed': bool(entry.get('claimed')) and not is_lt,
+                    'claimed_date': entry.get('claimed_date', ''),
                     'long_term': is_lt
                 }
             return result
@@ -1133,229 +1434,136 @@ class Database:
 
     def _update_single_mission_progress(self, user_id, mission_id, count=1):
         try:
-            user_id = int(user_id)
-            from datetime import timezone, timedelta as _td_ump
-            today = (datetime.now(timezone.utc) + _td_ump(hours=5, minutes=30)).date().isoformat()
-            mdef = next((m for m in self.MISSIONS_DEF if m['id'] == mission_id), None)
-            if not mdef:
-                return
-            query = self._mission_key(mdef, user_id)
-            doc = self.missions.find_one(query)
-            if not doc:
-                doc = {**query, 'progress': 0, 'completed': False, 'claimed': False}
-
-            if doc.get('claimed'):
-                return
-
-            new_progress = min(doc.get('progress', 0) + count, mdef['total'])
-            completed = new_progress >= mdef['total']
-
-            self.missions.update_one(
-                query,
-                {'$set': {'progress': new_progress, 'completed': completed}},
-                upsert=True
-            )
+            op = self._mission_progress_op(user_id, mission_id, count)
+            if op:
+                self.mission_days.bulk_write([op])
         except Exception as e:
             logger.error(f"Error updating mission {mission_id}: {e}")
 
     def claim_single_mission(self, user_id, mission_id, reward, client_date=None):
         try:
             user_id = int(user_id)
-            from datetime import timezone, timedelta as _td
-            _ist = datetime.now(timezone.utc) + _td(hours=5, minutes=30)
-            ist_today = _ist.date().isoformat()
-            server_today = datetime.now().date().isoformat()
-            today = client_date if client_date in [ist_today, server_today] else ist_today
-
-            mdef = next((m for m in self.MISSIONS_DEF if m['id'] == mission_id), None)
+            mdef = self.MISSIONS_BY_ID.get(mission_id)
             if not mdef:
                 return {'success': False, 'message': 'Mission not found'}
 
+            ist_today = self._ist_today()
+            server_today = datetime.now().date().isoformat()
+            today = client_date if client_date in (ist_today, server_today) else ist_today
             is_lt = mdef.get('long_term', False)
-            query = self._mission_key(mdef, user_id)
-
-            # ── STEP 1: Check already claimed ──────────────
-            doc = self.missions.find_one(query)
-            if doc and doc.get('claimed'):
-                if is_lt:
-                    # Long-term: verify if user still meets the requirement
-                    # If yes, they might be claiming again after a reset that failed to delete
-                    # Delete the stale doc and let them re-claim
-                    user_check = self.get_user(user_id)
-                    meets = False
-                    if mission_id in ('m_refer5','m_refer10') and user_check:
-                        meets = user_check.get('active_refs',0) >= mdef['total']
-                    elif mission_id in ('m_streak3','m_streak7') and user_check:
-                        meets = user_check.get('daily_streak',0) >= mdef['total']
-                    elif mission_id == 'm_shortlink':
-                        meets = bool(self.referrals.find_one({'referrer_id': user_id, 'is_active': True}))
-                    if meets:
-                        # Delete stale claimed doc so they can claim fresh
-                        self.missions.delete_one(query)
-                        doc = None
-                        logger.info(f"♻️ Stale claimed doc deleted for {mission_id} user={user_id}")
-                    else:
-                        return {'success': False, 'message': 'Already claimed'}
-                else:
-                    return {'success': False, 'message': 'Already claimed'}
-
-            # ── STEP 2: Verify mission is actually completed ──
-            # Always re-verify from live data — don't trust only DB doc
-            completed = False
-            progress  = doc.get('progress', 0) if doc else 0
+            total = mdef['total']
+            key = self._mission_key(mdef, user_id, ist_today)
+            field = f'missions.{mission_id}'
             user = self.get_user(user_id)
+            live = self._mission_live_progress(mission_id, user, (ist_today, server_today))
+            reward = float(mdef['reward'])   # client ka bheja reward sirf purane API ke liye — credit server ka
+            claim_set = {f'{field}.claimed': True, f'{field}.claimed_date': today, f'{field}.reward': reward}
 
-            if mission_id in ('m_refer5', 'm_refer10') and user:
-                refs = user.get('active_refs', 0)
-                completed = refs >= mdef['total']
-                progress  = min(refs, mdef['total'])
-
-            elif mission_id == 'm_daily':
-                bonus_utc = self.daily_bonus.find_one({'user_id': user_id, 'date': server_today})
-                bonus_ist = self.daily_bonus.find_one({'user_id': user_id, 'date': ist_today})
-                bonus_today = bonus_utc or bonus_ist
-                completed = bool(bonus_today)
-                progress  = 1 if bonus_today else 0
-
-            elif mission_id == 'm_game':
-                # Check both today dates (IST + UTC, timezone mismatch se bachao)
-                state_utc = self.game_states.find_one({'user_id': user_id, 'date': server_today})
-                state_ist = self.game_states.find_one({'user_id': user_id, 'date': ist_today})
-                state = state_ist or state_utc  # IST prefer karo
-                if state:
-                    # total_plays ya plays field use karo — double count nahi hoga
-                    plays = state.get('total_plays') or state.get('plays', 0)
-                else:
-                    plays = 0
-                # Also check missions doc progress (DB progress se max lo)
-                mission_progress = doc.get('progress', 0) if doc else 0
-                progress = max(plays, mission_progress)
-                progress = min(progress, mdef['total'])
-                completed = progress >= mdef['total']
-
-            elif mission_id == 'm_game50' and user:
-                total_plays = user.get('total_game_plays', 0)
-                progress    = min(total_plays, mdef['total'])
-                completed   = total_plays >= mdef['total']
-
-            elif mission_id == 'm_self_search':
-                completed = bool(user and user.get('last_self_search', '')[:10] in [today, ist_today, server_today])
-                progress  = 1 if completed else 0
-
-            elif mission_id in ('m_streak3', 'm_streak7') and user:
-                streak    = user.get('daily_streak', 0)
-                progress  = min(streak, mdef['total'])
-                completed = streak >= mdef['total']
-
-            elif mission_id == 'm_shortlink':
-                ref = self.referrals.find_one({'referrer_id': user_id, 'is_active': True})
-                completed = bool(ref)
-                progress  = 1 if ref else 0
-
-            elif mission_id in ('m_game5win',) and user:
-                wins      = user.get('games_won', 0)
-                progress  = min(wins, mdef['total'])
-                completed = wins >= mdef['total']
-
-            elif mission_id == 'm_withdraw':
-                wd = self.withdrawals.find_one({'user_id': user_id,
-                     'request_date': {'$gte': server_today if server_today < ist_today else ist_today}})
-                completed = bool(wd)
-                progress  = 1 if wd else 0
-
-            elif mission_id == 'm_passes':
-                # m_passes = user ke paas koi bhi pass hai (kisi bhi source se)
-                # Passes milte hain: referral se, daily bonus se, ad claim se
-                user_passes = user.get('passes', 0) if user else 0
-                # Check missions doc bhi
-                mission_progress = doc.get('progress', 0) if doc else 0
-                # Passes > 0 means mission eligible
-                completed = user_passes > 0 or mission_progress >= 1
-                progress  = 1 if completed else 0
-
-            elif mission_id == 'm_search5':
-                refs_list = list(self.referrals.find({'referrer_id': user_id}))
-                searched = sum(1 for r in refs_list if r.get('last_search_date', '')[:10] in [today, ist_today, server_today])
-                progress  = min(searched, mdef['total'])
-                completed = searched >= mdef['total']
-
-            elif mission_id == 'm_invite1':
-                # Check new referral created today
-                new_ref = self.referrals.find_one({'referrer_id': user_id,
-                    'created_at': {'$gte': server_today if server_today < ist_today else ist_today}})
-                completed = bool(new_ref)
-                progress  = 1 if completed else 0
-
-            elif mission_id == 'm_watchad':
-                # Check watch_ad_today field on user
-                watch_date = user.get('watch_ad_today', '') if user else ''
-                completed = watch_date[:10] in [today, ist_today, server_today]
-                progress  = 1 if completed else 0
-
+            # ── Ek conditional update — filter hi verification hai ──
+            if is_lt:
+                if live is None or live < total:
+                    return {'success': False, 'message': 'Mission abhi puri nahi hui — pehle complete karo!'}
+                # live - base >= total; claim base ko live pe le aata hai (reset)
+                ready = [{f'{field}.base': {'$lte': live - total}}, {f'{field}.base': {'$exists': False}}]
+                update = {'$set': {**claim_set, f'{field}.base': live}}
+                if mdef['track'] == 'streak':
+                    # Naya streak (last claim ke baad shuru) ya streak chhota hua → base 0, live >= total upar check hai
+                    ready += [{f'{field}.claimed_date': {'$lt': self._streak_cycle(user)[1]}},
+                              {f'{field}.base': {'$gt': live}}]
+                query = {**key, '$or': ready}
+                upsert = True
+            elif live is not None and live >= total:
+                query = {**key, f'{field}.claimed': {'$ne': True}}
+                update = {'$set': claim_set, '$max': {f'{field}.progress': live}}
+                upsert = True
             else:
-                # Fallback: trust DB doc progress
-                doc_progress = doc.get('progress', 0) if doc else 0
-                progress  = max(progress, doc_progress)
-                completed = progress >= mdef['total']
+                query = {**key, f'{field}.claimed': {'$ne': True}, f'{field}.progress': {'$gte': total}}
+                update = {'$set': claim_set}
+                upsert = False
 
-            if not completed:
-                logger.info(f"Mission {mission_id} not completed for user {user_id}: progress={progress}/{mdef['total']}")
+            try:
+                res = self.mission_days.update_one(query, update, upsert=upsert)
+                claimed = res.matched_count > 0 or res.upserted_id is not None
+            except DuplicateKeyError:
+                claimed = False   # doc hai par filter fail — already claimed / base aage
+            if not claimed:
+                doc = self.mission_days.find_one(key, {field: 1}) or {}
+                entry = (doc.get('missions') or {}).get(mission_id) or {}
+                if entry.get('claimed') and not is_lt:
+                    return {'success': False, 'message': 'Already claimed'}
+                if is_lt:
+                    reset = self._long_term_base(mdef, entry, live, user)[1]
+                    if reset is not None:   # counter ghata — base neeche, agla claim reset + total pe
+                        self.mission_days.update_one({**key, f'{field}.base': {'$gt': reset}}, {'$set': {f'{field}.base': reset}})
+                logger.info(f"Mission {mission_id} not completed for user {user_id}: live={live} doc={entry}")
                 return {'success': False, 'message': 'Mission abhi puri nahi hui — pehle complete karo!'}
 
-            # ── STEP 3: Mark claimed (race-condition safe) ────────────────
-            update_result = self.missions.update_one(
-                {**query, 'claimed': {'$ne': True}},
-                {'$set': {
-                    'claimed': True, 'completed': True, 'progress': progress,
-                    'reward_given': float(reward), 'claimed_date': today,
-                }},
-                upsert=True
-            )
-
-            if update_result.matched_count == 0 and update_result.upserted_id is None:
-                return {'success': False, 'message': 'Already claimed'}
-
-            # ── STEP 4: Credit balance ────────────────────────────────
-            self.add_balance(user_id, float(reward), f"Mission {mission_id} reward")
-            self.add_live_activity('mission', user_id, reward, f"Mission complete! +{int(float(reward)*100)} pts")
+            self.add_balance(user_id, reward, f"Mission {mission_id} reward")
+            self.add_live_activity('mission', user_id, reward, f"Mission complete! +{int(reward*100)} pts")
             logger.info(f"✅ Mission claimed: user={user_id} {mission_id} +₹{reward}")
-
-            # ── STEP 5: Long-term missions RESET after claim ──────────
-            if is_lt:
-                self.missions.delete_one(query)
-                logger.info(f"♻️ Long-term mission {mission_id} reset for user {user_id}")
-
-            return {'success': True, 'reward': float(reward)}
+            return {'success': True, 'reward': reward}
 
         except Exception as e:
             logger.error(f"Error claiming mission {mission_id} for user {user_id}: {e}")
             return {'success': False, 'message': 'Server error'}
 
+    def migrate_missions(self, since=None):
+        """
+        Purane `missions` rows (ek row per mission) → mission_days. Sirf `since` (default: kal, IST)
+        se naye daily rows — purane din kabhi padhe nahi jaate. Long-term rows migrate nahi hote:
+        unka progress live user doc se aata hai. $max / $set hai, dobara chalana safe.
+        Returns {'rows', 'docs'}.
+        """
+        report = {'rows': 0, 'docs': 0}
+        try:
+            since = since or (datetime.utcnow() + timedelta(hours=5, minutes=30) - timedelta(days=1)).date().isoformat()
+            grouped = {}
+            for row in self.missions.find({'date': {'$gte': since}, 'mission_id': {'$in': list(self.MISSIONS_BY_ID)}}):
+                if self.MISSIONS_BY_ID[row['mission_id']].get('long_term'):
+                    continue
+                report['rows'] += 1
+                field = f"missions.{row['mission_id']}"
+                update = grouped.setdefault((row['user_id'], row['date']), {'$max': {}, '$set': {}})
+                update['$max'][f'{field}.progress'] = row.get('progress', 0)
+                if row.get('claimed'):
+                    update['$set'].update({f'{field}.claimed': True, f'{field}.claimed_date': row.get('claimed_date', row['date']),
+                                           f'{field}.reward': row.get('reward_given', 0.0)})
+            ops = [UpdateOne({'user_id': uid, 'date': date}, {k: v for k, v in update.items() if v}, upsert=True)
+                   for (uid, date), update in grouped.items()]
+            for i in range(0, len(ops), 500):
+                self.mission_days.bulk_write(ops[i:i + 500], ordered=False)
+            report['docs'] = len(ops)
+            self.log_system_event('missions_migrated', f"since {since}: {report}")
+            logger.info(f"✅ Missions migrated to mission_days: {report}")
+        except Exception as e:
+            logger.error(f"Missions migration error: {e}")
+        return report
+
     # ========== ADS — UPDATED: timer_seconds field ==========
 
     def get_all_ads(self):
         try:
-            ads = list(self.ads.find().sort('order', 1))
-            result = []
-            for ad in ads:
-                ad['_id'] = str(ad['_id'])
-                # Ensure all required fields exist
-                ad.setdefault('icon', '💎')
-                ad.setdefault('title', 'Offer')
-                ad.setdefault('reward', 0.0)
-                ad.setdefault('link', '#')
-                ad.setdefault('meta', 'Sponsored Offer')
-                ad.setdefault('description', '')
-                ad.setdefault('timer_seconds', 20)
-                ad.setdefault('claim_code', None)
-                ad.setdefault('image_url', '')
-                ad.setdefault('expiry', '')
-                result.append(ad)
-            return result
+            return [self._ad_view(ad) for ad in self.ads.find().sort('order', 1)]
         except Exception as e:
             logger.error(f"Error getting ads: {e}")
             return []
 
+    @staticmethod
+    def _ad_view(ad):
+        ad['_id'] = str(ad['_id'])
+        # Ensure all required fields exist
+        ad.setdefault('icon', '💎')
+        ad.setdefault('title', 'Offer')
+        ad.setdefault('reward', 0.0)
+        ad.setdefault('link', '#')
+        ad.setdefault('meta', 'Sponsored Offer')
+        ad.setdefault('description', '')
+        ad.setdefault('timer_seconds', 20)
+        ad.setdefault('claim_code', None)
+        ad.setdefault('image_url', '')
+        ad.setdefault('expiry', '')
+        return ad
+
     def update_ad(self, ad_id, title, reward, link, meta, icon=None, claim_code=None, timer_seconds=0, image_url=None, description=None):
         """
         UPDATED: saves timer_seconds, image_url, description.
@@ -1367,7 +1575,7 @@ class Database:
                 'reward': float(reward),
                 'link': link,
                 'meta': meta,
-                'edited_at': datetime.now().isoformat(),
+                'edited_at': datetime.now(),
                 'claim_code': claim_code.upper() if claim_code else None,
                 'timer_seconds': int(timer_seconds) if timer_seconds else 0,
                 'image_url': image_url or '',
@@ -1417,7 +1625,7 @@ class Database:
                 'user_id': user_id,
                 'ad_id': ad_id,
                 'reward': float(reward),
-                'claimed_at': datetime.now().isoformat()
+                'claimed_at': datetime.now()
             })
             self._update_single_mission_progress(user_id, 'm_passes', 1)
             self.add_live_activity('bonus', user_id, reward, f"claimed offer reward ₹{reward} +1Pass")
@@ -1445,23 +1653,20 @@ class Database:
                 return False
             from datetime import timezone as _tz_ab, timedelta as _td_ab
             today = (datetime.now(_tz_ab.utc) + _td_ab(hours=5, minutes=30)).date().isoformat()
-            # Reset today_earned if it's a new day (IST)
-            user = self.users.find_one({'user_id': user_id}, {'today_date': 1, 'today_earned': 1})
-            if user and user.get('today_date') != today:
-                # New day — reset today_earned
-                self.users.update_one(
-                    {'user_id': user_id},
-                    {'$set': {'today_earned': amount, 'today_date': today},
-                     '$inc': {'balance': amount, 'total_earned': amount}}
-                )
-            else:
-                self.users.update_one(
-                    {'user_id': user_id},
-                    {'$inc': {'balance': amount, 'total_earned': amount, 'today_earned': amount},
-                     '$set': {'today_date': today}}
-                )
+            # Ek pipeline update — naya din (IST) ho toh today_earned reset; fresh doc seedha cache mein
+            user = self.users.find_one_and_update(
+                {'user_id': user_id},
+                [{'$set': {
+                    'balance': {'$add': [{'$ifNull': ['$balance', 0]}, amount]},
+                    'total_earned': {'$add': [{'$ifNull': ['$total_earned', 0]}, amount]},
+                    'today_earned': {'$cond': [{'$eq': ['$today_date', today]},
+                                               {'$add': [{'$ifNull': ['$today_earned', 0]}, amount]}, amount]},
+                    'today_date': today
+                }}],
+                return_document=ReturnDocument.AFTER
+            )
+            self.user_cache.put(user)
             self.add_transaction(user_id, 'credit', amount, description)
-            self.user_cache.pop(f"user_{user_id}", None)
             return True
         except Exception as e:
             logger.error(f"Error adding balance: {e}")
@@ -1469,27 +1674,17 @@ class Database:
 
     # ========== WITHDRAWAL — UPDATED: min ₹20, check month refs ==========
 
-    def get_used_refer_withdrawals(self, user_id):
+    # Ye statuses month ke withdrawn mein gine jaate hain (rejected / archived nahi)
+    COUNTED_WITHDRAWAL_STATUSES = ['pending', 'approved', 'paid', 'completed']
+
+    def get_used_refer_withdrawals(self, user_id, user=None):
         """
-        Count refer slots used in CURRENT MONTH only.
-        Resets on 30th — so only this month's withdrawals count.
+        Count refer slots used in CURRENT MONTH only (month_stats.<YYYY-MM>.withdrawn).
         Formula: each ₹20 withdrawn = 1 refer slot used.
         """
         try:
-            user_id = int(user_id)
-            now = datetime.now()
-            # Current month start
-            month_start = datetime(now.year, now.month, 1).isoformat()
-            # Only count this month's non-rejected withdrawals
-            withdrawals = self.withdrawals.find({
-                'user_id': user_id,
-                'status': {'$in': ['pending', 'approved', 'paid']},
-                'request_date': {'$gte': month_start}
-            })
-            total_withdrawn_rupees = sum(w.get('amount', 0) for w in withdrawals)
-            # Each ₹20 = 1 refer slot used
-            used_slots = int(total_withdrawn_rupees // 20)
-            return used_slots
+            withdrawn = self.get_month_stats(user_id, user=user).get('withdrawn', 0)
+            return int(withdrawn // 20)
         except Exception as e:
             logger.error(f"Error getting used refer withdrawals: {e}")
             return 0
@@ -1497,13 +1692,16 @@ class Database:
     def reset_monthly_withdraw_slots(self):
         """
         Called on 30th of each month (via cron/scheduler).
-        Marks all paid withdrawals as 'archived' so slots reset.
+        Marks all paid withdrawals as 'archived' and zeroes this month's withdrawn counters so slots reset.
         """
         try:
             result = self.withdrawals.update_many(
                 {'status': 'paid'},
-                {'$set': {'status': 'archived', 'archived_at': datetime.now().isoformat()}}
+                {'$set': {'status': 'archived', 'archived_at': datetime.now()}}
             )
+            field = f'month_stats.{self._month_key()}.withdrawn'
+            self.users.update_many({field: {'$gt': 0}}, {'$set': {field: 0}})
+            self.user_cache.clear()
             logger.info(f"Monthly reset: {result.modified_count} withdrawals archived")
             return result.modified_count
         except Exception as e:
@@ -1551,9 +1749,20 @@ class Database:
             if pending:
                 return {'success': False, 'message': 'Pehla withdrawal abhi pending hai.'}
 
-            month_refs = self.get_month_active_refs(user_id)
-            self.users.update_one({'user_id': user_id}, {'$inc': {'balance': -amount}})
-            now = datetime.now().isoformat()
+            month_refs = self.get_month_active_refs(user_id, user=user)
+            now_dt = datetime.now()
+            # Upar ka balance check cached doc pe tha — asli guard filter mein (stale cache / parallel request)
+            debited = self.users.find_one_and_update(
+                {'user_id': user_id, 'balance': {'$gte': amount}},
+                {'$inc': {'balance': -amount, f'month_stats.{self._month_key(now_dt)}.withdrawn': amount}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not debited:
+                self.user_cache.invalidate(user_id)
+                return {'success': False, 'message': 'Insufficient balance. Please refresh and try again.'}
+            self.user_cache.put(debited)
+            now = now_dt
+            amount_pts = int(round(amount * 100))
             slots_used_now = -(-amount_pts // 1000)
             withdrawal = {
                 'user_id': user_id, 'amount': amount, 'method': method, 'details': details,
@@ -1565,9 +1774,9 @@ class Database:
             }
             result = self.withdrawals.insert_one(withdrawal)
             self.add_transaction(user_id, 'withdrawal_request', -amount, f"Withdrawal #{str(result.inserted_id)[-6:]} [{tier_label}]")
-            self.add_live_activity('withdraw_request', user_id, amount, f"requested withdrawal Rs.{amount} [{tier_label}]")
+            self.add_live_activity('withdraw_request', user_id, amount, f"requested withdrawal Rs.{amount} [{tier_label}]",
+                                   user_name=user.get('first_name', 'User'))
             self._update_single_mission_progress(user_id, 'm_withdraw', 1)
-            self.user_cache.pop(f"user_{user_id}", None)
             return {'success': True, 'message': 'Withdrawal submitted! 25-30 tarikh ke beech process hoga.', 'id': str(result.inserted_id)}
         except Exception as e:
             logger.error(f"Error processing withdrawal: {e}")
@@ -1582,8 +1791,8 @@ class Database:
             if not round_doc:
                 round_doc = {
                     'status': 'open',
-                    'created_at': datetime.now().isoformat(),
-                    'result_at': (datetime.now() + timedelta(hours=24)).isoformat(),
+                    'created_at': datetime.now(),
+                    'result_at': datetime.now() + timedelta(hours=24),
                     'winning_number': None,
                     'total_bets': 0,
                     'max_seats': 20
@@ -1640,8 +1849,14 @@ class Database:
             if existing:
                 return {'success': False, 'message': 'Aapne is round mein pehle se bet lagayi hai!'}
 
-            # Deduct balance
-            self.users.update_one({'user_id': user_id}, {'$inc': {'balance': -amount_rupees}})
+            # Deduct balance — conditional, cached balance check stale ho sakta hai
+            debited = self.users.find_one_and_update({'user_id': user_id, 'balance': {'$gte': amount_rupees}},
+                                                     {'$inc': {'balance': -amount_rupees}},
+                                                     return_document=ReturnDocument.AFTER)
+            if not debited:
+                self.user_cache.invalidate(user_id)
+                return {'success': False, 'message': 'Balance kam hai'}
+            self.user_cache.put(debited)
 
             # Record bet
             bet_doc = {
@@ -1652,13 +1867,12 @@ class Database:
                 'username': user.get('username', ''),
                 'amount_pts': amount_pts,
                 'number': number,
-                'placed_at': datetime.now().isoformat(),
+                'placed_at': datetime.now(),
                 'result': None  # filled when declared
             }
             self.jackpot_bets.insert_one(bet_doc)
 
             self.add_transaction(user_id, 'jackpot_bet', -amount_rupees, f"Jackpot bet on #{number}")
-            self.user_cache.pop(f"user_{user_id}", None)
 
             new_seat_count = seat_count + 1
             return {
@@ -1727,8 +1941,8 @@ class Database:
                     win_pts = bet_pts * 40
                     win_rupees = win_pts / 100.0
                     self.users.update_one({'user_id': uid}, {'$inc': {'balance': win_rupees}})
+                    self.user_cache.apply(uid, inc={'balance': win_rupees})
                     self.add_transaction(uid, 'jackpot_win', win_rupees, f"Jackpot win! Number {winning_number} → +{win_pts} pts")
-                    self.user_cache.pop(f"user_{uid}", None)
                     winners.append({'user_id': uid, 'name': bet.get('user_name'), 'pts': win_pts})
                     # Send win notification
                     self.add_notification(uid, f"🎰 JACKPOT JEETA! Number {winning_number} khula → +{win_pts} pts aapke wallet mein!", 'jackpot_win')
@@ -1741,7 +1955,7 @@ class Database:
             # Close round
             self.jackpot_bets.update_one(
                 {'_id': round_doc['_id']},
-                {'$set': {'status': 'closed', 'winning_number': winning_number, 'declared_at': datetime.now().isoformat()}}
+                {'$set': {'status': 'closed', 'winning_number': winning_number, 'declared_at': datetime.now()}}
             )
 
             return {
@@ -1764,7 +1978,7 @@ class Database:
                 'message': message,
                 'type': notif_type,
                 'read': False,
-                'created_at': datetime.now().isoformat()
+                'created_at': datetime.now()
             })
         except Exception as e:
             logger.error(f"add_notification error: {e}")
@@ -1802,10 +2016,11 @@ class Database:
                 return False
             self.withdrawals.update_one(
                 {'_id': ObjectId(withdrawal_id)},
-                {'$set': {'status': 'completed', 'processed_date': datetime.now().isoformat(), 'admin_id': int(admin_id)}}
+                {'$set': {'status': 'completed', 'processed_date': datetime.now(), 'admin_id': int(admin_id)}}
             )
             self.add_transaction(withdrawal['user_id'], 'withdrawal_approved', -withdrawal['amount'], f"Withdrawal approved #{withdrawal_id[-8:]}")
-            self.add_live_activity('withdraw', withdrawal['user_id'], withdrawal['amount'], f"withdrew ₹{withdrawal['amount']}")
+            self.add_live_activity('withdraw', withdrawal['user_id'], withdrawal['amount'], f"withdrew ₹{withdrawal['amount']}",
+                                   user_name=withdrawal.get('user_name') or None)
             return True
         except Exception as e:
             logger.error(f"Error approving withdrawal: {e}")
@@ -1817,10 +2032,18 @@ class Database:
             withdrawal = self.withdrawals.find_one({'_id': ObjectId(withdrawal_id)})
             if not withdrawal:
                 return False
-            self.withdrawals.update_one(
-                {'_id': ObjectId(withdrawal_id)},
-                {'$set': {'status': 'rejected', 'processed_date': datetime.now().isoformat(), 'admin_id': int(admin_id)}}
+            res = self.withdrawals.update_one(
+                {'_id': ObjectId(withdrawal_id), 'status': {'$ne': 'rejected'}},
+                {'$set': {'status': 'rejected', 'processed_date': datetime.now(), 'admin_id': int(admin_id)}}
             )
+            if res.modified_count == 0:
+                return False   # pehle hi reject ho chuka — double refund nahi
+            # Request wale mahine ka withdrawn wapas (slot free); add_balance fresh doc cache mein daalta hai
+            requested = withdrawal.get('request_date')
+            month = requested[:7] if isinstance(requested, str) else self._month_key(requested)
+            if withdrawal.get('status') in self.COUNTED_WITHDRAWAL_STATUSES:
+                self.users.update_one({'user_id': withdrawal['user_id']},
+                                      {'$inc': {f'month_stats.{month}.withdrawn': -withdrawal['amount']}})
             self.add_balance(withdrawal['user_id'], withdrawal['amount'], "Refund for rejected withdrawal")
             return True
         except Exception as e:
@@ -1835,7 +2058,7 @@ class Database:
             self.transactions.insert_one({
                 'user_id': user_id, 'type': type_,
                 'amount': float(amount), 'description': description,
-                'timestamp': datetime.now().isoformat(), 'status': 'completed'
+                'timestamp': datetime.now(), 'status': 'completed'
             })
             return True
         except Exception as e:
@@ -1854,7 +2077,7 @@ class Database:
             new_tier = self.config.calculate_tier(active_refs)
             if new_tier != user.get('tier'):
                 self.users.update_one({'user_id': user_id}, {'$set': {'tier': new_tier}})
-                self.user_cache.pop(f"user_{user_id}", None)
+                self.user_cache.apply(user_id, set_={'tier': new_tier})
             return new_tier
         except Exception as e:
             logger.error(f"Error updating tier: {e}")
@@ -1864,87 +2087,213 @@ class Database:
         try:
             user_id = int(user_id)
             self.users.update_one({'user_id': user_id}, {'$set': {f'notify_{setting}': value}})
-            self.user_cache.pop(f"user_{user_id}", None)
+            self.user_cache.apply(user_id, set_={f'notify_{setting}': value})
             return True
         except Exception as e:
             logger.error(f"Error updating notification setting: {e}")
             return False
 
-    # ========== LEADERBOARD ==========
+    # ========== LEADERBOARD (materialized period counters) ==========
+
+    @staticmethod
+    def _period_start(mode, now=None):
+        now = now or datetime.now()
+        if mode == 'weekly':
+            # Monday 00:00:00 of current week
+            return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        # 1st day of current month 00:00:00
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def _period_key(cls, mode, now=None):
+        """ weekly → 'W2025-06-02' (us hafte ka Monday), monthly → 'M2025-06' """
+        start = cls._period_start(mode, now)
+        return f"W{start.date().isoformat()}" if mode == 'weekly' else f"M{start.strftime('%Y-%m')}"
+
+    def _bump_leaderboard(self, referrer_id, referrer_name, now=None):
+        """ Activation pe weekly + monthly counter +1 (write buffer se, lost nahi hota). """
+        ts = datetime.now()
+        for mode in ('weekly', 'monthly'):
+            self.writer.add(self.leaderboard_periods, UpdateOne(
+                {'period': self._period_key(mode, now), 'referrer_id': referrer_id},
+                {'$inc': {'refs': 1}, '$set': {'name': referrer_name, 'updated_at': ts}},
+                upsert=True
+            ), droppable=False)
+
+    @staticmethod
+    def _active_refs_decrements(referrals):
+        """
+        Delete ho rahe referrals → {referrer_id: {'month_stats.<activation month>.active_refs': -n}}.
+        Sirf active + parse hone wali activation_date (string / date dono) — baaki ka koi bucket nahi.
+        """
+        incs = {}
+        for ref in referrals:
+            activated = as_datetime(ref.get('activation_date'))
+            if not ref.get('is_active') or not ref.get('referrer_id') or not activated:
+                continue
+            field = f"month_stats.{Database._month_key(activated)}.active_refs"
+            bucket = incs.setdefault(ref['referrer_id'], {})
+            bucket[field] = bucket.get(field, 0) - 1
+        return incs
+
+    def _drop_from_leaderboard(self, referrals):
+        """
+        Delete ho rahe active referrals ko current week / month ke leaderboard_periods se -1.
+        Purane periods koi padhta nahi, unhe nahi chhoote. Pehle buffer flush — activation ka +1 abhi
+        queue mein ho toh doc bana hi na ho aur -1 kahin na lage.
+        """
+        now = datetime.now()
+        current = {self._period_key(mode, now): mode for mode in ('weekly', 'monthly')}
+        drops = {}
+        for ref in referrals:
+            activated = as_datetime(ref.get('activation_date'))
+            if not ref.get('is_active') or not ref.get('referrer_id') or not activated:
+                continue
+            for key, mode in current.items():
+                if self._period_key(mode, activated) == key:
+                    drops[(key, ref['referrer_id'])] = drops.get((key, ref['referrer_id']), 0) - 1
+        if not drops:
+            return 0
+        self.writer.flush()
+        self.leaderboard_periods.bulk_write([
+            UpdateOne({'period': key, 'referrer_id': referrer_id}, {'$inc': {'refs': n}})
+            for (key, referrer_id), n in drops.items()
+        ], ordered=False)
+        return len(drops)
 
     def get_leaderboard(self, limit=20, mode='weekly'):
         """
         Weekly = refs activated THIS week (Mon-Sun)
         Monthly = refs activated THIS month
-        Both are fresh — resets automatically each week/month.
+        leaderboard_periods se ek indexed find + users ka ek batched $in (no N+1).
         NO all-time fallback — fresh period = fresh start.
         """
         try:
-            now = datetime.now()
-
-            if mode == 'weekly':
-                # Monday 00:00:00 of current week
-                days_since_monday = now.weekday()
-                date_filter = (now - timedelta(days=days_since_monday)).replace(
-                    hour=0, minute=0, second=0, microsecond=0
-                )
-                label = 'weekly'
-            else:
-                # 1st day of current month 00:00:00
-                date_filter = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                label = 'monthly'
-
-            # Try matching both datetime objects AND isoformat strings
-            # because some records may have been stored as strings
-            date_filter_str = date_filter.isoformat()
-
-            pipeline = [
-                {'$match': {
-                    'is_active': True,
-                    '$or': [
-                        {'activation_date': {'$gte': date_filter}},
-                        {'activation_date': {'$gte': date_filter_str}}
-                    ]
-                }},
-                {'$group': {
-                    '_id': '$referrer_id',
-                    'period_refs': {'$sum': 1}
-                }},
-                {'$sort': {'period_refs': -1}},
-                {'$limit': limit}
-            ]
+            label = 'weekly' if mode == 'weekly' else 'monthly'
+            rows = list(self.leaderboard_periods.find(
+                {'period': self._period_key(label), 'refs': {'$gt': 0}},
+                {'_id': 0, 'referrer_id': 1, 'refs': 1, 'name': 1}
+            ).sort([('refs', DESCENDING), ('referrer_id', ASCENDING)]).limit(limit))
+            if not rows:
+                return []
 
-            period_data = list(self.referrals.aggregate(pipeline))
+            users = {u['user_id']: u for u in self.users.find(
+                {'user_id': {'$in': [r['referrer_id'] for r in rows]}},
+                {'_id': 0, 'user_id': 1, 'first_name': 1, 'active_refs': 1, 'pending_refs': 1, 'total_earned': 1}
+            )}
 
             result = []
-            for i, item in enumerate(period_data):
-                uid = item['_id']
-                if not uid:
-                    continue
-                user = self.get_user(uid)
+            for row in rows:
+                user = users.get(row['referrer_id'])
                 if not user:
                     continue
                 result.append({
-                    'rank': i + 1,
-                    'name': user.get('first_name', 'User')[:15],
-                    'active_refs': item['period_refs'],   # current period only
+                    'rank': len(result) + 1,
+                    'name': (row.get('name') or user.get('first_name', 'User'))[:15],
+                    'active_refs': row['refs'],   # current period only
                     'total_active': user.get('active_refs', 0),
                     'pending_refs': user.get('pending_refs', 0),
                     'total_earned': user.get('total_earned', 0),
                     'period': label
                 })
-
-            # Re-rank (filter may have removed some nulls)
-            for i, r in enumerate(result):
-                r['rank'] = i + 1
-
-            # No all-time fallback — leaderboard resets cleanly each period
             return result
 
         except Exception as e:
             logger.error(f"Leaderboard error: {e}")
             return []
 
+    def get_leaderboard_position(self, user_id, mode='weekly', neighbours=2):
+        """
+        Caller ki period rank + upar/neeche `neighbours` log — teen indexed queries, koi scan nahi.
+        Order (refs desc, referrer_id asc) — get_leaderboard wala hi. Period mein 0 refs ho toh None.
+        """
+        try:
+            user_id = int(user_id)
+            key = self._period_key('weekly' if mode == 'weekly' else 'monthly')
+            me = self.leaderboard_periods.find_one({'period': key, 'referrer_id': user_id}, {'_id': 0, 'refs': 1, 'name': 1})
+            if not me or me.get('refs', 0) <= 0:
+                return None
+            refs = me['refs']
+            ahead = {'period': key, '$or': [{'refs': {'$gt': refs}}, {'refs': refs, 'referrer_id': {'$lt': user_id}}]}
+            behind = {'period': key, 'refs': {'$gt': 0}, '$or': [{'refs': {'$lt': refs}}, {'refs': refs, 'referrer_id': {'$gt': user_id}}]}
+            rank = self.leaderboard_periods.count_documents(ahead) + 1
+            proj = {'_id': 0, 'referrer_id': 1, 'refs': 1, 'name': 1}
+
+            def _row(r, pos):
+                return {'rank': pos, 'user_id': r['referrer_id'], 'name': (r.get('name') or 'User')[:15], 'active_refs': r['refs']}
+
+            above = list(self.leaderboard_periods.find(ahead, proj)
+                         .sort([('refs', ASCENDING), ('referrer_id', DESCENDING)]).limit(neighbours))
+            below = list(self.leaderboard_periods.find(behind, proj)
+                         .sort([('refs', DESCENDING), ('referrer_id', ASCENDING)]).limit(neighbours))
+            return {
+                'rank': rank,
+                'active_refs': refs,
+                'name': (me.get('name') or 'User')[:15],
+                'above': [_row(r, rank - 1 - i) for i, r in enumerate(above)][::-1],
+                'below': [_row(r, rank + 1 + i) for i, r in enumerate(below)]
+            }
+        except Exception as e:
+            logger.error(f"Leaderboard position error for {user_id}: {e}")
+            return None
+
+    def get_user_rank(self, user_id):
+        """
+        All-time rank by active_refs (suspicious users excluded) — count_documents, list load nahi.
+        Tie pe chhota user_id aage (same order jo sorted list deti thi).
+        """
+        try:
+            user_id = int(user_id)
+            user = self.get_user(user_id)
+            refs = user.get('active_refs', 0) if user else 0
+            return self.users.count_documents({
+                'suspicious_activity': False,
+                '$or': [{'active_refs': {'$gt': refs}}, {'active_refs': refs, 'user_id': {'$lt': user_id}}]
+            }) + 1
+        except Exception as e:
+            logger.error(f"Error getting user rank: {e}")
+            return 0
+
+    def rebuild_leaderboard_periods(self):
+        """
+        Current week + month ke counters referrals se dobara banao (backfill / drift fix).
+        Pehle write buffer flush — warna buffered _bump_leaderboard $inc is $set ke baad lagke double ginte.
+        (Doosre process ke buffer tak yeh nahi pahunchta — rebuild low traffic mein chalao.)
+        Returns {period_key: rows}.
+        """
+        report = {}
+        try:
+            self.writer.flush()
+            now = datetime.now()
+            for mode in ('weekly', 'monthly'):
+                start = self._period_start(mode, now)
+                key = self._period_key(mode, now)
+                counts = list(self.referrals.aggregate([
+                    {'$match': {
+                        'is_active': True,
+                        **self._date_window('referrals', 'activation_date', start)
+                    }},
+                    {'$group': {'_id': '$referrer_id', 'refs': {'$sum': 1}}}
+                ]))
+                counts = [c for c in counts if c['_id']]
+                names = {u['user_id']: u.get('first_name', 'User') for u in self.users.find(
+                    {'user_id': {'$in': [c['_id'] for c in counts]}}, {'_id': 0, 'user_id': 1, 'first_name': 1}
+                )}
+                ts = now
+                ops = [UpdateOne(
+                    {'period': key, 'referrer_id': c['_id']},
+                    {'$set': {'refs': c['refs'], 'name': names.get(c['_id'], 'User'), 'updated_at': ts}},
+                    upsert=True
+                ) for c in counts]
+                if ops:
+                    self.leaderboard_periods.bulk_write(ops, ordered=False)
+                self.leaderboard_periods.delete_many({'period': key, 'referrer_id': {'$nin': [c['_id'] for c in counts]}})
+                report[key] = len(ops)
+            logger.info(f"✅ Leaderboard periods rebuilt: {report}")
+        except Exception as e:
+            logger.error(f"Leaderboard rebuild error: {e}")
+        return report
+
     # ========== GAME FUNCTIONS ==========
 
     # SPIN: segments must match frontend SEGS array exactly (same index)
@@ -1979,51 +2328,162 @@ class Database:
                 date = datetime.now().date().isoformat()
             state = self.game_states.find_one({'user_id': user_id, 'date': date})
             if not state:
-                state = {
-                    'user_id': user_id, 'date': date,
-                    'today_game_earned': 0.0, 'wins': 0, 'win_streak': 0,
-                    'guess_secret': random.randint(1, 10), 'guess_attempts_used': 0
-                }
+                state = self._default_game_state(user_id, date)
                 self.game_states.insert_one(state)
-            if '_id' in state:
-                state['_id'] = str(state['_id'])
-            # Map total_plays -> totalPlays so JS gameState syncs correctly on load
-            state['totalPlays'] = state.get('total_plays', 0)
-            return state
+            return self._game_state_view(state)
         except Exception as e:
             logger.error(f"Error getting game state: {e}")
             return {'today_game_earned': 0.0, 'wins': 0, 'win_streak': 0}
 
+    @staticmethod
+    def _default_game_state(user_id, date):
+        return {
+            'user_id': user_id, 'date': date,
+            'today_game_earned': 0.0, 'wins': 0, 'win_streak': 0,
+            'guess_secret': random.randint(1, 10), 'guess_attempts_used': 0
+        }
+
+    @staticmethod
+    def _game_state_view(state):
+        if '_id' in state:
+            state['_id'] = str(state['_id'])
+        # Map total_plays -> totalPlays so JS gameState syncs correctly on load
+        state['totalPlays'] = state.get('total_plays', 0)
+        return state
+
+    # ========== GAME SETTLEMENT (single round trip) ==========
+
+    def _mission_progress_op(self, user_id, mission_id, count=1):
+        """
+        Mission progress ka ek UpdateOne — aaj ke mission_days doc pe $inc (upsert).
+        Total pe cap padhte waqt lagta hai; claimed flag alag field hai, touch nahi hota.
+        """
+        mdef = self.MISSIONS_BY_ID.get(mission_id)
+        count = int(count or 0)
+        if not mdef or count <= 0:
+            return None
+        return UpdateOne(self._mission_key(mdef, user_id),
+                         {'$inc': {f'missions.{mission_id}.progress': count}}, upsert=True)
+
+    def _settle_game(self, user_id, game_type, reward=0.0, pass_cost=1, bet=0.0,
+                     description='Game reward', count_play=False, extra_activity=None, user_set=None, guard=None):
+        """
+        Ek game round ka settlement — users pe ek hi find_one_and_update (aggregation pipeline):
+          - pass_cost / bet sirf tab kate jab passes/balance kaafi ho (filter mein condition)
+          - reward MAX_DAILY_GAME_EARN pe cap (game_day / game_day_earned user doc pe)
+          - balance, total_earned, today_earned (IST), games_won, total_game_earned, total_game_plays
+        Side effects (transactions, game_states, m_game mission, live feed) write buffer mein ek batch.
+        `user_set` (guess secret jaise) isi update mein user doc pe likhta hai; `guard` filter mein extra
+        condition — cached state stale ho toh match nahi hota. game_day field ab tak nahi bana (purana user)
+        toh aaj ka cap game_states.today_game_earned se shuru hota hai, warna deploy wale din cap dobara khulta.
+        Returns (user_after, credited); passes/balance kam, guard fail ya user na mile toh (None, 0).
+        """
+        user_id = int(user_id)
+        now = datetime.now()
+        today = now.date().isoformat()
+        ist_today = self._ist_today()
+        reward = round(max(float(reward), 0.0), 4)
+        bet = max(float(bet), 0.0)
+        cap = self.MAX_DAILY_GAME_EARN
+
+        query = {'user_id': user_id}
+        if pass_cost > 0:
+            query['passes'] = {'$gte': pass_cost}
+        if bet > 0:
+            query['balance'] = {'$gte': bet}
+        if guard:
+            query.update(guard)
+
+        # Pehla settle (game_day abhi missing) — aaj jo pehle game_states mein kamaya woh cap mein gino
+        seed = 0.0
+        known = self.get_user(user_id)
+        if known is not None and 'game_day' not in known:
+            state = self.game_states.find_one({'user_id': user_id, 'date': today}, {'today_game_earned': 1})
+            seed = float((state or {}).get('today_game_earned', 0) or 0)
+
+        credited = {'$gt': ['$_gc', 0]}
+        pipeline = [
+            {'$set': {'_ge': {'$cond': [
+                {'$eq': ['$game_day', today]}, {'$ifNull': ['$game_day_earned', 0]},
+                {'$cond': [{'$eq': [{'$type': '$game_day'}, 'missing']}, seed, 0]}
+            ]}}},
+            {'$set': {'_gc': {'$round': [{'$min': [reward, {'$max': [0, {'$subtract': [cap, '$_ge']}]}]}, 4]}}},
+            {'$set': {
+                'passes': {'$subtract': [{'$ifNull': ['$passes', 0]}, pass_cost]},
+                'balance': {'$add': [{'$subtract': [{'$ifNull': ['$balance', 0]}, bet]}, '$_gc']},
+                'total_earned': {'$add': [{'$ifNull': ['$total_earned', 0]}, '$_gc']},
+                # add_balance wala IST day reset — credit ho tabhi
+                'today_earned': {'$cond': [credited, {'$cond': [
+                    {'$eq': ['$today_date', ist_today]},
+                    {'$add': [{'$ifNull': ['$today_earned', 0]}, '$_gc']},
+                    '$_gc'
+                ]}, '$today_earned']},
+                'today_date': {'$cond': [credited, ist_today, '$today_date']},
+                'games_won': {'$add': [{'$ifNull': ['$games_won', 0]}, {'$cond': [credited, 1, 0]}]},
+                'total_game_earned': {'$add': [{'$ifNull': ['$total_game_earned', 0]}, '$_gc']},
+                'total_game_plays': {'$add': [{'$ifNull': ['$total_game_plays', 0]}, 1 if count_play else 0]},
+                'game_day': today,
+                'game_day_earned': {'$add': ['$_ge', '$_gc']},
+                'last_game_credit': '$_gc',
+                **{k: {'$literal': v} for k, v in (user_set or {}).items()}
+            }},
+            {'$unset': ['_ge', '_gc']}
+        ]
+        user = self.users.find_one_and_update(query, pipeline, return_document=ReturnDocument.AFTER)
+        if not user:
+            return None, 0
+        self.user_cache.put(user)
+        credit = user.get('last_game_credit', 0) or 0
+
+        # ---- side effects: ek batch, request thread pe koi round trip nahi ----
+        ts = now
+        if bet > 0:
+            self.writer.insert(self.transactions, {
+                'user_id': user_id, 'type': 'game_bet', 'amount': -bet,
+                'description': f"Game bet in {game_type}", 'timestamp': ts, 'status': 'completed'
+            }, droppable=False)
+        if credit > 0:
+            self.writer.insert(self.transactions, {
+                'user_id': user_id, 'type': 'credit', 'amount': float(credit),
+                'description': description, 'timestamp': ts, 'status': 'completed'
+            }, droppable=False)
+        inc = {}
+        if credit > 0:
+            inc.update({'today_game_earned': credit, 'wins': 1})
+        if count_play:
+            inc['total_plays'] = 1
+        if inc:
+            self.writer.add(self.game_states, UpdateOne({'user_id': user_id, 'date': today}, {'$inc': inc}, upsert=True),
+                            droppable=False)
+        if credit > 0 or count_play:
+            op = self._mission_progress_op(user_id, 'm_game', 1)
+            if op:
+                self.writer.add(self.mission_days, op, droppable=False)
+        if credit > 0:
+            name = user.get('first_name', 'User')
+            self.add_live_activity('game', user_id, credit, f"won ₹{credit:.2f} in {game_type}", user_name=name)
+            if extra_activity:
+                self.add_live_activity(extra_activity[0], user_id, credit, extra_activity[1], user_name=name)
+        return user, credit
+
+    def _no_pass_message(self, user_id, bet=0.0):
+        """ Settlement fail hua — cached user se sahi reason batao. """
+        user = self.get_user(user_id)
+        if not user:
+            return 'User not found'
+        if bet > 0 and user.get('balance', 0) < bet:
+            return f'Balance kam hai! ₹{user.get("balance", 0):.2f} hai'
+        return 'Passes nahi hain! Refer karo ya daily bonus lo'
+
     def add_game_earning(self, user_id, amount, game_type='game', description='Game reward'):
+        """ Pass-free game credit (daily cap ke saath) — _settle_game pe. """
         try:
-            user_id = int(user_id)
-            amount = float(amount)
-            today = datetime.now().date().isoformat()
-            # Daily cap — prevent abuse
-            state = self.get_game_state(user_id, today)
-            day_earned = state.get('today_game_earned', 0.0)
-            cap = getattr(self, 'MAX_DAILY_GAME_EARN', 3.0)
-            amount = round(min(amount, max(0.0, cap - day_earned)), 4)
-            if amount <= 0:
+            user, credit = self._settle_game(user_id, game_type, reward=amount, pass_cost=0, description=description)
+            if not user:
+                return {'success': False, 'message': 'User not found', 'earned': 0}
+            if credit <= 0:
                 return {'success': True, 'earned': 0, 'capped': True}
-            self.add_balance(user_id, amount, description)
-
-            state = self.get_game_state(user_id, today)
-            new_earned = state.get('today_game_earned', 0.0) + amount
-            self.game_states.update_one(
-                {'user_id': user_id, 'date': today},
-                {'$set': {'today_game_earned': new_earned}, '$inc': {'wins': 1}},
-                upsert=True
-            )
-            self.users.update_one(
-                {'user_id': user_id},
-                {'$inc': {'games_won': 1, 'total_game_earned': amount}}
-            )
-            self.user_cache.pop(f"user_{user_id}", None)
-            self.add_live_activity('game', user_id, amount, f"won ₹{amount:.2f} in {game_type}")
-            self._update_single_mission_progress(user_id, 'm_game', 1)
-
-            return {'success': True, 'earned': amount, 'today_total': new_earned}
+            return {'success': True, 'earned': credit, 'today_total': user.get('game_day_earned', 0)}
         except Exception as e:
             logger.error(f"Error adding game earning: {e}")
             return {'success': False, 'message': str(e), 'earned': 0}
@@ -2032,14 +2492,16 @@ class Database:
         try:
             user_id = int(user_id)
             amount = float(amount)
-            user = self.get_user(user_id)
+            user = self.users.find_one_and_update({'user_id': user_id, 'balance': {'$gte': amount}},
+                                                  {'$inc': {'balance': -amount}}, return_document=ReturnDocument.AFTER)
             if not user:
-                return {'success': False, 'message': 'User not found'}
-            if user.get('balance', 0) < amount:
+                self.user_cache.invalidate(user_id)
+                user = self.get_user(user_id)
+                if not user:
+                    return {'success': False, 'message': 'User not found'}
                 return {'success': False, 'message': f'Balance kam hai! ₹{user.get("balance", 0):.2f} hai'}
-            self.users.update_one({'user_id': user_id}, {'$inc': {'balance': -amount}})
+            self.user_cache.put(user)
             self.add_transaction(user_id, 'game_bet', -amount, f"Game bet in {game_type}")
-            self.user_cache.pop(f"user_{user_id}", None)
             return {'success': True, 'deducted': amount}
         except Exception as e:
             logger.error(f"Error deducting game balance: {e}")
@@ -2053,13 +2515,6 @@ class Database:
         """
         try:
             user_id = int(user_id)
-            user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain! Refer karo ya daily bonus lo'}
-
-            if not self.deduct_pass(user_id):
-                return {'success': False, 'message': 'Pass deduct nahi hua'}
-
             weights = self.SPIN_WEIGHTS
             total_w = sum(weights)
             r = random.random() * total_w
@@ -2073,35 +2528,43 @@ class Database:
             reward = self.SPIN_SEGMENTS[selected]['value']
             reward_label = self.SPIN_SEGMENTS[selected]['label']
 
-            earn_result = self.add_game_earning(user_id, reward, 'spin', f"Spin reward {reward_label}")
+            user, credit = self._settle_game(user_id, 'spin', reward=reward, description=f"Spin reward {reward_label}")
+            if not user:
+                return {'success': False, 'message': self._no_pass_message(user_id)}
 
             return {
                 'success': True,
-                'reward': earn_result.get('earned', reward),
+                'reward': credit,
                 'reward_label': reward_label,
                 'segment_index': selected,   # Frontend uses this to stop wheel
-                'today_earned': earn_result.get('today_total', 0)
+                'today_earned': user.get('game_day_earned', 0)
             }
         except Exception as e:
             logger.error(f"Error processing spin: {e}")
             return {'success': False, 'message': str(e)}
 
     def process_game_guess(self, user_id, guess, bet):
-        """Number guess — costs 1 pass per attempt, fixed reward on win."""
+        """
+        Number guess — costs 1 pass per attempt, fixed reward on win.
+        Secret / attempts user doc pe (guess_day, guess_secret, guess_attempts_used) — cached user se padhte
+        hain aur settlement ke saath hi likhte hain, yaani cache hit pe ek round trip. `guard` se stale cache
+        (doosre worker ne beech mein guess kiya) match nahi hota — tab cache hata ke dobara try bolte hain.
+        """
         try:
             user_id = int(user_id)
             today = datetime.now().date().isoformat()
-            state = self.get_game_state(user_id, today)
-
             user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain!'}
-
-            # Deduct 1 pass per attempt
-            self.deduct_pass(user_id)
+            if not user:
+                return {'success': False, 'message': 'User not found'}
 
-            secret = state.get('guess_secret', random.randint(1, 10))
-            attempts_used = state.get('guess_attempts_used', 0) + 1
+            if user.get('guess_day') == today:
+                secret = user.get('guess_secret')
+                attempts_used = user.get('guess_attempts_used', 0) + 1
+                guard = {'guess_day': today, 'guess_secret': secret, 'guess_attempts_used': attempts_used - 1}
+            else:
+                secret = random.randint(1, 10)
+                attempts_used = 1
+                guard = {'guess_day': {'$ne': today}}
             is_correct = (guess == secret)
             is_last_attempt = (attempts_used >= 3)
             FIXED_WIN_REWARD = 5  # fixed 500 pts (5 units)
@@ -2112,20 +2575,10 @@ class Database:
                 'attempts_used': attempts_used, 'guess': guess, 'reward': 0
             }
 
-            if is_correct:
-                earn_result = self.add_game_earning(user_id, FIXED_WIN_REWARD, 'guess', "Guess correct! +500 pts")
-                result['reward'] = earn_result.get('earned', 0)
-                result['today_earned'] = earn_result.get('today_total', 0)
-                self.game_states.update_one(
-                    {'user_id': user_id, 'date': today},
-                    {'$set': {'guess_secret': random.randint(1, 10), 'guess_attempts_used': 0}}
-                )
-            elif is_last_attempt:
-                self.game_states.update_one(
-                    {'user_id': user_id, 'date': today},
-                    {'$set': {'guess_secret': random.randint(1, 10), 'guess_attempts_used': 0}}
-                )
+            if is_correct or is_last_attempt:
+                user_set = {'guess_day': today, 'guess_secret': random.randint(1, 10), 'guess_attempts_used': 0}
             else:
+                user_set = {'guess_day': today, 'guess_secret': secret, 'guess_attempts_used': attempts_used}
                 diff = abs(guess - secret)
                 if diff <= 1: hint = '🔥 Bahut paas!'
                 elif diff <= 3: hint = '♨️ Kaafi paas'
@@ -2133,8 +2586,19 @@ class Database:
                 else: hint = '❄️ Bahut door!'
                 hint += ' (Kam karo)' if guess > secret else ' (Zyada karo)'
                 result['hint'] = hint
-                self.game_states.update_one({'user_id': user_id, 'date': today}, {'$set': {'guess_attempts_used': attempts_used}})
 
+            # 1 pass per attempt + (correct ho toh) reward — ek settlement
+            user, credit = self._settle_game(user_id, 'guess', reward=FIXED_WIN_REWARD if is_correct else 0,
+                                             description="Guess correct! +500 pts", user_set=user_set, guard=guard)
+            if not user:
+                self.user_cache.invalidate(user_id)
+                fresh = self.get_user(user_id) or {}
+                if fresh.get('passes', 0) < 1:
+                    return {'success': False, 'message': 'Passes nahi hain!'}
+                return {'success': False, 'message': 'Game state badal gaya, dobara try karo'}
+            if is_correct:
+                result['reward'] = credit
+                result['today_earned'] = user.get('game_day_earned', 0)
             return result
         except Exception as e:
             logger.error(f"Error processing guess: {e}")
@@ -2144,25 +2608,19 @@ class Database:
         """Coin flip — costs 1 pass."""
         try:
             user_id = int(user_id)
-            user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain!'}
-
-            # Deduct 1 pass (no balance deduction)
-            if not self.deduct_pass(user_id):
-                return {'success': False, 'message': 'Pass deduct nahi hua'}
-
             actual_result = 'heads' if random.random() < 0.5 else 'tails'
             won = (choice == actual_result)
 
             FIXED_WIN = 5  # 500 pts
-            result = {'success': True, 'won': won, 'result': actual_result, 'choice': choice, 'bet': 1, 'reward': 0}
+            user, credit = self._settle_game(user_id, 'coin', reward=FIXED_WIN if won else 0,
+                                             description="Coin flip win! +500 pts")
+            if not user:
+                return {'success': False, 'message': 'Passes nahi hain!'}
 
+            result = {'success': True, 'won': won, 'result': actual_result, 'choice': choice, 'bet': 1, 'reward': 0}
             if won:
-                earn_result = self.add_game_earning(user_id, FIXED_WIN, 'coin', "Coin flip win! +500 pts")
-                result['reward'] = earn_result.get('earned', 0)
-                result['today_earned'] = earn_result.get('today_total', 0)
-
+                result['reward'] = credit
+                result['today_earned'] = user.get('game_day_earned', 0)
             return result
         except Exception as e:
             logger.error(f"Error processing coin flip: {e}")
@@ -2185,13 +2643,6 @@ class Database:
             if not 1 <= choice <= 6:
                 return {'success': False, 'message': 'Choice must be 1-6'}
 
-            user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain! Refer karo ya daily bonus lo'}
-
-            if not self.deduct_pass(user_id):
-                return {'success': False, 'message': 'Pass deduct nahi hua'}
-
             # Roll dice
             actual_number = random.randint(1, 6)
             matched = (actual_number == choice)
@@ -2202,6 +2653,12 @@ class Database:
             else:
                 won = False
 
+            reward = 0.50
+            user, credit = self._settle_game(user_id, 'dice', reward=reward if won else 0,
+                                             description=f"Dice roll win! {choice} aaya")
+            if not user:
+                return {'success': False, 'message': self._no_pass_message(user_id)}
+
             result = {
                 'success': True,
                 'won': won,
@@ -2211,10 +2668,8 @@ class Database:
             }
 
             if won:
-                reward = 0.50
-                earn_result = self.add_game_earning(user_id, reward, 'dice', f"Dice roll win! {choice} aaya")
-                result['reward'] = earn_result.get('earned', reward)
-                result['today_earned'] = earn_result.get('today_total', 0)
+                result['reward'] = credit
+                result['today_earned'] = user.get('game_day_earned', 0)
 
             logger.info(f"Dice: user={user_id} choice={choice} actual={actual_number} matched={matched} won={won}")
             return result
@@ -2230,13 +2685,6 @@ class Database:
         """
         try:
             user_id = int(user_id)
-            user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain!'}
-
-            if not self.deduct_pass(user_id):
-                return {'success': False, 'message': 'Pass deduct nahi hua'}
-
             roll = random.random()
             if roll < 0.60:
                 reward = 0.10
@@ -2249,12 +2697,14 @@ class Database:
             else:
                 reward = 5.0
 
-            earn_result = self.add_game_earning(user_id, reward, 'scratch', f"Scratch card ₹{reward}")
+            user, credit = self._settle_game(user_id, 'scratch', reward=reward, description=f"Scratch card ₹{reward}")
+            if not user:
+                return {'success': False, 'message': 'Passes nahi hain!'}
 
             return {
                 'success': True,
-                'reward': earn_result.get('earned', reward),
-                'today_earned': earn_result.get('today_total', 0)
+                'reward': credit,
+                'today_earned': user.get('game_day_earned', 0)
             }
         except Exception as e:
             logger.error(f"Error processing scratch: {e}")
@@ -2282,12 +2732,6 @@ class Database:
             valid_colors = list(self.COLOR_CONFIG.keys())
             if choice not in valid_colors:
                 return {'success': False, 'message': 'Invalid color'}
-            user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain!'}
-            # Deduct 1 pass only (no balance deduction)
-            if not self.deduct_pass(user_id):
-                return {'success': False, 'message': 'Pass deduct nahi hua'}
             # Weighted color pick
             probs = [self.COLOR_CONFIG[c]['prob'] for c in valid_colors]
             total = sum(probs)
@@ -2299,37 +2743,32 @@ class Database:
                     result_color = valid_colors[i]
                     break
             won = (choice == result_color)
-            result = {'success': True, 'won': won, 'result_color': result_color, 'choice': choice, 'reward': 0}
             # Fixed rewards per color (no bet multiplier)
             COLOR_FIXED_REWARDS = {'red': 8, 'green': 8, 'blue': 10, 'gold': 15, 'purple': 20}
+            fixed_reward = COLOR_FIXED_REWARDS.get(result_color, 8)
+            # 1 pass only (no balance deduction)
+            user, credit = self._settle_game(user_id, 'color', reward=fixed_reward if won else 0,
+                                             description=f"Color {result_color} win!")
+            if not user:
+                return {'success': False, 'message': 'Passes nahi hain!'}
+            result = {'success': True, 'won': won, 'result_color': result_color, 'choice': choice, 'reward': 0}
             if won:
-                fixed_reward = COLOR_FIXED_REWARDS.get(result_color, 8)
-                earn_result = self.add_game_earning(user_id, fixed_reward, 'color', f"Color {result_color} win!")
-                result['reward'] = earn_result.get('earned', fixed_reward)
-                result['multiplier'] = COLOR_FIXED_REWARDS.get(result_color, 8)
-                result['today_earned'] = earn_result.get('today_total', 0)
+                result['reward'] = credit
+                result['multiplier'] = fixed_reward
+                result['today_earned'] = user.get('game_day_earned', 0)
             return result
         except Exception as e:
             logger.error(f"Color game error: {e}")
             return {'success': False, 'message': str(e)}
 
     def process_crash_start(self, user_id, bet):
-        """Crash game — deduct pass AND bet amount from balance."""
+        """Crash game — deduct pass AND bet amount from balance (ek conditional update)."""
         try:
             user_id = int(user_id)
             bet = float(bet)
-            user = self.get_user(user_id)
-            if not user or user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain!'}
-            if user.get('balance', 0) < bet:
-                return {'success': False, 'message': f'Balance kam hai! ₹{user.get("balance",0):.2f} hai'}
-            # Deduct pass
-            if not self.deduct_pass(user_id):
-                return {'success': False, 'message': 'Pass deduct nahi hua'}
-            # Deduct bet from balance
-            self.users.update_one({'user_id': user_id}, {'$inc': {'balance': -bet}})
-            self.add_transaction(user_id, 'game_bet', -bet, f"Crash game bet ₹{bet}")
-            self.user_cache.pop(f"user_{user_id}", None)
+            user, _ = self._settle_game(user_id, 'crash', pass_cost=1, bet=bet)
+            if not user:
+                return {'success': False, 'message': self._no_pass_message(user_id, bet)}
             return {'success': True}
         except Exception as e:
             logger.error(f"Crash start error: {e}")
@@ -2346,8 +2785,11 @@ class Database:
                 return {'success': False, 'message': 'Invalid multiplier'}
             if reward > bet * 10.5:
                 reward = round(bet * 10, 2)
-            earn_result = self.add_game_earning(user_id, reward, 'crash', f"Crash cashout {multiplier}x")
-            return {'success': True, 'reward': earn_result.get('earned', reward), 'multiplier': multiplier}
+            user, credit = self._settle_game(user_id, 'crash', reward=reward, pass_cost=0,
+                                             description=f"Crash cashout {multiplier}x")
+            if not user:
+                return {'success': False, 'message': 'User not found'}
+            return {'success': True, 'reward': credit, 'multiplier': multiplier}
         except Exception as e:
             logger.error(f"Crash cashout error: {e}")
             return {'success': False, 'message': str(e)}
@@ -2379,15 +2821,11 @@ class Database:
             user_id = int(user_id)
             if mode not in self.RUNNER_MODES:
                 return {'success': False, 'message': 'Invalid mode'}
-            user = self.get_user(user_id)
-            if not user:
-                return {'success': False, 'message': 'User not found'}
-            if user.get('passes', 0) <= 0:
-                return {'success': False, 'message': 'Passes nahi hain!'}
             # Deduct ONLY pass (no balance deduction — pass-only mode)
-            if not self.deduct_pass(user_id):
-                return {'success': False, 'message': 'Pass deduct nahi hua'}
-            self.user_cache.pop(f"user_{user_id}", None)
+            user, _ = self._settle_game(user_id, mode, pass_cost=1)
+            if not user:
+                msg = self._no_pass_message(user_id)
+                return {'success': False, 'message': 'Passes nahi hain!' if msg.startswith('Passes') else msg}
             mode_info = self.RUNNER_MODES[mode]
             max_reward = mode_info.get('max_reward', round(mode_info['seconds'] * mode_info['reward_per_sec'], 2))
             return {
@@ -2403,7 +2841,7 @@ class Database:
             return {'success': False, 'message': str(e)}
 
     def runner_finish(self, user_id, mode, bet, survived_seconds):
-        """Finish runner/skill game — credit reward."""
+        """Finish runner/skill game — credit reward (play count + reward ek settlement mein)."""
         try:
             user_id = int(user_id)
             bet = float(bet)
@@ -2412,18 +2850,6 @@ class Database:
                 return {'success': False, 'message': 'Invalid mode'}
             mode_info = self.RUNNER_MODES[mode]
 
-            # Har game finish par total_game_plays increment karo (daily state + user)
-            today = datetime.now().date().isoformat()
-            self.game_states.update_one(
-                {'user_id': user_id, 'date': today},
-                {'$inc': {'total_plays': 1}},
-                upsert=True
-            )
-            self.users.update_one(
-                {'user_id': user_id},
-                {'$inc': {'total_game_plays': 1}}
-            )
-
             # Board/puzzle games: survived_seconds = pts earned in JS
             # Convert pts directly to rupees (100 pts = ₹1)
             if mode in ('ludo', 'saapsidi', 'colorflow'):
@@ -2431,14 +2857,13 @@ class Database:
                 total_reward = round(pts / 100, 4)
                 mode_cap = mode_info.get('max_reward', 0.30)
                 total_reward = min(total_reward, mode_cap)
-                if total_reward > 0:
-                    self.add_game_earning(user_id, total_reward, mode,
-                        f"{mode_info['label']} {pts} pts → +₹{total_reward}")
-                    self.add_live_activity(mode, user_id, total_reward,
-                        f"🎮 {mode_info['label']}: {pts} pts → +₹{total_reward}")
+                # Har game finish par total_game_plays increment (daily state + user)
+                _, credit = self._settle_game(user_id, mode, reward=total_reward, pass_cost=0, count_play=True,
+                                              description=f"{mode_info['label']} {pts} pts → +₹{total_reward}",
+                                              extra_activity=(mode, f"🎮 {mode_info['label']}: {pts} pts → +₹{total_reward}"))
                 return {
                     'success': True,
-                    'reward': total_reward,
+                    'reward': credit,   # daily cap ke baad jo sach mein mila
                     'pts': pts,
                     'won': pts > 0
                 }
@@ -2447,6 +2872,7 @@ class Database:
             total_seconds = mode_info['seconds']
             reward_per_sec = mode_info['reward_per_sec']
             if survived_seconds <= 0:
+                self._settle_game(user_id, mode, pass_cost=0, count_play=True)
                 return {'success': True, 'reward': 0, 'survived': 0, 'message': 'Game over! Kuch nahi mila.'}
             survived_pct = survived_seconds / total_seconds
             bet_back = round(bet * survived_pct, 2)
@@ -2455,15 +2881,13 @@ class Database:
             max_reward = round(bet + (total_seconds * reward_per_sec), 2)
             mode_cap = mode_info.get('max_reward', max_reward)
             total_reward = min(total_reward, max_reward, mode_cap)
-            if total_reward > 0:
-                self.add_game_earning(user_id, total_reward, 'runner',
-                    f"Runner {mode} {survived_seconds}s → +₹{total_reward}")
-                self.add_live_activity('runner', user_id, total_reward,
-                    f"🏃 Runner {mode}: {survived_seconds}s → +₹{total_reward}")
+            _, credit = self._settle_game(user_id, 'runner', reward=total_reward, pass_cost=0, count_play=True,
+                                          description=f"Runner {mode} {survived_seconds}s → +₹{total_reward}",
+                                          extra_activity=('runner', f"🏃 Runner {mode}: {survived_seconds}s → +₹{total_reward}"))
             won = survived_seconds >= total_seconds
             return {
                 'success': True,
-                'reward': total_reward,
+                'reward': credit,
                 'survived': survived_seconds,
                 'won': won,
                 'bet_back': bet_back,
@@ -2476,40 +2900,78 @@ class Database:
     # ========== SYSTEM & CLEANUP ==========
 
     def remove_blocked_users(self, user_ids, progress_callback=None):
-        try:
-            deleted_count = 0
-            failed_count = 0
-            for user_id in user_ids:
+        """ Blocked/deleted users ka poora data hatao → purge_users ka report (per-collection counts + throughput) """
+        return self.purge_users(user_ids, progress_callback=progress_callback)
+
+    def purge_users(self, user_ids, chunk_size=500, progress_callback=None):
+        """
+        Bulk purge — user_ids ko `chunk_size` ke `$in` groups mein todo,
+        har chunk pe har collection ka ek hi delete_many (sab user_id index pe chalte hain).
+        Returns {'users': n, 'chunks': n, 'deleted': {collection: count}, 'failed': n, 'seconds': s, 'per_sec': r}
+        """
+        started = time.monotonic()
+        ids, failed = [], 0
+        for uid in user_ids:
+            try:
+                ids.append(int(uid))
+            except (TypeError, ValueError):
+                failed += 1   # sirf galat id fail hai — duplicate nahi
+        ids = list(dict.fromkeys(ids))
+        targets = [
+            (self.users, 'user_id'), (self.transactions, 'user_id'), (self.withdrawals, 'user_id'),
+            (self.daily_searches, 'user_id'), (self.search_logs, 'user_id'), (self.daily_bonus, 'user_id'),
+            (self.missions, 'user_id'), (self.mission_days, 'user_id'), (self.daily_claims, 'user_id'), (self.issues, 'user_id'),
+            (self.live_activity, 'user_id'), (self.game_states, 'user_id')
+        ]
+        deleted = {coll.name: 0 for coll, _ in targets}
+        deleted[self.referrals.name] = 0
+        chunks = 0
+        for i in range(0, len(ids), chunk_size):
+            chunk = ids[i:i + chunk_size]
+            chunks += 1
+            try:
+                # Jo referrers purge mein nahi hain unke month bucket + leaderboard se ye refs ghatao
+                gone = list(self.referrals.find(
+                    {'referred_id': {'$in': chunk}, 'is_active': True, 'referrer_id': {'$nin': chunk}},
+                    {'_id': 0, 'referrer_id': 1, 'is_active': 1, 'activation_date': 1}
+                ))
+                for coll, field in targets:
+                    deleted[coll.name] += coll.delete_many({field: {'$in': chunk}}).deleted_count
+                deleted[self.referrals.name] += self.referrals.delete_many(
+                    {'$or': [{'referrer_id': {'$in': chunk}}, {'referred_id': {'$in': chunk}}]}
+                ).deleted_count
+                incs = self._active_refs_decrements(gone)
+                if incs:
+                    self.users.bulk_write([UpdateOne({'user_id': rid}, {'$inc': inc}) for rid, inc in incs.items()],
+                                          ordered=False)
+                    for rid in incs:
+                        self.user_cache.invalidate(rid)
+                self._drop_from_leaderboard(gone)
+                for uid in chunk:
+                    self.user_cache.invalidate(uid)
+            except Exception as e:
+                failed += len(chunk)
+                logger.error(f"Purge chunk {chunks} ({len(chunk)} users) error: {e}")
+            if progress_callback:
                 try:
-                    user_id = int(user_id)
-                    self.users.delete_one({'user_id': user_id})
-                    self.transactions.delete_many({'user_id': user_id})
-                    self.withdrawals.delete_many({'user_id': user_id})
-                    self.referrals.delete_many({'$or': [{'referrer_id': user_id}, {'referred_id': user_id}]})
-                    self.daily_searches.delete_many({'user_id': user_id})
-                    self.search_logs.delete_many({'user_id': user_id})
-                    self.daily_bonus.delete_many({'user_id': user_id})
-                    self.missions.delete_many({'user_id': user_id})
-                    self.daily_claims.delete_many({'user_id': user_id})
-                    self.issues.delete_many({'user_id': user_id})
-                    self.live_activity.delete_many({'user_id': user_id})
-                    self.game_states.delete_many({'user_id': user_id})
-                    self.user_cache.pop(f"user_{user_id}", None)
-                    deleted_count += 1
-                except Exception as e:
-                    failed_count += 1
-                    logger.error(f"Error deleting user {user_id}: {e}")
-            return deleted_count, failed_count
-        except Exception as e:
-            logger.error(f"Error removing blocked users: {e}")
-            return 0, len(user_ids)
+                    progress_callback(min(i + chunk_size, len(ids)), len(ids))
+                except Exception:
+                    pass
+        seconds = time.monotonic() - started
+        report = {
+            'users': len(ids), 'chunks': chunks, 'deleted': deleted, 'failed': failed,
+            'seconds': round(seconds, 3), 'per_sec': round(len(ids) / seconds, 1) if seconds > 0 else len(ids)
+        }
+        logger.info(f"🧹 Purged {len(ids)} users in {report['seconds']}s ({report['per_sec']}/s) | "
+                    + ", ".join(f"{k}: {v}" for k, v in deleted.items() if v))
+        return report
 
     def log_system_event(self, event_type, description):
         try:
             self.system_stats.insert_one({
                 'event_type': event_type,
                 'description': description,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now()
             })
         except Exception as e:
             logger.error(f"Error logging system event: {e}")
@@ -2556,6 +3018,10 @@ class Database:
 
     def cleanup(self):
         try:
+            if hasattr(self, 'last_seen'):
+                self.last_seen.close()
+            if hasattr(self, 'writer'):
+                self.writer.close()
             if hasattr(self, 'client') and self.client:
                 self.client.close()
             logger.info("Database connection closed")
@@ -23,13 +23,15 @@
 #   ✅ Referral active hone pe dono users ko message
 
 import logging
-import re
 import json
 from datetime import datetime
+from cachetools import TTLCache
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 from telegram.error import Forbidden, BadRequest
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from async_db import AsyncDatabase
+import log_parser
 
 logger = logging.getLogger(__name__)
 
@@ -38,13 +40,23 @@ LOG_CHANNEL_ID = -1002352329534
 
 
 class Handlers:
-    def __init__(self, config, db):
+    def __init__(self, config, db, adb=None):
         self.config = config
         self.db = db
+        self.adb = adb or AsyncDatabase(db)   # handlers mein DB calls isi se — bot loop block na ho
         self.bot = None
-        self._group_notified = {}  # user_id -> last_notify_timestamp
+        # user_id -> last_notify_timestamp (6 hr cooldown). Handlers sirf bot process mein chalte hain (ek hi),
+        # isliye per-process state kaafi hai — TTLCache taaki dict hamesha badhta na rahe.
+        self._group_notified = TTLCache(maxsize=50000, ttl=21600)
         logger.info("✅ Handlers initialized")
 
+    async def track_activity(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """ group=-1 — har private message / button press last_active mein (group chatter nahi). """
+        user = update.effective_user
+        chat = update.effective_chat
+        if user and not user.is_bot and (chat is None or chat.type == 'private'):
+            self.db.touch_user(user.id)
+
     # ══════════════════════════════════════════════════════════════
     # START COMMAND
     # ══════════════════════════════════════════════════════════════
@@ -70,7 +82,7 @@ class Handlers:
                 'referrer_id': referrer_id
             }
 
-            add_result = self.db.add_user(user_data)
+            add_result = await self.adb.add_user(user_data)
 
             # ── Duplicate user ──
             if isinstance(add_result, dict) and add_result.get('already_on_bot'):
@@ -82,7 +94,7 @@ class Handlers:
                 if referrer_id:
                     orig_txt = ""
                     if orig_ref_id and orig_ref_id != referrer_id:
-                        orig_ref_user = self.db.get_user(orig_ref_id)
+                        orig_ref_user = await self.adb.get_user(orig_ref_id)
                         if orig_ref_user:
                             orig_name = orig_ref_user.get('first_name', 'Someone')
                             orig_txt = f"\n⚠️ Inhe pehle se {orig_name} ne refer kiya hua hai."
@@ -119,14 +131,14 @@ class Handlers:
             is_new = bool(add_result)
 
             if is_new:
-                self.db.add_live_activity('join', user.id, 0, "Joined the bot")
+                await self.adb.add_live_activity('join', user.id, 0, "Joined the bot", user_name=user.first_name)
 
                 # Log to channel
                 if self.config.LOG_CHANNEL_ID:
                     try:
                         referrer_name = "Direct"
                         if referrer_id:
-                            ref_user = self.db.get_user(referrer_id)
+                            ref_user = await self.adb.get_user(referrer_id)
                             if ref_user:
                                 rname = ref_user.get('first_name', '')
                                 rusername = ref_user.get('username', '')
@@ -163,7 +175,7 @@ class Handlers:
                 # Notify referrer
                 if referrer_id:
                     try:
-                        referrer = self.db.get_user(referrer_id)
+                        referrer = await self.adb.get_user(referrer_id)
                         if referrer and referrer.get('notify_referrals', True):
                             await context.bot.send_message(
                                 chat_id=referrer_id,
@@ -216,7 +228,7 @@ class Handlers:
                     async def _remind_2hr():
                         await asyncio.sleep(7200)
                         try:
-                            if not self.db.referrals.find_one({'referred_id': user.id, 'is_active': True}):
+                            if not await self.adb.run(self.db.referrals.find_one, {'referred_id': user.id, 'is_active': True}):
                                 kb = [[InlineKeyboardButton("🎬 ABHI Movie Search Karo!", url=movie_group)]]
                                 await context.bot.send_message(
                                     chat_id=user.id,
@@ -304,7 +316,7 @@ class Handlers:
                 return
 
             user_id = user.id
-            referral = self.db.referrals.find_one({'referred_id': user_id})
+            referral = await self.adb.get_referral_by_referred(user_id)
             if not referral:
                 return
 
@@ -318,7 +330,7 @@ class Handlers:
                 if now_ts - last_notified > 21600:  # 6 hr cooldown
                     self._group_notified[user_id] = now_ts
                     try:
-                        referrer = self.db.get_user(referrer_id)
+                        referrer = await self.adb.get_user(referrer_id)
                         if referrer and referrer.get('notify_referrals', True):
                             await context.bot.send_message(
                                 chat_id=referrer_id,
@@ -386,50 +398,24 @@ class Handlers:
             if not text:
                 return
 
-            # ── Detailed log karo ──
-            logger.info(f"═══ LOG CHANNEL MSG RECEIVED ═══")
-            logger.info(f"Chat: {chat_id} | Len: {len(text)}")
-            logger.info(f"Text preview: {text[:200]}")
-            logger.info(f"═══════════════════════════════")
-
-            # ── Message type detect ──
-            text_upper = text.upper()
-            has_verify   = '#VERIFYCOMPLETE' in text_upper or 'VERIFYCOMPLETE' in text_upper
-            has_filesent = '#FILESENT' in text_upper or 'FILESENT' in text_upper
-            has_newuser  = '#NEWUSER' in text_upper
-            has_vshort   = '#VERIFYSHORTLINK' in text_upper or 'VERIFYSHORTLINK' in text_upper
-            has_slv      = 'SHORTLINK VERIFIED' in text_upper
-            # #ShortlinkShown = sirf shortlink MILI hai, puri NAHI hui — IGNORE karo
-            has_shortlink_shown = '#SHORTLINKSHOWN' in text_upper
-
-            logger.info(f"Detect: VerifyComplete={has_verify} FileSent={has_filesent} NewUser={has_newuser} VerifyShort={has_vshort} ShortlinkShown(ignored)={has_shortlink_shown}")
-
-            # ── Ignore list — koi action nahi ──
-            if has_newuser or has_shortlink_shown:
-                uid, name = self._parse_user_id_and_name(text)
-                logger.info(f"IGNORED: #NewUser or #ShortlinkShown — ID={uid} — NO ACTION")
+            # ── Tag + user ek pass mein (log_parser.py) ──
+            tag = log_parser.classify(text)
+            if tag is None:
+                logger.debug(f"Log channel: no action | {text[:60]}")
                 return
 
-            # ── Verify messages — SIRF in pe activate karo ──
-            if has_verify or has_filesent or has_vshort or has_slv:
-                uid, name = self._parse_user_id_and_name(text)
-                logger.info(f"VERIFY MSG parsed: uid={uid} name={name}")
-
-                if not uid:
-                    logger.warning(f"⚠️ Could not parse user_id from:\n{text}")
-                    return
-
-                msg_type = (
-                    'VerifyComplete'  if has_verify else
-                    'FileSent'        if has_filesent else
-                    'Verifyshortlink' if has_vshort else
-                    'ShortlinkVerified'
-                )
-                logger.info(f"✅ Processing: type={msg_type} uid={uid} name={name}")
-                await self._activate_and_notify(uid, name, context)
+            # ── Ignore list (#NewUser / #ShortlinkShown) — koi action nahi ──
+            if tag in log_parser.IGNORE_TAGS:
+                logger.debug(f"Log channel: {tag} ignored")
+                return
 
-            else:
-                logger.info(f"ℹ️ No action needed: {text[:60]}")
+            # ── Verify messages — SIRF in pe activate karo ──
+            uid, name = log_parser.parse_user(text)
+            if not uid:
+                logger.warning(f"⚠️ Could not parse user_id from {tag}:\n{text}")
+                return
+            logger.info(f"✅ Log channel {tag} | uid={uid} name={name}")
+            await self._activate_and_notify(uid, name, context)
 
         except Exception as e:
             logger.error(f"handle_log_channel_message ERROR: {e}", exc_info=True)
@@ -439,110 +425,8 @@ class Handlers:
     # ══════════════════════════════════════════════════════════════
 
     def _parse_user_id_and_name(self, text: str):
-        """
-        Log channel message se user_id aur name extract karo.
-
-        Supported formats:
-          • "ID - 1234567890"           (ASCII normal)
-          • "ɪᴅ - 1234567890"           (Unicode small caps)
-          • "ID: 1234567890"            (colon format)
-          • "As SomeName (1234567890)"  (#FileSent format)
-          • "👤 SomeName (1234567890)"  (emoji format)
-          • Fallback: any 7-15 digit number in text
-
-        Returns (user_id: int | None, name: str)
-        """
-        user_id = None
-        name = "User"
-
-        lines = text.split('\n')
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            # ── Method 0: "👤 12345 | Name" format (#ShortlinkShown) ──
-            if '👤' in line and '|' in line:
-                # Format: "👤 677930179 | Smile :)"
-                m0 = re.search(r'👤\s*(\d{5,15})\s*\|\s*(.+)', line)
-                if m0:
-                    try:
-                        user_id = int(m0.group(1))
-                        name_part = m0.group(2).strip()
-                        if name_part:
-                            name = name_part[:50]
-                        logger.debug(f"ID parsed (👤|pipe format): {user_id} name={name}")
-                    except:
-                        pass
-
-            # ── Method 1: Normal "ID - 12345" or "ID: 12345" ──
-            m = re.match(r'^ID\s*[-:]\s*(\d{5,15})', line, re.IGNORECASE)
-            if m:
-                try:
-                    user_id = int(m.group(1))
-                    logger.debug(f"ID parsed (normal): {user_id} from '{line}'")
-                except:
-                    pass
-
-            # ── Method 2: Unicode small caps "ɪᴅ - 12345" ──
-            # ɪ = U+026A, ᴅ = U+1D05 (both look like ID)
-            if not user_id:
-                # Normalize Unicode to ASCII-like
-                normalized = line.replace('ɪ', 'I').replace('ᴅ', 'D').replace('ɴ', 'N')
-                m2 = re.match(r'^ID\s*[-:–—]\s*(\d{5,15})', normalized, re.IGNORECASE)
-                if m2:
-                    try:
-                        user_id = int(m2.group(1))
-                        logger.debug(f"ID parsed (unicode norm): {user_id} from '{line}'")
-                    except:
-                        pass
-
-            # ── Method 3: "As SomeName (12345)" — #FileSent format ──
-            if not user_id:
-                m3 = re.search(r'\((\d{5,15})\)', line)
-                if m3:
-                    try:
-                        candidate = int(m3.group(1))
-                        if candidate > 10000:  # valid Telegram ID range
-                            user_id = candidate
-                            # Extract name: everything before "("
-                            name_part = re.sub(r'\(.*\)', '', line)
-                            # Remove "As " prefix if present
-                            name_part = re.sub(r'^As\s+', '', name_part.strip())
-                            # Remove emoji prefixes
-                            name_part = re.sub(r'^[👤📤✅#\s]+', '', name_part).strip()
-                            if name_part:
-                                name = name_part[:50]
-                            logger.debug(f"ID parsed (bracket): {user_id} from '{line}'")
-                    except:
-                        pass
-
-            # ── Name parsing: "Nᴀᴍᴇ - SomeName" or "Name - SomeName" ──
-            norm_line = line.replace('ᴀ', 'A').replace('ᴍ', 'M').replace('ᴇ', 'E').replace('ɴ', 'N')
-            nm = re.match(r'^NAME\s*[-:–—]\s*(.+)', norm_line, re.IGNORECASE)
-            if nm:
-                candidate_name = nm.group(1).strip()
-                if candidate_name and not re.search(r'^\d+$', candidate_name):
-                    name = candidate_name[:50]
-
-        # ── Fallback: any standalone 7-15 digit number ──
-        if not user_id:
-            # Find all 7-15 digit numbers not surrounded by more digits
-            candidates = re.findall(r'(?<!\d)(\d{7,15})(?!\d)', text)
-            for c in candidates:
-                try:
-                    n = int(c)
-                    # Basic Telegram user ID sanity check (not year/time like 2023, 1503 etc)
-                    if n > 1_000_000:
-                        user_id = n
-                        logger.debug(f"ID parsed (fallback): {user_id}")
-                        break
-                except:
-                    pass
-
-        logger.info(f"_parse_user_id_and_name → uid={user_id} name={name}")
-        return user_id, name
+        """ Log channel message → (user_id | None, name). Formats log_parser.parse_user mein. """
+        return log_parser.parse_user(text)
 
     # ══════════════════════════════════════════════════════════════
     # ACTIVATE REFERRAL + NOTIFY
@@ -554,13 +438,13 @@ class Handlers:
         Dono cases mein relevant users ko notify karo.
         """
         # 1. Check user exists in DB
-        user = self.db.get_user(user_id)
+        user = await self.adb.get_user(user_id)
         if not user:
             logger.warning(f"User {user_id} DB mein nahi — bot se /start nahi kiya hoga")
             return
 
         # 2. Referral activate karne ki koshish karo
-        result = self.db.activate_referral_by_log_channel(user_id)
+        result = await self.adb.activate_referral_by_log_channel(user_id)
         logger.info(f"activate_referral_by_log_channel({user_id}) → {result}")
 
         if result and result.get('activated'):
@@ -629,7 +513,7 @@ class Handlers:
             except Forbidden:
                 logger.warning(f"User {user_id} ne bot block kar diya — marking blocked")
                 try:
-                    self.db.mark_user_blocked(user_id)
+                    await self.adb.mark_user_blocked(user_id)
                 except Exception:
                     pass
             except Exception as e:
@@ -640,16 +524,10 @@ class Handlers:
             reason = result.get('reason', 'unknown') if result else 'no_result'
             logger.info(f"Referral already active for {user_id} (reason={reason}) — recording daily search")
 
-            search = self.db.record_daily_search(user_id)
+            # record_daily_search referrer ka m_search5 progress bhi badhata hai
+            search = await self.adb.record_daily_search(user_id)
             logger.info(f"record_daily_search({user_id}) → {search}")
 
-            # Movie search mission progress update (m_search5)
-            try:
-                self.db._update_single_mission_progress(user_id, 'm_search5', 1)
-                logger.info(f"m_search5 mission updated for user {user_id}")
-            except Exception as me:
-                logger.error(f"Mission update error: {me}")
-
             if search.get('success'):
                 referrer_id = search.get('referrer_id')
                 earning     = search.get('earning', self.config.DAILY_REFERRAL_EARNING)
@@ -694,7 +572,7 @@ class Handlers:
     async def check_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             user_id = update.effective_user.id
-            user = self.db.get_user(user_id)
+            user = await self.adb.get_user(user_id)
             if user:
                 daily_potential = user.get('active_refs', 0) * self.config.DAILY_REFERRAL_EARNING
                 bal_pts = int(user.get('balance', 0) * 100)
@@ -722,7 +600,7 @@ class Handlers:
     async def show_referrals(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             user_id = update.effective_user.id
-            user = self.db.get_user(user_id)
+            user = await self.adb.get_user(user_id)
             if user:
                 ref_link = f"https://t.me/{self.config.BOT_USERNAME}?start=ref_{user_id}"
                 daily_pts = int(user.get('active_refs', 0) * float(self.config.DAILY_REFERRAL_EARNING) * 100)
@@ -748,7 +626,7 @@ class Handlers:
     async def withdraw_cmd(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             user_id = update.effective_user.id
-            user = self.db.get_user(user_id)
+            user = await self.adb.get_user(user_id)
             if not user:
                 await update.message.reply_text("❌ Pehle /start karo!")
                 return
@@ -851,7 +729,7 @@ class Handlers:
             message = data.get('message')
             if not user_id or not message:
                 return {'success': False, 'message': 'Missing data'}
-            msg_id = self.db.add_support_message(user_id, message)
+            msg_id = await self.adb.add_support_message(user_id, message)
             if msg_id:
                 if context:
                     for admin_id in self.config.ADMIN_IDS:
@@ -872,7 +750,7 @@ class Handlers:
 
     async def send_daily_reminders(self, context):
         try:
-            pending_users = self.db.get_pending_reminders()
+            pending_users = await self.adb.get_pending_reminders()
             if not pending_users:
                 return
             sent = 0
@@ -897,7 +775,7 @@ class Handlers:
                         ),
                         reply_markup=InlineKeyboardMarkup(kb)
                     )
-                    self.db.mark_user_reminded(uid)
+                    await self.adb.mark_user_reminded(uid)
                     sent += 1
                     import asyncio
                     await asyncio.sleep(0.05)
@@ -0,0 +1,74 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== last_seen.py (coalesced last_active writes) =====
+#
+# Pehle get_user har cache miss pe `last_active` likhta tha — leaderboard / referrer lookups
+# (doosre users) bhi "active" ho jaate the aur har read ek write tha.
+# Ab sirf asli activity (Mini App open, bot ko private message / button) `touch(user_id)` karti hai:
+# memory mein user_id → latest timestamp, background thread har `flush_seconds` pe ek unordered
+# bulk_write ($max — purana timestamp naye ko overwrite nahi karta, multi-process safe; BSON mein
+# Date > String, isliye pehla flush purane ISO-string last_active ko bhi date bana deta hai).
+
+import logging
+import threading
+from datetime import datetime
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+class LastSeenTracker:
+    def __init__(self, collection, flush_seconds=60, batch_size=500):
+        self.collection = collection
+        self.flush_seconds = max(flush_seconds, 1)
+        self.batch_size = batch_size
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {'touches': 0, 'written': 0, 'flushes': 0, 'errors': 0}
+        self._thread = threading.Thread(target=self._run, name='last-seen', daemon=True)
+        self._thread.start()
+
+    def touch(self, user_id):
+        """ Request path pe sirf dict write — DB tak kuch nahi jaata. """
+        now = datetime.now()
+        with self._lock:
+            self._seen[int(user_id)] = now
+            self.stats['touches'] += 1
+
+    def pending(self):
+        return len(self._seen)
+
+    def flush(self):
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        if not seen:
+            return
+        ops = [UpdateOne({'user_id': uid}, {'$max': {'last_active': ts}}) for uid, ts in seen.items()]
+        for i in range(0, len(ops), self.batch_size):
+            chunk = ops[i:i + self.batch_size]
+            try:
+                self.collection.bulk_write(chunk, ordered=False)
+                self.stats['written'] += len(chunk)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"last_active flush error ({len(chunk)} users): {e}")
+        self.stats['flushes'] += 1
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"last_active flush loop error: {e}")
@@ -0,0 +1,145 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== live_feed.py (in-memory live activity feed) =====
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+EMOJI_MAP = {
+    'join': '🎉', 'withdraw': '💰', 'bonus': '🎁',
+    'mission': '🏆', 'referral': '👥', 'game': '🎮',
+    'support': '📩', 'daily_search': '🎬'
+}
+
+def _parse_ts(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except Exception:
+        return None
+
+def time_ago(ts, now=None):
+    if ts is None:
+        return "recently"
+    diff = (now or datetime.now()) - ts
+    if diff.days > 0:
+        return f"{diff.days}d ago"
+    elif diff.seconds // 3600 > 0:
+        return f"{diff.seconds // 3600}h ago"
+    elif diff.seconds // 60 > 0:
+        return f"{diff.seconds // 60}min ago"
+    return "just now"
+
+def render_activity(act):
+    """ Raw live_activity doc → frontend wala dict ('time' ke bina, wo read pe lagta hai). """
+    display_text = act.get('description', '')
+    if not display_text:
+        desc_map = {
+            'join': 'joined the bot',
+            'withdraw': f"withdrew ₹{act.get('amount', 0)}",
+            'bonus': f"claimed ₹{act.get('amount', 0)} bonus",
+            'mission': 'completed a mission',
+            'referral': 'got a new referral',
+            'game': f"won ₹{act.get('amount', 0)} in game",
+            'daily_search': 'searched movie today'
+        }
+        display_text = desc_map.get(act.get('type'), 'was active')
+    return {
+        'id': str(act.get('_id', '')),
+        'type': act.get('type', 'activity'),
+        'user_name': act.get('user_name', 'User'),
+        'user_id': act.get('user_id', 0),
+        'amount': act.get('amount', 0),
+        'avatar': EMOJI_MAP.get(act.get('type'), '👤'),
+        'description': display_text,
+        'referred_name': act.get('referred_name', ''),
+        'referrer_name': act.get('referrer_name', '')
+    }
+
+class LiveFeed:
+    """
+    Last N rendered activities ka ring buffer. /api/live-activity isi se poll hota hai —
+    `etag` (sabse naye entry ka id) If-None-Match se match ho toh 304, koi kaam nahi.
+    """
+
+    def __init__(self, size=50):
+        self.size = size
+        self._items = deque(maxlen=size)   # (ts, rendered)
+        self._ids = set()
+        self._lock = threading.Lock()
+        self.seeded = False
+
+    def publish(self, act):
+        ts = _parse_ts(act.get('timestamp')) or datetime.now()
+        rendered = render_activity(act)
+        with self._lock:
+            if rendered['id'] and rendered['id'] in self._ids:
+                return   # follow() ne apna hi event DB se wapas padha
+            self._append(ts, rendered)
+
+    def follow(self, collection, interval=3):
+        """
+        Multi-process (PROCESS_ROLE web/bot): doosre processes ke events is process ke buffer mein nahi aate.
+        Background thread har `interval` sec `live_activity` se naye docs (_id order) la ke publish karta hai.
+        """
+        def run():
+            last_id = None
+            while True:
+                try:
+                    query = {'_id': {'$gt': last_id}} if last_id else {}
+                    docs = list(collection.find(query).sort('_id', -1).limit(self.size))
+                    for act in reversed(docs):
+                        self.publish(act)
+                    if docs:
+                        last_id = docs[0]['_id']
+                except Exception as e:
+                    logger.error(f"Live feed follow error: {e}")
+                time.sleep(interval)
+        threading.Thread(target=run, daemon=True, name='live-feed-follow').start()
+
+    def seed(self, docs):
+        """ DB se purani entries (newest first) — sirf jo buffer mein pehle se nahi hain. """
+        with self._lock:
+            if self.seeded:
+                return
+            existing = list(self._items)
+            self._items.clear()
+            self._ids.clear()
+            for act in reversed(docs):
+                self._append(_parse_ts(act.get('timestamp')), render_activity(act))
+            for ts, rendered in existing:
+                if rendered['id'] not in self._ids:
+                    self._append(ts, rendered)
+            self.seeded = True
+
+    def recent(self, limit=20):
+        now = datetime.now()
+        with self._lock:
+            items = list(self._items)[-limit:]
+        return [dict(r, time=time_ago(ts, now)) for ts, r in reversed(items)]
+
+    @property
+    def etag(self):
+        """ Sabse naye entry ka id — sab workers pe same content ka same tag (per-process counter nahi). """
+        with self._lock:
+            newest = self._items[-1][1]['id'] if self._items else 'empty'
+        return f'la-{newest}'
+
+    def _append(self, ts, rendered):
+        if len(self._items) == self._items.maxlen:
+            self._ids.discard(self._items[0][1]['id'])
+        self._items.append((ts, rendered))
+        self._ids.add(rendered['id'])
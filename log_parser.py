@@ -0,0 +1,126 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== log_parser.py (log channel message parser) =====
+#
+# Movie bot ke log channel posts → (tag, user_id, name). Sab patterns module load pe compile,
+# tag ek upper() + substring checks se. Small caps (ɪᴅ / Nᴀᴍᴇ) sirf line ke shuru (HEAD chars) pe
+# str.translate — char-for-char hai, isliye match ka span original line pe bhi same (name asli letters mein).
+#
+# Formats (handlers.handle_log_channel_message docstring dekho):
+#   ✅ #VerifyComplete / ɪᴅ - 7142838312 / Nᴀᴍᴇ - ʀɪᴛɪᴋᴀ
+#   #FileSent — ... / As Bʜᴀɪ Bsʀ (7315805581)
+#   #NewUser ID - 7346280916 Nᴀᴍᴇ - Abhinav          (ignore)
+#   #ShortlinkShown / 👤 677930179 | Smile :)         (ignore)
+#   #VerifyShortlink, "Shortlink Verified"             (activate)
+
+import re
+
+# Tag → action. Ignore tags pehle check hote hain (dono ho toh ignore jeetta hai).
+VERIFY_COMPLETE = 'VerifyComplete'
+FILE_SENT = 'FileSent'
+VERIFY_SHORTLINK = 'Verifyshortlink'
+SHORTLINK_VERIFIED = 'ShortlinkVerified'
+NEW_USER = 'NewUser'
+SHORTLINK_SHOWN = 'ShortlinkShown'
+
+IGNORE_TAGS = (NEW_USER, SHORTLINK_SHOWN)
+ACTIVATE_TAGS = (VERIFY_COMPLETE, FILE_SENT, VERIFY_SHORTLINK, SHORTLINK_VERIFIED)   # priority order
+
+# (upper-case marker, tag) — priority order: ignore tags pehle
+_TAG_MARKERS = (
+    ('#NEWUSER', NEW_USER),
+    ('#SHORTLINKSHOWN', SHORTLINK_SHOWN),
+    ('VERIFYCOMPLETE', VERIFY_COMPLETE),
+    ('FILESENT', FILE_SENT),
+    ('VERIFYSHORTLINK', VERIFY_SHORTLINK),
+    ('SHORTLINK VERIFIED', SHORTLINK_VERIFIED),
+)
+
+SMALL_CAPS = str.maketrans({'ɪ': 'I', 'ᴅ': 'D', 'ɴ': 'N', 'ᴀ': 'A', 'ᴍ': 'M', 'ᴇ': 'E'})
+HEAD = 8                      # "Nᴀᴍᴇ - " / "ɪᴅ - " — prefix isse chhota hai
+_ID_FIRST = frozenset('IiɪNnɴ')
+
+_PIPE_RE = re.compile(r'👤\s*(\d{5,15})\s*\|\s*(.+)')
+_ID_RE = re.compile(r'ID\s*[-:–—]\s*(\d{5,15})', re.IGNORECASE)
+_NAME_RE = re.compile(r'NAME\s*[-:–—]\s*(.+)', re.IGNORECASE)
+_BRACKET_RE = re.compile(r'\((\d{5,15})\)')
+_BRACKET_STRIP_RE = re.compile(r'\(.*\)')
+_AS_PREFIX_RE = re.compile(r'^As\s+')
+_EMOJI_PREFIX_RE = re.compile(r'^[👤📤✅#\s]+')
+_FALLBACK_RE = re.compile(r'(?<!\d)(\d{7,15})(?!\d)')
+
+def classify(text):
+    """ Message ka tag → ACTIVATE_TAGS / IGNORE_TAGS mein se ek, ya None. """
+    upper = text.upper()
+    for marker, tag in _TAG_MARKERS:
+        if marker in upper:
+            return tag
+    return None
+
+def parse_user(text):
+    """
+    Log message → (user_id | None, name). Line-by-line:
+      • "👤 12345 | Name"          pipe format (#ShortlinkShown)
+      • "ID - 12345" / "ɪᴅ – 12345" / "ID: 12345"   explicit ID line — hamesha jeetta hai
+      • "As Name (12345)"         bracket format (#FileSent) — sirf jab ID abhi tak na mila
+      • "Nᴀᴍᴇ - Name"             name line
+    Kuch na mile toh text mein pehla 7-15 digit number (> 1,000,000).
+    """
+    user_id = None
+    name = "User"
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        if '👤' in line and '|' in line:
+            m = _PIPE_RE.search(line)
+            if m:
+                user_id = int(m.group(1))
+                name = m.group(2).strip()[:50] or name
+
+        first = line[0]
+        norm = line[:HEAD].translate(SMALL_CAPS) + line[HEAD:] if first in _ID_FIRST else line
+        if first in 'Iiɪ':
+            m = _ID_RE.match(norm)
+            if m:
+                user_id = int(m.group(1))
+
+        if not user_id and '(' in line:
+            m = _BRACKET_RE.search(line)
+            if m and int(m.group(1)) > 10000:
+                user_id = int(m.group(1))
+                name_part = _EMOJI_PREFIX_RE.sub('', _BRACKET_STRIP_RE.sub('', line).strip())
+                name_part = _AS_PREFIX_RE.sub('', name_part).strip()   # "📤 As Neha" → "Neha"
+                if name_part:
+                    name = name_part[:50]
+
+        if first in 'Nnɴ':
+            m = _NAME_RE.match(norm)
+            if m:
+                candidate = line[m.start(1):m.end(1)].strip()   # original chars, same offsets
+                if candidate and not candidate.isdigit():
+                    name = candidate[:50]
+
+    if not user_id:
+        for c in _FALLBACK_RE.findall(text):
+            n = int(c)
+            if n > 1_000_000:
+                user_id = n
+                break
+    return user_id, name
+
+def parse(text):
+    """ (tag, user_id, name) — tag None ho toh user parse hi nahi karte. """
+    tag = classify(text)
+    if tag is None:
+        return None, None, None
+    user_id, name = parse_user(text)
+    return tag, user_id, name
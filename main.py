@@ -16,10 +16,12 @@ import asyncio
 import threading
 import time
 import signal
-from datetime import datetime, timedelta
+import json
+from datetime import datetime, date, timedelta
 
 from bson.objectid import ObjectId
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, g
+from flask.json.provider import DefaultJSONProvider
 from functools import wraps
 
 logging.basicConfig(
@@ -38,7 +40,7 @@ try:
     from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
     from telegram.ext import (
         Application, CommandHandler, MessageHandler,
-        filters, ContextTypes, CallbackQueryHandler
+        filters, ContextTypes, CallbackQueryHandler, TypeHandler
     )
     from telegram.constants import ParseMode
     import nest_asyncio
@@ -54,6 +56,12 @@ from config import Config
 from database import Database
 from handlers import Handlers
 from admin import AdminHandlers
+from outbox import Outbox
+from async_db import AsyncDatabase, LoopLagMonitor
+from webhook_queue import UpdateIngest
+from bot_channel import BotChannel
+from metrics import metrics
+from migrations import SCHEMA_VERSION
 
 import os as _os
 _BASE_DIR = _os.path.abspath(_os.path.dirname(__file__))
@@ -64,6 +72,16 @@ app = Flask(__name__,
             static_url_path='/static')
 
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'filmyfund-secret-key-2024')
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """ DB ab BSON dates deta hai — JSON mein pehle jaisa ISO string hi jaye (Flask default HTTP-date hai). """
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+app.json = IsoJSONProvider(app)
 try:
     from flask_compress import Compress
     Compress(app)
@@ -78,9 +96,13 @@ admin_handlers = None
 bot_app = None
 bot_loop = None
 bot_running = False
+outbox = Outbox()   # main() config ke saath dobara banata hai, run_bot bot loop attach karta hai
+adb = None          # AsyncDatabase — bot handlers ke DB calls (main() banata hai)
+channel = None      # BotChannel — PROCESS_ROLE web/bot mein dono processes ke beech Mongo queue
+loop_lag = LoopLagMonitor()
+ingest = UpdateIngest()   # main() config ke saath dobara banata hai, workers bot loop pe start hote hain
 
 start_time = datetime.now()
-request_count = 0
 
 LOG_CHANNEL_ID = -1002352329534
 
@@ -92,10 +114,31 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
     return response
 
+@app.before_request
+def start_request_metrics():
+    # Route template ('/api/user/<int:user_id>') label hai, asli URL nahi — cardinality bounded
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_scope, g.metrics_token = metrics.begin('route', rule)
+
+@app.before_request
+def track_last_seen():
+    # /api/.../<user_id> routes Mini App khud call karta hai — wahi asli activity hai
+    user_id = (request.view_args or {}).get('user_id')
+    if user_id and db:
+        db.touch_user(user_id)
+
 @app.after_request
 def after_request(response):
+    g.metrics_status = response.status_code
     return add_cors_headers(response)
 
+@app.teardown_request
+def finish_request_metrics(exc):
+    # teardown exception pe bhi chalta hai (after_request nahi) — latency har request ki ginti mein
+    scope = g.pop('metrics_scope', None)
+    if scope is not None:
+        metrics.end(scope, g.pop('metrics_token', None), 500 if exc else g.pop('metrics_status', 200))
+
 @app.route('/', methods=['OPTIONS'])
 @app.route('/<path:path>', methods=['OPTIONS'])
 def handle_options(path=''):
@@ -103,50 +146,91 @@ def handle_options(path=''):
 
 # ========== MAIN PAGE ==========
 
+# Shell ek baar render hota hai (sirf non-user config vars) aur gzip/brotli bytes memory mein.
+# User data /api/bootstrap + /api/user se aata hai — HTML har user ke liye same, ETag strong.
+_shell = {'mtime': None}
+_shell_lock = threading.Lock()
+
+def _shell_template_vars():
+    return {
+        'min_withdrawal': config.MIN_WITHDRAWAL if config else 20,
+        'channel_id': config.CHANNEL_ID if config else '',
+        'channel_link': config.CHANNEL_LINK if config else '',
+        'channel_bonus': config.CHANNEL_JOIN_BONUS if config else 2.0,
+        'movie_group_link': config.MOVIE_GROUP_LINK if config else '',
+        'bot_username': config.BOT_USERNAME if config else '',
+        'daily_referral_earning': config.DAILY_REFERRAL_EARNING if config else 0.10,
+        'support_username': config.SUPPORT_USERNAME if config else '@support'
+    }
+
+def _get_shell():
+    """ Rendered shell + compressed variants. Template file badle (mtime) toh dobara build. """
+    import gzip, hashlib
+    # build_assets.py chala ho toh split shell (CSS/JS alag hashed files), warna purana single-file
+    name = 'index.built.html'
+    if not _os.path.exists(_os.path.join(_BASE_DIR, 'templates', name)):
+        name = 'index.html'
+    mtime = (name, _os.path.getmtime(_os.path.join(_BASE_DIR, 'templates', name)))
+    if _shell['mtime'] == mtime:
+        return _shell
+    with _shell_lock:
+        if _shell['mtime'] == mtime:
+            return _shell
+        with app.app_context():
+            html = render_template(name, **_shell_template_vars()).encode('utf-8')
+        variants = {'identity': html, 'gzip': gzip.compress(html, compresslevel=9)}
+        try:
+            import brotli
+            variants['br'] = brotli.compress(html, quality=11)
+        except ImportError:
+            pass
+        _shell.update({
+            'etag': hashlib.sha256(html).hexdigest()[:32],
+            'variants': variants,
+            'mtime': mtime
+        })
+        logger.info(f"✅ Shell built ({name}) | " + " | ".join(f"{k}: {len(v)//1024} KB" for k, v in variants.items()))
+    return _shell
+
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    """ Hashed bundles — naam content se badalta hai, isliye 1 saal immutable cache.
+    build_assets.py ne .br/.gz pehle se bana rakhe hain, wahi bhejo. """
+    import mimetypes
+    from werkzeug.utils import safe_join
+    path = safe_join(_os.path.join(_BASE_DIR, 'static', 'dist'), filename)
+    if not path or filename.endswith(('.gz', '.br')) or not _os.path.isfile(path):
+        return jsonify({'error': 'Not found'}), 404
+    accept = request.accept_encodings
+    encoding = next((e for e, ext in (('br', '.br'), ('gzip', '.gz'))
+                     if accept[e] and _os.path.isfile(path + ext)), None)
+    with open(path + {'br': '.br', 'gzip': '.gz'}.get(encoding, ''), 'rb') as f:
+        data = f.read()
+    headers = {'Cache-Control': 'public, max-age=31536000, immutable', 'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type.endswith('javascript'):
+        content_type += '; charset=utf-8'
+    return Response(data, content_type=content_type, headers=headers)
+
 @app.route('/')
 def index():
-    global config, db, request_count
-    request_count += 1
     try:
-        user_id = request.args.get('user_id', 0, type=int)
-        user_data = None
-        if user_id and user_id > 0 and db and db.ensure_connection():
-            try:
-                user_data = db.get_user(user_id)
-            except Exception as e:
-                logger.error(f"Error fetching user {user_id}: {e}")
-
-        template_vars = {
-            'user_id': user_id, 'user_name': 'Guest', 'balance': 0,
-            'total_earned': 0, 'tier': 1, 'tier_name': '🥉 BASIC', 'tier_rate': 0.30,
-            'total_refs': 0, 'active_refs': 0, 'pending_refs': 0, 'daily_streak': 0,
-            'channel_joined': False,
-            'min_withdrawal': config.MIN_WITHDRAWAL if config else 20,
-            'channel_id': config.CHANNEL_ID if config else '',
-            'channel_link': config.CHANNEL_LINK if config else '',
-            'channel_bonus': config.CHANNEL_JOIN_BONUS if config else 2.0,
-            'movie_group_link': config.MOVIE_GROUP_LINK if config else '',
-            'bot_username': config.BOT_USERNAME if config else '',
-            'daily_referral_earning': config.DAILY_REFERRAL_EARNING if config else 0.10,
-            'support_username': config.SUPPORT_USERNAME if config else '@support'
+        shell = _get_shell()
+        headers = {
+            'ETag': f'"{shell["etag"]}"',
+            'Cache-Control': 'no-cache',   # har open pe revalidate — unchanged ho toh 304
+            'Vary': 'Accept-Encoding'
         }
-
-        if user_data:
-            template_vars.update({
-                'user_name': user_data.get('first_name', 'User'),
-                'balance': user_data.get('balance', 0),
-                'total_earned': user_data.get('total_earned', 0),
-                'tier': user_data.get('tier', 1),
-                'tier_name': config.get_tier_name(user_data.get('tier', 1)) if config else '🥉 BASIC',
-                'tier_rate': config.get_tier_rate(user_data.get('tier', 1)) if config else 0.30,
-                'total_refs': user_data.get('total_refs', 0),
-                'active_refs': user_data.get('active_refs', 0),
-                'pending_refs': user_data.get('pending_refs', 0),
-                'daily_streak': user_data.get('daily_streak', 0),
-                'channel_joined': user_data.get('channel_joined', False)
-            })
-
-        return render_template('index.html', **template_vars)
+        if request.if_none_match.contains(shell['etag']):
+            return Response(status=304, headers=headers)
+        accept = request.accept_encodings
+        variants = shell['variants']
+        encoding = next((e for e in ('br', 'gzip') if e in variants and accept[e]), 'identity')
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding   # flask-compress dobara compress nahi karega
+        return Response(variants[encoding], mimetype='text/html', headers=headers)
     except Exception as e:
         logger.error(f"Index route error: {e}")
         import traceback; traceback.print_exc()
@@ -154,10 +238,50 @@ def index():
 
 # ========== USER APIs ==========
 
+def _user_payload(user_id, user_data, month_active_refs=None, used_withdrawal_slots=None):
+    """/api/user aur /api/bootstrap dono ka common user response."""
+    user_data = dict(user_data)
+    if '_id' in user_data:
+        user_data['_id'] = str(user_data['_id'])
+    # Auto-reset today_earned if new IST day (India +5:30)
+    from datetime import timezone as _tz, timedelta as _tdm
+    today = (datetime.now(_tz.utc) + _tdm(hours=5, minutes=30)).date().isoformat()
+    if user_data.get('today_date') != today:
+        user_data['today_earned'] = 0.0
+        db.users.update_one(
+            {'user_id': user_id},
+            {'$set': {'today_earned': 0.0, 'today_date': today}}
+        )
+        db.user_cache.apply(user_id, set_={'today_earned': 0.0, 'today_date': today})
+    # Include month_active_refs in main user call
+    if month_active_refs is None:
+        month_active_refs = db.get_month_active_refs(user_id, user=user_data)
+    user_data['month_active_refs'] = month_active_refs
+    # Include used withdrawal slots (each 1000pts used = 1 slot)
+    if used_withdrawal_slots is None:
+        used_withdrawal_slots = db.get_used_refer_withdrawals(user_id, user=user_data)
+    user_data['used_withdrawal_slots'] = used_withdrawal_slots
+    user_data.pop('month_stats', None)   # raw buckets client ko nahi chahiye
+    # Ensure today_earned field exists
+    if 'today_earned' not in user_data:
+        user_data['today_earned'] = 0.0
+    # Build claimed_milestones list from individual fields
+    claimed_milestones = []
+    for m in [5, 10, 25, 50, 100]:
+        if user_data.get(f'milestone_claimed_{m}'):
+            claimed_milestones.append(m)
+    user_data['claimed_milestones'] = claimed_milestones
+    return user_data
+
+def _settings_payload(settings):
+    return {
+        'upi_id': settings.get('upi_id', 'arsadsaifi8272@ibl'),
+        'min_withdraw': settings.get('min_withdraw', 5000),
+    }
+
 @app.route('/api/user/<int:user_id>')
 def get_user_api(user_id):
-    global db, request_count
-    request_count += 1
+    global db
     try:
         if user_id == 0:
             return jsonify({
@@ -171,37 +295,40 @@ def get_user_api(user_id):
             return jsonify({'error': 'Database not connected'}), 503
         user_data = db.get_user(user_id)
         if user_data:
-            if '_id' in user_data:
-                user_data['_id'] = str(user_data['_id'])
-            # Auto-reset today_earned if new IST day (India +5:30)
-            from datetime import timezone as _tz, timedelta as _tdm
-            today = (datetime.now(_tz.utc) + _tdm(hours=5, minutes=30)).date().isoformat()
-            if user_data.get('today_date') != today:
-                user_data['today_earned'] = 0.0
-                db.users.update_one(
-                    {'user_id': user_id},
-                    {'$set': {'today_earned': 0.0, 'today_date': today}}
-                )
-                db.user_cache.pop(f"user_{user_id}", None)
-            # Include month_active_refs in main user call
-            user_data['month_active_refs'] = db.get_month_active_refs(user_id)
-            # Include used withdrawal slots (each 1000pts used = 1 slot)
-            user_data['used_withdrawal_slots'] = db.get_used_refer_withdrawals(user_id)
-            # Ensure today_earned field exists
-            if 'today_earned' not in user_data:
-                user_data['today_earned'] = 0.0
-            # Build claimed_milestones list from individual fields
-            claimed_milestones = []
-            for m in [5, 10, 25, 50, 100]:
-                if user_data.get(f'milestone_claimed_{m}'):
-                    claimed_milestones.append(m)
-            user_data['claimed_milestones'] = claimed_milestones
-            return jsonify(user_data)
+            return jsonify(_user_payload(user_id, user_data))
         return jsonify({'error': 'User not found'}), 404
     except Exception as e:
         logger.error(f"API error for user {user_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/bootstrap/<int:user_id>')
+def bootstrap_api(user_id):
+    """
+    Mini App cold-open — user, bonus days, missions, ads, claimed ads,
+    settings aur game state ek hi response mein (pehle 7 alag requests thi).
+    """
+    global db
+    try:
+        if not db or not db.ensure_connection():
+            return jsonify({'error': 'Database not connected'}), 503
+        snap = db.get_home_snapshot(user_id)
+        if not snap:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify({
+            'user': _user_payload(user_id, snap['user'],
+                                  month_active_refs=snap['month_active_refs'],
+                                  used_withdrawal_slots=snap['used_withdrawal_slots']),
+            'bonus_days': {'claimed_days': snap['bonus_days']},
+            'missions': snap['missions'],
+            'claimed_ads': {'claimed_ads': [{'ad_id': ad} for ad in snap['claimed_ads']]},
+            'ads': {'ads': snap['ads']},
+            'settings': _settings_payload(snap['settings']),
+            'game_state': snap['game_state']
+        })
+    except Exception as e:
+        logger.error(f"Bootstrap error for user {user_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/user/<int:user_id>/withdrawals')
 def get_user_withdrawals_api(user_id):
     try:
@@ -242,15 +369,15 @@ def get_user_missions_api(user_id):
 def get_ref_activity_api(user_id):
     try:
         if not db or not db.ensure_connection():
-            return jsonify([])
-        page  = request.args.get('page', 0, type=int)
+            return jsonify({'items': [], 'next_cursor': None})
         limit = request.args.get('limit', 10, type=int)
-        limit = min(limit, 20)  # max 20 per page
-        activity = db.get_ref_activity(user_id, limit=limit, skip=page*limit)
+        limit = max(1, min(limit, 20))  # max 20 per page
+        # cursor = pichle response ka next_cursor (pehle page pe khaali)
+        activity = db.get_ref_activity(user_id, limit=limit, cursor=request.args.get('cursor') or None)
         return jsonify(activity)
     except Exception as e:
         logger.error(f"Ref activity error: {e}")
-        return jsonify([])
+        return jsonify({'items': [], 'next_cursor': None})
 
 @app.route('/api/user/<int:user_id>/claimed-ads')
 def get_user_claimed_ads(user_id):
@@ -293,7 +420,12 @@ def leaderboard_api():
         leaderboard = db.get_leaderboard(limit, mode=mode)
         # Always return {users: [...]} format
         if isinstance(leaderboard, list):
-            return jsonify({'users': leaderboard, 'mode': mode})
+            resp = {'users': leaderboard, 'mode': mode}
+            # ?user_id= → caller ki apni rank + aas-paas wale
+            user_id = request.args.get('user_id', 0, type=int)
+            if user_id:
+                resp['me'] = db.get_leaderboard_position(user_id, mode=mode)
+            return jsonify(resp)
         return jsonify(leaderboard)
     except Exception as e:
         logger.error(f"Leaderboard error: {e}")
@@ -301,11 +433,22 @@ def leaderboard_api():
 
 @app.route('/api/live-activity')
 def live_activity_api():
+    """
+    Live feed poll — in-memory ring buffer se, DB nahi. Frontend If-None-Match bhejta hai;
+    naya event na aaya ho toh 304 (body / JSON render kuch nahi). Koi request thread rokta nahi.
+    """
     try:
         if not db or not db.ensure_connection():
             return jsonify([])
-        activities = db.get_live_activity(25)
-        return jsonify(activities)
+        if not db.live_feed.seeded:
+            db.get_live_activity(25)   # pehli call buffer seed karti hai — tag uske baad
+        etag = db.live_feed.etag
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        response = jsonify(db.get_live_activity(25))
+        response.headers.update(headers)
+        return response
     except Exception as e:
         logger.error(f"Live activity error: {e}")
         return jsonify([])
@@ -397,7 +540,7 @@ def update_ad_api():
                 ad_title = data.get('title', 'New Offer')
                 ad_pts = int(float(data.get('reward', 0)) * 100)
                 ad_img = data.get('image_url', '')
-                db.ads.update_one({'id': int(ad_id)}, {'$set': {'is_new_notif': True, 'notif_sent_at': datetime.now().isoformat()}})
+                db.ads.update_one({'id': int(ad_id)}, {'$set': {'is_new_notif': True, 'notif_sent_at': datetime.now()}})
                 # Store as pending notification for all users to fetch
                 db.notifications.insert_one({
                     'type': 'new_offer',
@@ -405,7 +548,7 @@ def update_ad_api():
                     'body': f"Complete karo aur +{ad_pts} pts pao!",
                     'image_url': ad_img,
                     'ad_id': int(ad_id),
-                    'created_at': datetime.now().isoformat(),
+                    'created_at': datetime.now(),
                     'created_ts': datetime.now().timestamp()
                 })
             except Exception as ne:
@@ -480,11 +623,11 @@ def claim_single_mission_api():
         data = request.get_json()
         user_id = data.get('user_id')
         mission_id = data.get('mission_id')
-        reward = data.get('reward')
-        if not user_id or not mission_id or reward is None:
+        if not user_id or not mission_id:
             return jsonify({'success': False, 'message': 'Missing data'}), 400
         client_date = data.get('date')
-        result = db.claim_single_mission(user_id, mission_id, reward, client_date=client_date)
+        # reward server ke MISSIONS_DEF se — client ka `reward` field ignore
+        result = db.claim_single_mission(user_id, mission_id, data.get('reward'), client_date=client_date)
         return jsonify(result)
     except Exception as e:
         logger.error(f"Claim single mission error: {e}")
@@ -541,35 +684,24 @@ def request_passes_api():
             txn_id.strip(), screenshot
         )
         # Notify admins via bot
-        if result.get('success') and bot_app:
+        if result.get('success') and outbox.ready:
             user = db.get_user(int(user_id))
             uname = user.get('first_name', 'User') if user else 'User'
             req_id = result.get('request_id', '?')
-            for admin_id in config.ADMIN_IDS:
-                try:
-                    import asyncio
-                    async def notify():
-                        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-                        kb = [[
-                            InlineKeyboardButton("✅ VERIFY", callback_data=f"verify_passes_{req_id}"),
-                            InlineKeyboardButton("❌ REJECT", callback_data=f"reject_passes_{req_id}")
-                        ]]
-                        await bot_app.bot.send_message(
-                            chat_id=admin_id,
-                            text=(
-                                f"💰 **PASS PURCHASE REQUEST**\n\n"
-                                f"👤 User: {uname} (`{user_id}`)\n"
-                                f"📦 Package: {passes} passes\n"
-                                f"💵 Amount: ₹{price}\n"
-                                f"🔢 TXN ID: `{txn_id}`\n"
-                                f"📋 Request ID: `{req_id}`"
-                            ),
-                            reply_markup=InlineKeyboardMarkup(kb),
-                            parse_mode='Markdown'
-                        )
-                    asyncio.run_coroutine_threadsafe(notify(), bot_loop)
-                except Exception as e:
-                    logger.error(f"Admin notify error: {e}")
+            kb = InlineKeyboardMarkup([[
+                InlineKeyboardButton("✅ VERIFY", callback_data=f"verify_passes_{req_id}"),
+                InlineKeyboardButton("❌ REJECT", callback_data=f"reject_passes_{req_id}")
+            ]])
+            text = (
+                f"💰 **PASS PURCHASE REQUEST**\n\n"
+                f"👤 User: {uname} (`{user_id}`)\n"
+                f"📦 Package: {passes} passes\n"
+                f"💵 Amount: ₹{price}\n"
+                f"🔢 TXN ID: `{txn_id}`\n"
+                f"📋 Request ID: `{req_id}`"
+            )
+            outbox.enqueue([{'chat_id': admin_id, 'text': text, 'reply_markup': kb, 'parse_mode': 'Markdown'}
+                            for admin_id in config.ADMIN_IDS], kind='pass_request')
         return jsonify(result)
     except Exception as e:
         logger.error(f"Request passes error: {e}")
@@ -588,20 +720,14 @@ def verify_passes_api():
             return jsonify({'success': False, 'message': 'DB error'}), 503
         result = db.process_pass_request(request_id, action, admin_id)
         # Notify user
-        if result.get('success') and bot_app:
+        if result.get('success') and outbox.ready:
             user_id = result.get('user_id')
             passes = result.get('passes', 0)
             if action == 'verify':
                 msg = f"✅ **Passes Add Ho Gaye!**\n\n🎟️ {passes} passes aapke account mein add ho gaye!\nGame khelo aur paise kamao! 🎮"
             else:
                 msg = f"❌ **Pass Request Reject**\n\nAapki pass request reject ho gayi.\nTransaction proof sahi nahi tha ya already processed tha.\nSupport ke liye contact karo."
-            try:
-                import asyncio
-                async def notify_user():
-                    await bot_app.bot.send_message(chat_id=user_id, text=msg, parse_mode='Markdown')
-                asyncio.run_coroutine_threadsafe(notify_user(), bot_loop)
-            except Exception as e:
-                logger.error(f"User notify error: {e}")
+            outbox.send(user_id, msg, kind='pass_verify', parse_mode='Markdown')
         return jsonify(result)
     except Exception as e:
         logger.error(f"Verify passes error: {e}")
@@ -614,10 +740,7 @@ def get_settings_api():
         if not db or not db.ensure_connection():
             return jsonify({'upi_id': 'arsadsaifi8272@ibl'})
         settings = db.get_settings() if hasattr(db, 'get_settings') else {}
-        return jsonify({
-            'upi_id': settings.get('upi_id', 'arsadsaifi8272@ibl'),
-            'min_withdraw': settings.get('min_withdraw', 5000),
-        })
+        return jsonify(_settings_payload(settings))
     except Exception as e:
         logger.error(f"Settings error: {e}")
         return jsonify({'upi_id': 'arsadsaifi8272@ibl'})
@@ -665,9 +788,9 @@ def claim_weekly_bonus_api():
         )
         if not result:
             return jsonify({'success': False, 'message': 'Weekly bonus already claimed!'})
+        # add_balance fresh doc (weekly flag samet) cache mein daal deta hai
         db.add_balance(user_id_int, 1.0, 'Weekly bonus — 7 day streak!')
         db.add_live_activity('bonus', user_id_int, 1.0, '7 din ka streak! Weekly bonus +₹1')
-        db.user_cache.pop(f"user_{user_id_int}", None)
         return jsonify({'success': True, 'reward': 1.0, 'message': '🎉 Weekly Bonus! +₹1'})
     except Exception as e:
         logger.error(f"Weekly bonus error: {e}")
@@ -686,21 +809,6 @@ def claim_mission_reward_api():
         logger.error(f"Claim mission reward error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
-@app.route('/api/update-mission', methods=['POST'])
-def update_mission_api():
-    try:
-        data = request.get_json()
-        user_id = data.get('user_id')
-        mission_id = data.get('mission_id') or data.get('mission_type')
-        count = data.get('count', 1)
-        if not user_id or not mission_id:
-            return jsonify({'success': False, 'message': 'Missing data'}), 400
-        db._update_single_mission_progress(user_id, mission_id, count)
-        return jsonify({'success': True})
-    except Exception as e:
-        logger.error(f"Update mission error: {e}")
-        return jsonify({'success': False, 'message': str(e)}), 500
-
 # ========== DAILY SEARCH ==========
 
 @app.route('/api/record-search', methods=['POST'])
@@ -805,19 +913,10 @@ def support_api():
             return jsonify({'success': False, 'message': 'Missing data'}), 400
         msg_id = db.add_support_message(user_id, message)
         if msg_id:
-            if bot_app and config and bot_loop:
-                for admin_id in config.ADMIN_IDS:
-                    try:
-                        asyncio.run_coroutine_threadsafe(
-                            bot_app.bot.send_message(
-                                chat_id=admin_id,
-                                text=f"📩 *New Support Message*\n\nUser ID: `{user_id}`\nMsg: {message[:100]}",
-                                parse_mode=ParseMode.MARKDOWN
-                            ),
-                            bot_loop
-                        )
-                    except:
-                        pass
+            if config:
+                text = f"📩 *New Support Message*\n\nUser ID: `{user_id}`\nMsg: {message[:100]}"
+                outbox.enqueue([{'chat_id': admin_id, 'text': text, 'parse_mode': ParseMode.MARKDOWN}
+                                for admin_id in config.ADMIN_IDS], kind='support')
             return jsonify({'success': True, 'message': 'Message sent!'})
         return jsonify({'success': False, 'message': 'Failed to send'})
     except Exception as e:
@@ -854,18 +953,9 @@ def admin_reply_support_api():
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
         success = db.mark_support_replied(message_id, admin_id, reply)
         if success:
-            if bot_app and bot_loop and user_id:
-                try:
-                    asyncio.run_coroutine_threadsafe(
-                        bot_app.bot.send_message(
-                            chat_id=int(user_id),
-                            text=f"📩 *Support Reply*\n\n{reply}",
-                            parse_mode=ParseMode.MARKDOWN
-                        ),
-                        bot_loop
-                    )
-                except:
-                    pass
+            if user_id:
+                outbox.send(int(user_id), f"📩 *Support Reply*\n\n{reply}", kind='support_reply',
+                            parse_mode=ParseMode.MARKDOWN)
             return jsonify({'success': True, 'message': 'Reply sent!'})
         return jsonify({'success': False, 'message': 'Failed'})
     except Exception as e:
@@ -1126,10 +1216,10 @@ def game_earn_api():
 
 @app.route('/api/stats')
 def stats_api():
-    global request_count, start_time, db
+    global start_time, db
     uptime = str(datetime.now() - start_time).split('.')[0]
     stats = {
-        'uptime': uptime, 'requests': request_count,
+        'uptime': uptime, 'requests': metrics.total_requests('route'),
         'status': 'healthy', 'db_connected': db.connected if db else False,
         'timestamp': datetime.now().isoformat()
     }
@@ -1206,24 +1296,10 @@ def send_ref_nudge():
             f"👉 {safe_link}\n\n"
             f"✅ Isse <b>aapko bhi</b> 30 pts milenge aur jisne refer kiya unhe bhi paise milenge! 💰"
         )
-        import asyncio as _asyncio
-        async def _send():
-            try:
-                await bot_app.bot.send_message(
-                    chat_id=ref_user_id,
-                    text=msg,
-                    parse_mode='HTML'
-                )
-                return {'success': True}
-            except Exception as ex:
-                err = str(ex).lower()
-                if 'blocked' in err or 'deactivated' in err:
-                    return {'success': False, 'message': 'Is user ne bot block kar diya hai'}
-                return {'success': False, 'message': str(ex)[:100]}
-        if bot_loop and bot_loop.is_running():
-            future = _asyncio.run_coroutine_threadsafe(_send(), bot_loop)
-            result = future.result(timeout=10)
-            return jsonify(result)
+        # Queue karo aur turant lauto — result /api/outbox/<job_id> se
+        job_id = outbox.send(ref_user_id, msg, kind='ref_nudge', parse_mode='HTML')
+        if job_id:
+            return jsonify({'success': True, 'queued': True, 'job_id': job_id})
         return jsonify({'success': False, 'message': 'Bot not running'})
     except Exception as ex:
         logger.error(f"send_ref_nudge error: {ex}")
@@ -1249,43 +1325,43 @@ def send_shortlink_reminder_api():
             'is_active': False
         }).limit(10))
 
-        sent = 0
-        for ref in pending:
-            ref_user_id = ref.get('referred_id')
-            ref_user = db.get_user(ref_user_id)
-            if not ref_user:
-                continue
-            ref_name = ref_user.get('first_name', 'Dost')
-            try:
-                import asyncio
-                async def _send(rid, rname):
-                    kb = [[InlineKeyboardButton("🎬 MOVIE SEARCH KARO!", url=config.MOVIE_GROUP_LINK)]]
-                    await bot_app.bot.send_message(
-                        chat_id=rid,
-                        text=(
-                            f"👋 *{rname}, yaad hai?*\n\n"
-                            f"Tumne abhi tak movie search nahi ki! 😔\n\n"
-                            f"🎁 *Abhi karo = 50 pts INSTANT bonus!*\n"
-                            f"🎬 Group mein koi bhi movie search karo\n"
-                            f"🔗 Shortlink kholo — bas 10 second!\n\n"
-                            f"💰 Roz search = Roz 30 pts!\n"
-                            f"🎮 Games khelo = Unlimited earning!\n\n"
-                            f"⏰ *Offer limited hai — jaldi karo!*"
-                        ),
-                        reply_markup=InlineKeyboardMarkup(kb),
-                        parse_mode='Markdown'
-                    )
-                if bot_loop and bot_loop.is_running():
-                    future = asyncio.run_coroutine_threadsafe(_send(ref_user_id, ref_name), bot_loop)
-                    future.result(timeout=10)
-                    sent += 1
-            except:
-                pass
-
-        return jsonify({'success': True, 'sent': sent, 'total_pending': len(pending)})
+        # Sab referred users ek query mein, messages ek outbox job mein (parallel bhejega)
+        ids = [ref.get('referred_id') for ref in pending if ref.get('referred_id')]
+        names = {u['user_id']: u.get('first_name', 'Dost')
+                 for u in db.users.find({'user_id': {'$in': ids}}, {'user_id': 1, 'first_name': 1, '_id': 0})}
+        kb = InlineKeyboardMarkup([[InlineKeyboardButton("🎬 MOVIE SEARCH KARO!", url=config.MOVIE_GROUP_LINK)]])
+        messages = [{
+            'chat_id': rid,
+            'text': (
+                f"👋 *{names[rid]}, yaad hai?*\n\n"
+                f"Tumne abhi tak movie search nahi ki! 😔\n\n"
+                f"🎁 *Abhi karo = 50 pts INSTANT bonus!*\n"
+                f"🎬 Group mein koi bhi movie search karo\n"
+                f"🔗 Shortlink kholo — bas 10 second!\n\n"
+                f"💰 Roz search = Roz 30 pts!\n"
+                f"🎮 Games khelo = Unlimited earning!\n\n"
+                f"⏰ *Offer limited hai — jaldi karo!*"
+            ),
+            'reply_markup': kb,
+            'parse_mode': 'Markdown'
+        } for rid in ids if rid in names]
+        if not messages:
+            return jsonify({'success': True, 'sent': 0, 'queued': 0, 'total_pending': len(pending)})
+        job_id = outbox.enqueue(messages, kind='shortlink_reminder')
+        if not job_id:
+            return jsonify({'success': False, 'message': 'Bot not running'})
+        return jsonify({'success': True, 'queued': len(messages), 'job_id': job_id, 'total_pending': len(pending)})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/outbox/<job_id>')
+def outbox_status_api(job_id):
+    """ Queued bot message ka status — queued / sending / done + sent/failed/blocked counts """
+    job = outbox.status(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found or expired'}), 404
+    return jsonify(dict(job, success=True))
+
 # ========== NEW: DAILY STREAK CHALLENGE API ==========
 
 @app.route('/api/streak-challenge', methods=['POST'])
@@ -1308,16 +1384,16 @@ def streak_challenge_api():
             bonus = config.STREAK_7_BONUS
             db.add_balance(int(user_id), bonus, f"7-day streak bonus!")
             db.users.update_one({'user_id': int(user_id)}, {'$set': {'streak_7_claimed': True}})
-            db.add_live_activity('bonus', int(user_id), bonus, f"🔥 7-day streak bonus +₹{bonus}!")
-            db.user_cache.pop(f"user_{user_id}", None)
+            db.user_cache.apply(user_id, set_={'streak_7_claimed': True})
+            db.add_live_activity('bonus', int(user_id), bonus, f"🔥 7-day streak bonus +₹{bonus}!", user_name=user.get('first_name', 'User'))
             result = {'success': True, 'bonus': bonus, 'message': f'🔥 7-day streak! +₹{bonus}!'}
 
         elif streak == 30 and not user.get('streak_30_claimed'):
             bonus = config.STREAK_30_BONUS
             db.add_balance(int(user_id), bonus, f"30-day streak bonus!")
             db.users.update_one({'user_id': int(user_id)}, {'$set': {'streak_30_claimed': True}})
-            db.add_live_activity('bonus', int(user_id), bonus, f"🏆 30-day streak bonus +₹{bonus}!")
-            db.user_cache.pop(f"user_{user_id}", None)
+            db.user_cache.apply(user_id, set_={'streak_30_claimed': True})
+            db.add_live_activity('bonus', int(user_id), bonus, f"🏆 30-day streak bonus +₹{bonus}!", user_name=user.get('first_name', 'User'))
             result = {'success': True, 'bonus': bonus, 'message': f'🏆 30-day streak! +₹{bonus}!'}
 
         return jsonify(result)
@@ -1347,6 +1423,7 @@ def game_quiz_api():
 
         # Deduct 1 pass
         db.users.update_one({'user_id': int(user_id)}, {'$inc': {'passes': -1}})
+        db.user_cache.apply(user_id, inc={'passes': -1})
 
         is_correct = (int(answer_idx) == int(correct_idx))
         reward = 0
@@ -1355,7 +1432,6 @@ def game_quiz_api():
             db.add_balance(int(user_id), reward, "Quiz correct answer!")
             db.add_live_activity('game', int(user_id), reward, "🧠 Quiz correct! +100 pts")
 
-        db.user_cache.pop(f"user_{user_id}", None)
         return jsonify({
             'success': True,
             'correct': is_correct,
@@ -1413,11 +1489,10 @@ def adsgram_reward():
                 {'user_id': user_id},
                 {'$set': {'watch_ad_today': ist_today}}
             )
+            db.user_cache.apply(user_id, set_={'watch_ad_today': ist_today})
         except Exception as we:
             logger.warning(f"watch_ad_today set error: {we}")
 
-        db.user_cache.pop(f"user_{user_id}", None)
-
         logger.info(f"✅ AdsGram reward: user={user_id} block={block_id} bonus={bonus_type} +₹{reward_pts}")
         return jsonify({'success': True, 'message': 'Reward added', 'reward': reward_pts, 'pts': int(reward_pts*100)}), 200
 
@@ -1437,13 +1512,16 @@ def debug_claim():
         if not db or not db.ensure_connection():
             return jsonify({'error': 'DB not connected'})
         user = db.get_user(int(user_id)) if user_id else None
-        mission_doc = db.missions.find_one({'user_id': int(user_id), 'mission_id': mission_id}) if user_id else None
+        mdef = db.MISSIONS_BY_ID.get(mission_id)
+        mission_doc = db.mission_days.find_one(
+            db._mission_key(mdef, user_id), {'_id': 0, f'missions.{mission_id}': 1}
+        ) if user_id and mdef else None
         result = db.claim_single_mission(user_id, mission_id, reward)
         return jsonify({
             'claim_result': result,
             'user_streak': user.get('daily_streak',0) if user else None,
             'user_refs': user.get('active_refs',0) if user else None,
-            'mission_doc': {k:v for k,v in mission_doc.items() if k!='_id'} if mission_doc else None
+            'mission_doc': (mission_doc.get('missions') or {}).get(mission_id) if mission_doc else None
         })
     except Exception as e:
         import traceback
@@ -1495,18 +1573,14 @@ def jackpot_declare_api():
         if not db or not db.ensure_connection():
             return jsonify({'success': False, 'message': 'Server error'}), 503
         result = db.declare_jackpot_result(winning_number, admin_id)
-        if result.get('success') and bot_app and config and bot_loop:
+        if result.get('success') and config and outbox.ready:
             winners = result.get('winner_details', [])
             summary = (f"Jackpot Result!\nWinning Number: {winning_number}\n"
                       f"Total Bets: {result.get('total_bets', 0)}\nWinners: {result.get('winners', 0)}")
             if winners:
                 summary += "\n\nWinners:\n" + "\n".join(f"- {w['name']} +{w['pts']} pts" for w in winners)
-            for admin_cid in config.ADMIN_IDS:
-                try:
-                    asyncio.run_coroutine_threadsafe(
-                        bot_app.bot.send_message(chat_id=admin_cid, text=summary), bot_loop)
-                except:
-                    pass
+            outbox.enqueue([{'chat_id': admin_cid, 'text': summary} for admin_cid in config.ADMIN_IDS],
+                           kind='jackpot')
         return jsonify(result)
     except Exception as e:
         logger.error(f"jackpot_declare_api error: {e}")
@@ -1555,12 +1629,29 @@ def monthly_reset_api():
 
 @app.route('/health')
 def health():
+    status = {
+        'status': 'ok',
+        'role': config.PROCESS_ROLE if config else None,
+        'db': bool(db and db.connected),
+        'bot_running': bot_running,
+        'bot_loop_lag': loop_lag.snapshot(),       # bot loop kitna block hua (ms)
+        'db_executor': adb.stats if adb else {},
+        'webhook': ingest.stats(),                 # queue depth, duplicate/dropped counters
+        'user_cache': db.user_cache.info() if db else {},  # hit rate, write-through applies
+        'schema_version': db.schema_version if db else None,
+        'last_seen': dict(db.last_seen.stats, pending=db.last_seen.pending()) if db and hasattr(db, 'last_seen') else {}
+    }
     if not db or not db.connected:
         status['status'] = 'degraded'
         return jsonify(status), 503
     return jsonify(status)
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """ Prometheus scrape — route/handler latency histograms, DB round trips per request, Mongo commands. """
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/health')
 def health_check():
     try:
@@ -1606,7 +1697,7 @@ def push_notification_api():
             'title': title,
             'body': body,
             'image_url': image_url,
-            'created_at': datetime.now().isoformat(),
+            'created_at': datetime.now(),
             'created_ts': datetime.now().timestamp()
         })
         return jsonify({'success': True})
@@ -1616,12 +1707,15 @@ def push_notification_api():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     global bot_app, bot_loop
-    if not bot_app:
+    if not bot_app and ingest is not channel:
         return "Bot not initialized", 503
     try:
-        update = Update.de_json(request.get_json(force=True), bot_app.bot)
-        asyncio.run_coroutine_threadsafe(bot_app.process_update(update), bot_loop)
-        return "OK", 200
+        # Sirf queue mein daalo — parse + process bot loop ke workers karte hain
+        # (PROCESS_ROLE=web: ingest = channel, update bot_queue mein, bot process uthata hai)
+        result = ingest.submit(request.get_json(force=True, silent=True))
+        if result in (UpdateIngest.FULL, UpdateIngest.NOT_READY):
+            return "Busy", 503   # Telegram thodi der baad retry karega
+        return "OK", 200         # accepted / duplicate / invalid — retry ka fayda nahi
     except Exception as e:
         logger.error(f"Webhook error: {e}")
         return "Error", 500
@@ -1659,7 +1753,7 @@ async def post_init(application):
                 url=webhook_url,
                 allowed_updates=["message","channel_post","edited_channel_post","callback_query","inline_query"],
                 drop_pending_updates=True,
-                max_connections=40
+                max_connections=min(100, ingest.workers)   # jitne workers utne parallel connections
             )
             logger.info(f"✅ Webhook SET: {webhook_url}")
         else:
@@ -1683,14 +1777,23 @@ async def scheduled_jobs():
     global db, config, bot_app, handlers
     logger.info("Scheduled jobs started")
     reminder_sent_today = None
+    # One-time data jobs — pehli deploy pe (system_stats marker na ho tab) ek hi baar
+    try:
+        if db and await adb.ensure_connection():
+            if not await adb.has_system_event('month_stats_backfill'):
+                await adb.backfill_month_stats()
+            if not await adb.has_system_event('missions_migrated'):
+                await adb.migrate_missions()
+    except Exception as e:
+        logger.error(f"One-time data job error: {e}")
     while True:
         try:
             now = datetime.now()
 
             # Midnight job — daily earnings
             if now.hour == 0 and now.minute == 0:
-                if db and db.ensure_connection():
-                    count = db.process_daily_referral_earnings()
+                if db and await adb.ensure_connection():
+                    count = await adb.process_daily_referral_earnings()
                     logger.info(f"Midnight job: processed {count} daily earnings")
 
             # Evening reminder — 8 PM (once per day)
@@ -1735,52 +1838,60 @@ def run_bot():
     try:
         bot_app = Application.builder().token(config.BOT_TOKEN).build()
 
+        # Har callback metrics.instrument se — handler latency + uske DB round trips (/metrics)
+        timed = metrics.instrument
+
+        # Activity tracking — baaki handlers se pehle, kisi ko block nahi karta
+        bot_app.add_handler(TypeHandler(Update, timed(handlers.track_activity)), group=-1)
+
         # Commands
-        bot_app.add_handler(CommandHandler("start", handlers.start))
-        bot_app.add_handler(CommandHandler("app", handlers.open_app))
-        bot_app.add_handler(CommandHandler("balance", handlers.check_balance))
-        bot_app.add_handler(CommandHandler("referrals", handlers.show_referrals))
-        bot_app.add_handler(CommandHandler("withdraw", handlers.withdraw_cmd))
-        bot_app.add_handler(CommandHandler("help", handlers.help_cmd))
-        bot_app.add_handler(CommandHandler("admin", admin_handlers.admin_panel))
+        bot_app.add_handler(CommandHandler("start", timed(handlers.start)))
+        bot_app.add_handler(CommandHandler("app", timed(handlers.open_app)))
+        bot_app.add_handler(CommandHandler("balance", timed(handlers.check_balance)))
+        bot_app.add_handler(CommandHandler("referrals", timed(handlers.show_referrals)))
+        bot_app.add_handler(CommandHandler("withdraw", timed(handlers.withdraw_cmd)))
+        bot_app.add_handler(CommandHandler("help", timed(handlers.help_cmd)))
+        bot_app.add_handler(CommandHandler("admin", timed(admin_handlers.admin_panel)))
+        bot_app.add_handler(CommandHandler("rebuild_leaderboard", timed(admin_handlers.rebuild_leaderboard)))
+        bot_app.add_handler(CommandHandler("backfill_month_stats", timed(admin_handlers.backfill_month_stats)))
 
         # Admin callbacks
-        bot_app.add_handler(CallbackQueryHandler(admin_handlers.handle_admin_callback))
+        bot_app.add_handler(CallbackQueryHandler(timed(admin_handlers.handle_admin_callback)))
 
         # WebApp data
-        bot_app.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, handlers.handle_webapp_data))
+        bot_app.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, timed(handlers.handle_webapp_data)))
 
         # ===== LOG CHANNEL HANDLER =====
         # Channel posts aate hain — TEXT filter + UpdateType.CHANNEL_POST dono chahiye
         from telegram.ext import filters as tg_filters
         bot_app.add_handler(MessageHandler(
             tg_filters.Chat(LOG_CHANNEL_ID) & tg_filters.TEXT,
-            handlers.handle_log_channel_message
+            timed(handlers.handle_log_channel_message)
         ))
         # Also handle channel_post explicitly (for channel messages)
         bot_app.add_handler(MessageHandler(
             tg_filters.Chat(LOG_CHANNEL_ID) & tg_filters.UpdateType.CHANNEL_POSTS & tg_filters.TEXT,
-            handlers.handle_log_channel_message
+            timed(handlers.handle_log_channel_message)
         ))
 
         # ===== GROUP MESSAGE HANDLER — Daily search earning =====
         # Jab referred users movie group mein message bhejte hain → daily earning credit
         bot_app.add_handler(MessageHandler(
             (filters.ChatType.GROUP | filters.ChatType.SUPERGROUP) & filters.TEXT & ~filters.COMMAND,
-            handlers.handle_group_message
+            timed(handlers.handle_group_message)
         ))
 
         # Admin private messages
         # Admin handler — ALL media types for broadcast (photo, video, audio, etc)
         bot_app.add_handler(MessageHandler(
             filters.ChatType.PRIVATE & ~filters.COMMAND,
-            admin_handlers.handle_admin_message
+            timed(admin_handlers.handle_admin_message)
         ), group=1)
 
         # General private messages
         bot_app.add_handler(MessageHandler(
             filters.TEXT & filters.ChatType.PRIVATE & ~filters.COMMAND,
-            handlers.handle_message
+            timed(handlers.handle_message)
         ))
 
         bot_app.add_error_handler(error_handler)
@@ -1793,8 +1904,15 @@ def run_bot():
         async def _run_app():
             await bot_app.initialize()   # Bot ready karo (no polling started)
             await bot_app.start()        # Handlers active karo (still no polling)
+            ingest.start(bot_app)        # Webhook workers — set_webhook se pehle ready
             await post_init(bot_app)     # Webhook set + commands
             bot_loop.create_task(scheduled_jobs())
+            bot_loop.create_task(loop_lag.run())
+            bot_loop.create_task(admin_handlers.broadcaster.resume_pending(bot_app.bot))
+            outbox.attach(bot_app.bot, bot_loop)
+            if config.PROCESS_ROLE == 'bot':
+                # Web workers alag processes — updates + outbox jobs bot_queue se
+                bot_loop.create_task(channel.consume(adb, ingest, outbox, bot_app.bot))
             logger.info("✅ Bot started — WEBHOOK mode (Flask handles /webhook)")
             # Event loop alive rakho — Flask /webhook route se updates aayenge
             await asyncio.sleep(float("inf"))
@@ -1814,7 +1932,14 @@ def run_bot():
 def run_flask():
     port = int(os.environ.get('PORT', 10000))
     logger.info(f"Flask starting on port {port}")
-    time.sleep(2)  # Give previous instance time to release port
+
+    # Port turant bind ho — shell pre-render background mein (pehla open bhi pre-compressed mile)
+    def _prerender_shell():
+        try:
+            _get_shell()
+        except Exception as e:
+            logger.error(f"Shell pre-render failed (first request pe retry hoga): {e}")
+    threading.Thread(target=_prerender_shell, daemon=True, name='ShellPrerender').start()
 
     # ── Render Keep-Alive: har 13 min mein self-ping karo taaki server so na jaaye ──
     def _keep_alive():
@@ -1873,8 +1998,51 @@ def check_environment():
         return False
     return True
 
+def _apply_schema():
+    try:
+        db.apply_schema()
+    except Exception as e:
+        logger.error(f"Background schema migration failed: {e} — `python main.py migrate` chalao")
+
+def init_runtime():
+    """
+    Config + DB + role ke hisaab se baaki objects. main() aur wsgi.py (web workers) dono yahi chalate hain.
+      all → sab kuch ek process mein (outbox / ingest in-memory, bot thread)
+      web → sirf Flask: outbox aur /webhook ingest dono BotChannel (bot_queue) — handlers / bot loop nahi
+      bot → sirf bot loop: BotChannel.consume() web workers ka kaam uthata hai
+    """
+    global config, db, handlers, admin_handlers, outbox, adb, ingest, channel
+
+    config = Config()
+    logger.info(f"Config loaded. Role: {config.PROCESS_ROLE} | Admins: {config.ADMIN_IDS}")
+
+    db = Database(config)
+    if not db.connected:
+        raise RuntimeError("DB connection failed")
+    logger.info("Database connected")
+
+    if db.schema_version < SCHEMA_VERSION and config.PROCESS_ROLE != 'web':
+        # migrate deploy pe nahi chala (pehla boot / naya version) — port bind na roko, background mein lagao
+        # (web workers N hote hain — unme se koi nahi, bot / all process karta hai)
+        threading.Thread(target=_apply_schema, daemon=True, name='SchemaMigrate').start()
+
+    channel = BotChannel(db.bot_queue, poll_ms=config.BOT_QUEUE_POLL_MS, lease_seconds=config.BOT_QUEUE_LEASE_SECONDS,
+                         batch_size=config.BOT_QUEUE_BATCH)
+    if config.PROCESS_ROLE == 'web':
+        outbox = ingest = channel
+        logger.info("Web role — outbox + webhook updates bot_queue se bot process ko")
+        return
+
+    adb = AsyncDatabase(db, max_workers=config.DB_EXECUTOR_WORKERS)
+    handlers = Handlers(config, db, adb=adb)
+    admin_handlers = AdminHandlers(config, db, None, adb=adb)
+    outbox = Outbox(concurrency=config.OUTBOX_CONCURRENCY, job_ttl=config.OUTBOX_JOB_TTL)
+    ingest = UpdateIngest(workers=config.WEBHOOK_WORKERS, max_pending=config.WEBHOOK_MAX_PENDING,
+                          dedup_window=config.WEBHOOK_DEDUP_WINDOW)
+    logger.info("Handlers initialized")
+
 def main():
-    global config, db, handlers, admin_handlers, bot_running
+    global bot_running
 
     print("""
     ╔══════════════════════════════════════════╗
@@ -1887,26 +2055,27 @@ def main():
         sys.exit(1)
 
     try:
-        config = Config()
-        logger.info(f"Config loaded. Admins: {config.ADMIN_IDS}")
-
-        db = Database(config)
-        if not db.connected:
-            logger.error("DB connection failed")
+        try:
+            init_runtime()
+        except RuntimeError as e:
+            logger.error(str(e))
             sys.exit(1)
-        logger.info("Database connected")
-
-        handlers = Handlers(config, db)
-        admin_handlers = AdminHandlers(config, db, None)
-        logger.info("Handlers initialized")
 
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
 
-        # Bot background thread (webhook mode — just keeps loop alive for async ops)
+        if config.PROCESS_ROLE == 'bot':
+            logger.info("Bot role — sirf bot loop, web workers wsgi.py se (PROCESS_ROLE=web)")
+            run_bot()   # main thread block
+            return
+        if config.PROCESS_ROLE == 'web':
+            logger.info("Web role — single waitress process; N workers ke liye `gunicorn -w N wsgi:app`")
+            run_flask()
+            return
+
+        # Bot thread initialize hota rahe, Flask port abhi bind kare — tab tak /webhook 503 (Telegram retry karta hai)
         bot_thread = threading.Thread(target=run_bot, daemon=True, name='BotThread')
         bot_thread.start()
-        time.sleep(1)
         logger.info(f"Bot thread started")
         logger.info(f"Starting Flask on port {os.environ.get('PORT', 10000)}")
         run_flask()  # Flask blocks main thread
@@ -1924,4 +2093,8 @@ def main():
         logger.info("Shutdown complete")
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['migrate']:
+        # One-shot: indexes + seed data + schema version (deploy / build step pe)
+        import migrations
+        sys.exit(migrations.main(['schema'] + sys.argv[2:]))
     main()
@@ -0,0 +1,195 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== metrics.py (route / handler latency + Mongo round trips, Prometheus text) =====
+#
+# Har Flask request aur PTB handler ek Scope kholta hai (contextvar). pymongo CommandListener
+# har command ko jo bhi scope active hai usme ginta hai — AsyncDatabase thread pool pe bhi context
+# copy karta hai, isliye handler ke adb calls usi handler ke khate mein. Scope ke bina
+# (write buffer, last-seen flush, scheduled jobs) commands 'background' mein.
+#
+#   app.before_request / after_request  → metrics.begin('route', rule) / metrics.end(scope, status)
+#   metrics.instrument(callback)        → PTB handler wrapper
+#   metrics.render()                    → /metrics (Prometheus text format 0.0.4)
+
+import contextvars
+import functools
+import threading
+import time
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+current_scope = contextvars.ContextVar('metrics_scope', default=None)
+
+class Scope:
+    __slots__ = ('kind', 'name', 'started', 'db_calls', 'db_seconds', '_lock')
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.started = time.perf_counter()
+        self.db_calls = 0
+        self.db_seconds = 0.0
+        self._lock = threading.Lock()   # ek handler ke parallel adb calls alag threads se aate hain
+
+    def add_command(self, seconds):
+        with self._lock:
+            self.db_calls += 1
+            self.db_seconds += seconds
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}   # labels tuple → [bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        row = self.series.get(labels)
+        if row is None:
+            row = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+        row[len(self.buckets)] += 1
+        row[-1] += value
+
+    def lines(self, metric, label_names):
+        out = []
+        for labels, row in sorted(self.series.items()):
+            base = _labels(label_names, labels)
+            for i, bound in enumerate(self.buckets):
+                out.append(f'{metric}_bucket{{{base},le="{bound}"}} {row[i]}')
+            out.append(f'{metric}_bucket{{{base},le="+Inf"}} {row[len(self.buckets)]}')
+            out.append(f'{metric}_sum{{{base}}} {row[-1]:.6f}')
+            out.append(f'{metric}_count{{{base}}} {row[len(self.buckets)]}')
+        return out
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    return ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = Histogram(LATENCY_BUCKETS)         # (kind, name)
+        self.round_trips = Histogram(ROUND_TRIP_BUCKETS)  # (kind, name)
+        self.db_seconds = {}                              # (kind, name) → seconds
+        self.requests = {}                                # (kind, name, status) → count
+        self.commands = {}                                # (scope kind, command) → [count, seconds, failures]
+        self.listener = _CommandListener(self)
+
+    # ========== SCOPES ==========
+
+    def begin(self, kind, name):
+        scope = Scope(kind, name)
+        return scope, current_scope.set(scope)
+
+    def end(self, scope, token, status='ok'):
+        elapsed = time.perf_counter() - scope.started
+        key = (scope.kind, scope.name)
+        with self._lock:
+            self.latency.observe(key, elapsed)
+            self.round_trips.observe(key, scope.db_calls)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + scope.db_seconds
+            rkey = (scope.kind, scope.name, str(status))
+            self.requests[rkey] = self.requests.get(rkey, 0) + 1
+        try:
+            current_scope.reset(token)
+        except ValueError:
+            current_scope.set(None)   # token doosre context ka (Flask teardown) — bas scope band karo
+
+    def instrument(self, callback, name=None):
+        """ PTB handler callback wrapper — latency + us handler ke DB round trips. """
+        label = name or getattr(callback, '__qualname__', getattr(callback, '__name__', 'handler'))
+
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            scope, token = self.begin('handler', label)
+            status = 'ok'
+            try:
+                return await callback(update, context)
+            except Exception:
+                status = 'error'
+                raise
+            finally:
+                self.end(scope, token, status)
+        return wrapper
+
+    def total_requests(self, kind='route'):
+        with self._lock:
+            return sum(n for (k, _, _), n in self.requests.items() if k == kind)
+
+    # ========== MONGO ==========
+
+    def _command_done(self, command, seconds, failed=False):
+        scope = current_scope.get()
+        if scope is not None:
+            scope.add_command(seconds)
+        key = (scope.kind if scope else 'background', command)
+        with self._lock:
+            row = self.commands.setdefault(key, [0, 0.0, 0])
+            row[0] += 1
+            row[1] += seconds
+            if failed:
+                row[2] += 1
+
+    # ========== EXPORT ==========
+
+    def render(self):
+        names = ('kind', 'name')
+        with self._lock:
+            lines = [
+                '# HELP earnzone_request_duration_seconds Flask route / PTB handler latency.',
+                '# TYPE earnzone_request_duration_seconds histogram',
+                *self.latency.lines('earnzone_request_duration_seconds', names),
+                '# HELP earnzone_request_db_round_trips Mongo commands per request / handler call.',
+                '# TYPE earnzone_request_db_round_trips histogram',
+                *self.round_trips.lines('earnzone_request_db_round_trips', names),
+                '# HELP earnzone_request_db_seconds_total Mongo time spent inside requests / handlers.',
+                '# TYPE earnzone_request_db_seconds_total counter',
+                *(f'earnzone_request_db_seconds_total{{{_labels(names, k)}}} {v:.6f}'
+                  for k, v in sorted(self.db_seconds.items())),
+                '# HELP earnzone_requests_total Requests / handler calls by outcome.',
+                '# TYPE earnzone_requests_total counter',
+                *(f'earnzone_requests_total{{{_labels(names + ("status",), k)}}} {v}'
+                  for k, v in sorted(self.requests.items())),
+                '# HELP earnzone_mongo_commands_total Mongo commands by scope kind and command.',
+                '# TYPE earnzone_mongo_commands_total counter',
+                *(f'earnzone_mongo_commands_total{{{_labels(("scope", "command"), k)}}} {v[0]}'
+                  for k, v in sorted(self.commands.items())),
+                '# HELP earnzone_mongo_command_seconds_total Mongo command time by scope kind and command.',
+                '# TYPE earnzone_mongo_command_seconds_total counter',
+                *(f'earnzone_mongo_command_seconds_total{{{_labels(("scope", "command"), k)}}} {v[1]:.6f}'
+                  for k, v in sorted(self.commands.items())),
+                '# HELP earnzone_mongo_command_failures_total Failed Mongo commands.',
+                '# TYPE earnzone_mongo_command_failures_total counter',
+                *(f'earnzone_mongo_command_failures_total{{{_labels(("scope", "command"), k)}}} {v[2]}'
+                  for k, v in sorted(self.commands.items())),
+            ]
+        return '\n'.join(lines) + '\n'
+
+class _CommandListener(monitoring.CommandListener):
+    """ pymongo listeners command chalane wale thread pe sync call hote hain — contextvar wahi hai. """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.metrics._command_done(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.metrics._command_done(event.command_name, event.duration_micros / 1e6, failed=True)
+
+metrics = Metrics()
@@ -0,0 +1,173 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== migrations.py (data migrations) =====
+#
+# Usage:
+#   python main.py migrate [--force]          (= python migrations.py schema)
+#   python migrations.py timestamps [--batch-size 500] [--collections users,referrals] [--restart]
+#
+# schema — indexes + seed data (Database.apply_schema). Applied version `migrations` collection mein
+# ({_id: 'schema', version}); normal boot sirf woh ek doc padhta hai. Indexes / seed badlo toh
+# SCHEMA_VERSION badhao — agla deploy ka migrate unhe lagayega.
+#
+# timestamps — purane ISO-string timestamps ko BSON dates mein badalta hai (writers ab datetime likhte hain).
+# Har collection `_id` order mein batches mein stream hoti hai; har batch ek unordered bulk_write.
+# Checkpoint `migrations` collection mein ({_id: 'timestamps:<collection>', last_id, converted, done}) —
+# beech mein ruk jaye toh dobara chalao, wahin se shuru. Har update filter mein purana string bhi
+# rakhta hai, isliye beech mein kisi writer ne field badal di ho toh woh overwrite nahi hoti.
+# Jo string parse na ho ('' / 'Unknown') woh jaisi hai waisi rehti hai (`skipped` mein gini jaati hai).
+
+import argparse
+import logging
+import sys
+from datetime import datetime
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2   # Database._create_indexes / _init_default_ads badle toh +1 (2: bot_queue)
+
+# collection → timestamp fields (day keys jaise 'date' / 'today_date' / 'last_daily' string hi rehte hain)
+TIMESTAMP_FIELDS = {
+    'users':               ['join_date', 'last_active', 'blocked_at', 'last_self_search', 'last_reminded'],
+    'referrals':           ['join_date', 'activation_date'],
+    'transactions':        ['timestamp'],
+    'withdrawals':         ['request_date', 'processed_date', 'archived_at'],
+    'daily_searches':      ['timestamp'],
+    'daily_bonus':         ['timestamp'],
+    'search_logs':         ['timestamp'],
+    'channel_joins':       ['joined_at'],
+    'daily_claims':        ['claimed_at'],
+    'issues':              ['timestamp', 'reply_date'],
+    'live_activity':       ['timestamp'],
+    'system_stats':        ['timestamp'],
+    'pass_requests':       ['created_at', 'processed_at'],
+    'notifications':       ['created_at'],
+    'ads':                 ['edited_at', 'notif_sent_at'],
+    'jackpot_bets':        ['created_at', 'result_at', 'declared_at', 'placed_at'],
+    'leaderboard_periods': ['updated_at'],
+    'broadcast_jobs':      ['created_at', 'updated_at', 'finished_at'],
+}
+
+def as_datetime(value):
+    """ str / datetime / None → naive datetime ya None. Migration poori hone tak readers isse padhte hain. """
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)   # naive local — baaki writers jaisa
+    return dt
+
+def migrate_collection(db, name, fields, batch_size=500, restart=False):
+    """ Ek collection ke string timestamps → dates. Returns checkpoint dict. """
+    collection = db[name]
+    checkpoints = db['migrations']
+    key = f'timestamps:{name}'
+    if restart:
+        checkpoints.delete_one({'_id': key})
+    state = checkpoints.find_one({'_id': key}) or {}
+    if state.get('done'):
+        return state
+
+    last_id = state.get('last_id')
+    only_strings = {'$or': [{f: {'$type': 'string'}} for f in fields]}
+    projection = {f: 1 for f in fields}
+    while True:
+        query = dict(only_strings)
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(collection.find(query, projection).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        ops, skipped = [], 0
+        for doc in batch:
+            guard, changes = {'_id': doc['_id']}, {}
+            for field in fields:
+                raw = doc.get(field)
+                if not isinstance(raw, str):
+                    continue
+                dt = as_datetime(raw)
+                if dt is None:
+                    skipped += 1
+                    continue
+                guard[field] = raw
+                changes[field] = dt
+            if changes:
+                ops.append(UpdateOne(guard, {'$set': changes}))
+        converted = collection.bulk_write(ops, ordered=False).modified_count if ops else 0
+        last_id = batch[-1]['_id']
+        checkpoints.update_one(
+            {'_id': key},
+            {'$set': {'last_id': last_id, 'updated_at': datetime.now()},
+             '$inc': {'scanned': len(batch), 'converted': converted, 'skipped': skipped}},
+            upsert=True
+        )
+        logger.info(f"{name}: +{converted} converted (batch {len(batch)}, last _id {last_id})")
+
+    checkpoints.update_one({'_id': key}, {'$set': {'done': True, 'finished_at': datetime.now()}}, upsert=True)
+    return checkpoints.find_one({'_id': key})
+
+def migrate_timestamps(db, batch_size=500, collections=None, restart=False):
+    """ Saari (ya `collections`) TIMESTAMP_FIELDS collections. Returns {collection: converted}. """
+    report = {}
+    for name, fields in TIMESTAMP_FIELDS.items():
+        if collections and name not in collections:
+            continue
+        try:
+            state = migrate_collection(db, name, fields, batch_size=batch_size, restart=restart)
+            report[name] = state.get('converted', 0)
+        except Exception as e:
+            logger.error(f"Timestamp migration error on {name}: {e} — dobara chalao, checkpoint se resume hoga")
+            report[name] = None
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='EarnZone data migrations')
+    sub = parser.add_subparsers(dest='command', required=True)
+    schema = sub.add_parser('schema', help='indexes + seed data, schema version record')
+    schema.add_argument('--force', action='store_true', help='version current ho tab bhi dobara lagao')
+    ts = sub.add_parser('timestamps', help='ISO-string timestamps → BSON dates (resumable)')
+    ts.add_argument('--batch-size', type=int, default=500)
+    ts.add_argument('--collections', default='', help='comma-separated, default: sab')
+    ts.add_argument('--restart', action='store_true', help='checkpoint hata ke shuru se')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    from config import Config
+    from database import Database
+    database = Database(Config())
+    try:
+        if args.command == 'schema':
+            if database.schema_version >= SCHEMA_VERSION and not args.force:
+                print(f"  schema v{database.schema_version} already applied")
+                return 0
+            try:
+                database.apply_schema()
+            except Exception as e:
+                logger.error(f"Schema migration failed: {e} — version record nahi hua, fix karke dobara chalao")
+                return 1
+            print(f"  schema v{database.schema_version} applied")
+            return 0
+        collections = [c.strip() for c in args.collections.split(',') if c.strip()] or None
+        report = migrate_timestamps(database.db, batch_size=args.batch_size, collections=collections,
+                                    restart=args.restart)
+        for name, converted in report.items():
+            print(f"  {name:<20} {'FAILED' if converted is None else converted}")
+        return 1 if None in report.values() else 0
+    finally:
+        database.cleanup()
+
+if __name__ == '__main__':
+    sys.exit(main())
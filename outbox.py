@@ -0,0 +1,116 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== outbox.py (Flask → bot loop outbound sends) =====
+#
+# Flask (waitress) threads kabhi Telegram ka wait nahi karte — `enqueue()` turant job_id deta hai,
+# bot loop pe messages bounded concurrency se jaate hain, aur `status(job_id)` se result milta hai.
+
+import asyncio
+import logging
+import threading
+import uuid
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_WORDS = ('blocked', 'deactivated', 'chat not found', 'user not found')
+
+class Outbox:
+    def __init__(self, concurrency=8, job_ttl=600, max_jobs=5000):
+        self.concurrency = concurrency
+        self.bot = None
+        self.loop = None
+        self._sem = None
+        self._jobs = TTLCache(maxsize=max_jobs, ttl=job_ttl)
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'sent': 0, 'failed': 0, 'rejected': 0}
+
+    def attach(self, bot, loop):
+        """ Bot loop ready hone pe (run_bot) — tab tak enqueue None deta hai. """
+        self.bot = bot
+        self.loop = loop
+        self._sem = asyncio.Semaphore(self.concurrency)
+
+    @property
+    def ready(self):
+        return self.bot is not None and self.loop is not None and self.loop.is_running()
+
+    # ========== PUBLIC (kisi bhi thread se) ==========
+
+    def enqueue(self, messages, kind='message'):
+        """
+        messages: [{'chat_id': .., 'text': .., 'parse_mode': .., 'reply_markup': ..}, ...]
+        Returns job_id (str), ya None agar bot loop abhi chal nahi raha.
+        """
+        messages = [m for m in messages if m.get('chat_id')]
+        if not self.ready:
+            self.stats['rejected'] += 1
+            return None
+        job_id = self._new_job(messages, kind)
+        asyncio.run_coroutine_threadsafe(self._run(job_id, messages), self.loop)
+        return job_id
+
+    def send(self, chat_id, text, kind='message', **kwargs):
+        """ Ek message — fire and forget shortcut. """
+        return self.enqueue([dict(kwargs, chat_id=chat_id, text=text)], kind=kind)
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    # ========== BOT LOOP ==========
+
+    async def deliver(self, messages, kind='message'):
+        """ Bot loop se hi — poora job bhejo aur final status lautao (bot_channel ke queued jobs). """
+        messages = [m for m in messages if m.get('chat_id')]
+        job_id = self._new_job(messages, kind)
+        await self._run(job_id, messages)
+        return self.status(job_id)
+
+    def _new_job(self, messages, kind):
+        job_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self._jobs[job_id] = {
+                'job_id': job_id, 'kind': kind, 'status': 'queued',
+                'total': len(messages), 'sent': 0, 'failed': 0, 'blocked': 0, 'error': None
+            }
+        self.stats['jobs'] += 1
+        return job_id
+
+    async def _run(self, job_id, messages):
+        self._update(job_id, status='sending')
+        await asyncio.gather(*(self._send_one(job_id, m) for m in messages))
+        self._update(job_id, status='done')
+
+    async def _send_one(self, job_id, message):
+        async with self._sem:
+            try:
+                await self.bot.send_message(**message)
+                self._update(job_id, inc='sent')
+                self.stats['sent'] += 1
+            except Exception as e:
+                err = str(e).lower()
+                blocked = any(w in err for w in BLOCKED_WORDS)
+                self._update(job_id, inc='blocked' if blocked else 'failed', error=str(e)[:100])
+                self.stats['failed'] += 1
+                logger.debug(f"Outbox send to {message.get('chat_id')} failed: {e}")
+
+    def _update(self, job_id, status=None, inc=None, error=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            if status:
+                job['status'] = status
+            if inc:
+                job[inc] += 1
+            if error:
+                job['error'] = error
@@ -0,0 +1,83 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== user_cache.py (write-through user doc cache) =====
+#
+# Pehle har write pe user_cache.pop() hota tha aur agla get_user poora doc dobara laata tha.
+# Ab writes cache ko khud update karte hain:
+#   put(doc)                    — find_one_and_update(..., AFTER) ka fresh doc (TTL naya)
+#   apply(uid, inc=, set_=)     — jo mutation humne DB pe bheji wahi local entry pe (TTL same rehta hai,
+#                                 isliye staleness pehle jitni hi bounded hai)
+#   invalidate(uid)             — jab result pata na ho (delete, admin edits, failed conditional update)
+# Entries copy-on-write hain — jo dict get() ne diya woh kabhi badalta nahi.
+
+import threading
+import time
+from cachetools import LRUCache
+
+class UserCache:
+    def __init__(self, maxsize=1000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = LRUCache(maxsize=maxsize)   # user_id → (expires_at, doc)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'puts': 0, 'applied': 0, 'invalidated': 0}
+
+    def get(self, user_id):
+        key = int(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.stats['hits'] += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, doc):
+        """ DB se aaya fresh user doc — `_id` string karke rakho. """
+        if not doc or doc.get('user_id') is None:
+            return doc
+        if '_id' in doc and not isinstance(doc['_id'], str):
+            doc['_id'] = str(doc['_id'])
+        with self._lock:
+            self._entries[int(doc['user_id'])] = (time.monotonic() + self.ttl, doc)
+            self.stats['puts'] += 1
+        return doc
+
+    def apply(self, user_id, inc=None, set_=None):
+        """ Known $inc / $set local entry pe lagao (entry na ho toh kuch nahi — agla get DB se). """
+        key = int(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry[0] <= time.monotonic():
+                return False
+            doc = dict(entry[1])
+            for field, delta in (inc or {}).items():
+                doc[field] = (doc.get(field) or 0) + delta
+            doc.update(set_ or {})
+            self._entries[key] = (entry[0], doc)
+            self.stats['applied'] += 1
+            return True
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(int(user_id), None) is not None:
+                self.stats['invalidated'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, size=len(self._entries), maxsize=self.maxsize, ttl=self.ttl,
+                        hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else None)
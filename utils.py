@@ -157,18 +157,8 @@ class Utils:
             return False
 
     def get_user_rank(self, user_id):
-        try:
-            users = list(self.db.users.find(
-                {'suspicious_activity': False},
-                {'user_id': 1, 'active_refs': 1}
-            ).sort('active_refs', -1))
-            for i, user in enumerate(users):
-                if user['user_id'] == int(user_id):
-                    return i + 1
-            return len(users) + 1
-        except Exception as e:
-            logger.error(f"Error getting user rank: {e}")
-            return 0
+        # Indexed count — Database.get_user_rank
+        return self.db.get_user_rank(user_id)
 
     def parse_command(self, text):
         try:
@@ -0,0 +1,123 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== webhook_queue.py (webhook ingestion — bounded queue + update_id dedup) =====
+#
+# Flask /webhook sirf `submit(json)` karta hai aur turant 200 deta hai:
+#   - update_id last `dedup_window` mein dekha hai → duplicate (Telegram retry), 200 par process nahi
+#   - queue full (`max_pending`) → 503, Telegram khud baad mein retry karega (backpressure)
+#   - warna bot loop ki queue mein; `workers` coroutines Update.de_json + process_update karte hain
+# `on_done` (optional) process_update khatam hone ke baad bot loop pe chalta hai — bot_channel isi pe
+# queue doc complete karta hai, handoff pe nahi.
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+class UpdateIngest:
+    ACCEPTED, DUPLICATE, FULL, NOT_READY, INVALID = 'accepted', 'duplicate', 'full', 'not_ready', 'invalid'
+
+    def __init__(self, workers=40, max_pending=1000, dedup_window=10000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._seen = set()
+        self._seen_order = deque()
+        self.dedup_window = dedup_window
+        self._lock = threading.Lock()
+        self._pending = 0      # queue mein + abhi process ho rahe
+        self._busy = 0
+        self.app = None
+        self.loop = None
+        self._queue = None
+        self._tasks = []
+        self.stats_counters = {'accepted': 0, 'duplicate': 0, 'dropped': 0, 'invalid': 0,
+                               'processed': 0, 'errors': 0, 'max_depth': 0}
+        self._slowest_ms = 0.0
+
+    def start(self, app):
+        """ Bot loop ke andar call karo (app.start() ke baad). """
+        self.app = app
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [self.loop.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"✅ Webhook ingest ready | workers {self.workers} | max pending {self.max_pending}")
+
+    async def stop(self):
+        """ Bot loop pe — workers cancel (loop band hone se pehle, warna pending tasks ki warnings). """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ========== FLASK SIDE (kisi bhi thread se) ==========
+
+    def submit(self, data, on_done=None):
+        if self._queue is None or not self.loop.is_running():
+            return self.NOT_READY
+        update_id = data.get('update_id') if isinstance(data, dict) else None
+        if not isinstance(update_id, int):
+            self.stats_counters['invalid'] += 1
+            return self.INVALID
+        with self._lock:
+            if update_id in self._seen:
+                self.stats_counters['duplicate'] += 1
+                return self.DUPLICATE
+            if self._pending >= self.max_pending:
+                self.stats_counters['dropped'] += 1
+                return self.FULL   # seen mein nahi daala — Telegram ka retry process hoga
+            self._remember(update_id)
+            self._pending += 1
+            self.stats_counters['accepted'] += 1
+            self.stats_counters['max_depth'] = max(self.stats_counters['max_depth'], self._pending)
+        self.loop.call_soon_threadsafe(self._queue.put_nowait, (data, on_done))
+        return self.ACCEPTED
+
+    @property
+    def free_slots(self):
+        with self._lock:
+            return max(0, self.max_pending - self._pending)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.stats_counters, depth=self._pending - self._busy, in_flight=self._busy,
+                        workers=self.workers, max_pending=self.max_pending,
+                        slowest_ms=round(self._slowest_ms, 1))
+
+    # ========== BOT LOOP ==========
+
+    async def _worker(self, n):
+        while True:
+            data, on_done = await self._queue.get()
+            with self._lock:
+                self._busy += 1
+            started = time.perf_counter()
+            try:
+                await self.app.process_update(Update.de_json(data, self.app.bot))
+                self.stats_counters['processed'] += 1
+            except Exception as e:
+                self.stats_counters['errors'] += 1
+                logger.error(f"Webhook worker {n} update {data.get('update_id')} error: {e}")
+            finally:
+                self._slowest_ms = max(self._slowest_ms, (time.perf_counter() - started) * 1000)
+                with self._lock:
+                    self._busy -= 1
+                    self._pending -= 1
+                if on_done:
+                    on_done()
+
+    def _remember(self, update_id):
+        self._seen.add(update_id)
+        self._seen_order.append(update_id)
+        if len(self._seen_order) > self.dedup_window:
+            self._seen.discard(self._seen_order.popleft())
@@ -0,0 +1,116 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== write_buffer.py (write-behind Mongo writer) =====
+
+import logging
+import threading
+import time
+from collections import deque
+from pymongo import InsertOne
+
+logger = logging.getLogger(__name__)
+
+class WriteBuffer:
+    """
+    Write-behind buffer — request thread pe sirf queue mein daalo,
+    background thread har `flush_ms` ya `batch_size` ops pe unordered bulk_write karta hai.
+
+    Queue bounded hai (`max_pending`). Full hone pe:
+      - droppable=True  → naya op drop (live feed jaisi cheezein, counter badhta hai)
+      - droppable=False → caller thread pe seedha likh do (data kabhi lose nahi hota)
+    """
+
+    def __init__(self, flush_ms=500, batch_size=200, max_pending=10000):
+        self.flush_interval = max(flush_ms, 10) / 1000.0
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()   # background ka in-flight batch bhi flush() ke return se pehle likha jaye
+        self._stopped = False
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'direct': 0, 'errors': 0, 'flushes': 0}
+        self._thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+        self._thread.start()
+
+    # ========== PUBLIC ==========
+
+    def insert(self, collection, doc, droppable=True):
+        self.add(collection, InsertOne(doc), droppable=droppable)
+
+    def add(self, collection, op, droppable=True):
+        """ Koi bhi pymongo bulk op (InsertOne / UpdateOne / ...) queue karo. """
+        with self._cond:
+            if not self._stopped and len(self._pending) < self.max_pending:
+                self._pending.append((collection, op))
+                self.stats['queued'] += 1
+                if len(self._pending) >= self.batch_size:
+                    self._cond.notify()
+                return
+            if droppable:
+                self.stats['dropped'] += 1
+                return
+            self.stats['direct'] += 1
+        self._write(collection, [op])
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """ Abhi tak ka sab kuch likh do (caller thread pe) — background thread ka chalu batch bhi. """
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    if not self._pending:
+                        return
+                    batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.batch_size))]
+                self._write_batch(batch)
+
+    def close(self, timeout=5):
+        """ Shutdown — thread roko aur queue drain karo. """
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.flush()
+        logger.info(f"Write buffer drained | {self.stats}")
+
+    # ========== INTERNAL ==========
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write buffer flush error: {e}")
+                time.sleep(self.flush_interval)
+
+    def _write_batch(self, batch):
+        # Collection-wise group karo — ek bulk_write per collection
+        grouped = {}
+        for collection, op in batch:
+            grouped.setdefault(collection.full_name, (collection, []))[1].append(op)
+        for collection, ops in grouped.values():
+            self._write(collection, ops)
+        self.stats['flushes'] += 1
+
+    def _write(self, collection, ops):
+        try:
+            collection.bulk_write(ops, ordered=False)
+            self.stats['written'] += len(ops)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Write buffer bulk_write error on {collection.name} ({len(ops)} ops): {e}")
@@ -0,0 +1,33 @@
+# ═══════════════════════════════════════════════════════════
+# EarnZone / FilmyFund — Telegram Mini App
+# Owner   : @asbhaibsr
+# Channel : @asbhai_bsr
+# Contact : https://t.me/asbhaibsr
+# ⚠️  Unauthorized modification or redistribution prohibited.
+# © 2025 @asbhaibsr — All Rights Reserved
+# ═══════════════════════════════════════════════════════════
+
+# ===== wsgi.py (web tier entry point — PROCESS_ROLE=web) =====
+#
+# Multi-process deploy:
+#   PROCESS_ROLE=bot python main.py                                  # ek bot process (webhook set, handlers, jobs)
+#   PROCESS_ROLE=web gunicorn -w 4 -b 0.0.0.0:$PORT wsgi:app         # N web workers
+#
+# Har worker ye module khud import karta hai, isliye har process ka apna MongoClient / caches.
+# --preload mat lagao — MongoClient fork-safe nahi hai.
+# Web ↔ bot: /webhook updates aur outbox sends `bot_queue` collection se (bot_channel.py).
+
+import os
+
+os.environ.setdefault('PROCESS_ROLE', 'web')
+
+# Role pehle — galat role pe handlers / executors / schema thread kuch bhi shuru hone se pehle ruk jao
+_role = os.environ['PROCESS_ROLE'].strip().lower()   # Config jaisa normalise
+if _role != 'web':
+    raise RuntimeError(f"wsgi.py sirf PROCESS_ROLE=web ke liye hai (mila: {_role})")
+
+import main
+
+main.init_runtime()
+
+app = main.app